@@ -0,0 +1,114 @@
+"""Measure what logging costs the dashboard's task fetch.
+
+Runs get_user_tasks and present_tasks against a canned Tasks API (no network)
+with logging off, through the queue pipeline at INFO and at DEBUG, and with
+a synchronous file handler at DEBUG for comparison.
+
+Usage: python benchmarks/logging_overhead.py [tasks] [repeat]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from famos import create_app
+from famos.services import google_tasks
+from famos.services.task_presenter import present_tasks
+from famos.utils.logger import get_pipeline
+
+
+class Canned:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeService:
+    """Just enough of the Tasks API for get_user_tasks."""
+
+    def __init__(self, count, lists=5):
+        self.lists = [{'id': f'list-{i}', 'title': f'List {i}'} for i in range(lists)]
+        self.items = {
+            entry['id']: [
+                {
+                    'id': f'{entry["id"]}-task-{i}',
+                    'title': f'Task number {i}',
+                    'notes': 'Pick up groceries on the way home' if i % 3 == 0 else '',
+                    'due': '2030-06-12T12:00:00.000Z',
+                    'status': 'completed' if i % 4 == 0 else 'needsAction',
+                }
+                for i in range(count // lists)
+            ]
+            for entry in self.lists
+        }
+
+    def tasklists(self):
+        return self
+
+    def tasks(self):
+        return self
+
+    def list(self, tasklist=None, maxResults=None, pageToken=None):
+        if tasklist is None:
+            return Canned({'items': self.lists})
+        return Canned({'items': self.items[tasklist]})
+
+
+def timed(repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        present_tasks(google_tasks.get_user_tasks(1))
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    directory = tempfile.mkdtemp()
+    service = FakeService(count)
+    google_tasks.get_tasks_service = lambda user_id: service
+    famos_logger = logging.getLogger('famos')
+
+    create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': directory,
+        'LOG_PIPELINE_ENABLED': True,
+        'LOG_DIR': os.path.join(directory, 'logs'),
+        'LOG_CONSOLE': False,
+    })
+    pipeline_handlers = [get_pipeline().handler]
+    sync_handler = logging.FileHandler(os.path.join(directory, 'sync.log'))
+    sync_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s'))
+
+    setups = {
+        'disabled': (logging.CRITICAL + 1, pipeline_handlers),
+        'pipeline INFO': (logging.INFO, pipeline_handlers),
+        'pipeline DEBUG': (logging.DEBUG, pipeline_handlers),
+        'synchronous DEBUG': (logging.DEBUG, [sync_handler]),
+    }
+    # Interleaved rounds, best of each, so warm-up and GC don't favour one setup
+    results = dict.fromkeys(setups, float('inf'))
+    for _ in range(5):
+        for name, (level, handlers) in setups.items():
+            famos_logger.handlers[:] = handlers
+            famos_logger.setLevel(level)
+            results[name] = min(results[name], timed(repeat))
+
+    get_pipeline().stop()
+    sync_handler.close()
+
+    print(f"{'setup':<22} {'ms/request':>11} {'overhead':>9}")
+    baseline = results['disabled']
+    for name, ms in results.items():
+        print(f"{name:<22} {ms:>11.2f} {(ms / baseline - 1) * 100:>8.1f}%")
+
+
+if __name__ == '__main__':
+    main()
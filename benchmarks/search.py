@@ -0,0 +1,87 @@
+"""Time family-scoped full-text searches as the index grows.
+
+Usage: python benchmarks/search.py [families] [rows_per_family]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import stamp, upgrade
+from famos import create_app, db
+from famos.models import User, Family, Contact, Task
+from famos.services.search import rebuild_index, search
+
+WORDS = ('soccer piano dentist doctor teacher babysitter pickup groceries school homework birthday '
+         'party grandma swim lesson laundry recycling vet appointment library books camp').split()
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+NAMES = 'Ann Ben Cara Dan Eve Finn Gia Hugo Iris Jack Kim Liam Mia Noah Olga Pia'.split()
+
+
+def seed(families, rows):
+    rng = random.Random(7)
+    family_ids = []
+    for i in range(families):
+        user = User(email=f'owner{i}@example.com', first_name='Owner', last_name=str(i))
+        db.session.add(user)
+        db.session.flush()
+        family = Family(user_id=user.id, name=f'Family {i}')
+        db.session.add(family)
+        db.session.flush()
+        family_ids.append(family.id)
+    contacts, tasks = [], []
+    for family_id in family_ids:
+        for _ in range(rows // 2):
+            contacts.append({
+                'first_name': rng.choice(NAMES), 'last_name': rng.choice(NAMES) + 'son',
+                'role': rng.choice(['doctor', 'teacher', 'babysitter']),
+                'notes': ' '.join(rng.choices(WORDS, k=8)), 'family_id': family_id,
+            })
+            tasks.append({
+                'title': ' '.join(rng.choices(WORDS, k=3)).capitalize(),
+                'description': ' '.join(rng.choices(WORDS, k=12)), 'family_id': family_id,
+            })
+    # Bulk inserts skip the mapper events, so index everything in one pass
+    db.session.bulk_insert_mappings(Contact, contacts)
+    db.session.bulk_insert_mappings(Task, tasks)
+    db.session.commit()
+    with db.engine.begin() as connection:
+        rebuild_index(connection)
+    return family_ids
+
+
+def main():
+    families = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    directory = tempfile.mkdtemp()
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'famos.sqlite'),
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': directory,
+    })
+    with app.app_context():
+        # create_all built the tables up to the revision before search; add the index
+        stamp(MIGRATIONS, 'd5e9b3a7c2f8')
+        upgrade(MIGRATIONS)
+        started = time.perf_counter()
+        family_ids = seed(families, rows)
+        print(f"indexed {families * rows} rows in {time.perf_counter() - started:.1f}s")
+        rng = random.Random(11)
+        for query in ('pi', 'pian', 'dent appo', 'liamson', 'soccer school homework'):
+            timings = []
+            for _ in range(200):
+                family_id = rng.choice(family_ids)
+                start = time.perf_counter()
+                search(family_id, query)
+                timings.append((time.perf_counter() - start) * 1000)
+                db.session.remove()
+            timings.sort()
+            print(f"{query!r:>26}: median {timings[len(timings) // 2]:.2f} ms, p95 {timings[int(len(timings) * 0.95)]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
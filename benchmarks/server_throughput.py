@@ -0,0 +1,120 @@
+"""Compare request throughput of the development server and serve.py.
+
+Starts each server against a scratch SQLite database, then has concurrent
+clients fetch the login page (a template render and a session, no Google
+calls) for a fixed time. The development server is Werkzeug's threaded
+server in one process; serve.py forks one worker per available CPU unless
+given a worker count.
+
+Usage: python benchmarks/server_throughput.py [seconds] [clients] [workers]
+"""
+import http.client
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from famos.server import available_cpus
+
+PATH = '/auth/login'
+
+DEV_SERVER = ("from famos import create_app; "
+              "create_app().run(host='127.0.0.1', port=%d, threaded=True, use_reloader=False)")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', PATH)
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def load(port, seconds, clients):
+    stop = time.monotonic() + seconds
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client():
+        local = []
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            try:
+                # A new connection per request, as serve.py closes them
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                connection.request('GET', PATH)
+                response = connection.getresponse()
+                response.read()
+                connection.close()
+                if response.status != 200:
+                    raise OSError(response.status)
+                local.append(time.perf_counter() - started)
+            except OSError:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    return len(latencies) / seconds, p95, errors[0]
+
+
+def measure(name, argv, env, port, seconds, clients):
+    process = subprocess.Popen(argv, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(port)
+        load(port, 1, clients)
+        rate, p95, errors = load(port, seconds, clients)
+    finally:
+        # Both exit cleanly on INT, taking their password hashing pools with them
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=60)
+    print(f"{name:<24} {rate:>10.0f} {p95:>10.1f} {errors:>8}")
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else available_cpus()
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(scratch, 'famos.sqlite'),
+                   LOG_LEVEL='WARNING', PYTHONPATH=ROOT)
+        print(f"{clients} clients for {seconds:.0f}s against GET {PATH}")
+        print(f"{'server':<24} {'req/s':>10} {'p95 ms':>10} {'errors':>8}")
+        port = free_port()
+        measure('run.py (threaded)', [sys.executable, '-c', DEV_SERVER % port], env, port, seconds, clients)
+        port = free_port()
+        measure(f'serve.py ({workers} workers)',
+                [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+                env, port, seconds, clients)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Compare SQLite read/write concurrency with and without the engine profile.
+
+Reader threads load a user with their family and Google integration, as the
+identity loader does, while one writer keeps refreshing the integration's
+token the way get_tasks_service does.
+
+Usage: python benchmarks/sqlite_concurrency.py [seconds] [readers]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+from famos import create_app, db
+from famos.models import User, Family, GoogleIntegration
+
+
+def make_app(profile):
+    directory = tempfile.mkdtemp()
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'famos.sqlite'),
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': directory,
+        'SQLITE_PROFILE_ENABLED': profile,
+    })
+
+
+def seed(users=200):
+    for i in range(users):
+        user = User(email=f'user{i}@example.com', first_name='User', last_name=str(i))
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Family(user_id=user.id, name=f'Family {i}'))
+        db.session.add(GoogleIntegration(user_id=user.id, access_token='token', refresh_token='refresh'))
+    db.session.commit()
+
+
+def run(app, seconds, readers, users=200):
+    stop = time.monotonic() + seconds
+    latencies = []
+    counts = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+
+    def reader(offset):
+        with app.app_context():
+            local = []
+            user_id = offset
+            while time.monotonic() < stop:
+                started = time.perf_counter()
+                try:
+                    User.query.options(
+                        joinedload(User.family), joinedload(User.google_integration)
+                    ).filter_by(id=user_id % users + 1).first()
+                    db.session.rollback()
+                    local.append(time.perf_counter() - started)
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        counts['locked'] += 1
+                user_id += 7
+            db.session.remove()
+            with lock:
+                latencies.extend(local)
+                counts['reads'] += len(local)
+
+    def writer():
+        with app.app_context():
+            user_id = 0
+            while time.monotonic() < stop:
+                try:
+                    integration = GoogleIntegration.query.filter_by(user_id=user_id % users + 1).first()
+                    integration.access_token = f'token-{user_id}'
+                    integration.token_expiry = (datetime.utcnow() + timedelta(hours=1)).isoformat()
+                    db.session.commit()
+                    with lock:
+                        counts['writes'] += 1
+                except OperationalError:
+                    db.session.rollback()
+                    with lock:
+                        counts['locked'] += 1
+                user_id += 1
+            db.session.remove()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    return counts['reads'] / seconds, counts['writes'] / seconds, counts['locked'], p95
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f"{'profile':<10} {'reads/s':>10} {'writes/s':>10} {'locked':>8} {'p95 read ms':>12}")
+    for profile in (False, True):
+        app = make_app(profile)
+        with app.app_context():
+            seed()
+            db.session.remove()
+        reads, writes, locked, p95 = run(app, seconds, readers)
+        with app.app_context():
+            db.engine.dispose()
+        print(f"{'on' if profile else 'off':<10} {reads:>10.0f} {writes:>10.0f} {locked:>8} {p95:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Time task board pages for families with few and many historical tasks.
+
+Keyset pagination should keep both the first page and a page deep into the
+history at roughly the same cost regardless of family size.
+
+Usage: python benchmarks/task_board.py [small] [large]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from famos import create_app, db
+from famos.models import User, Family, Task
+from famos.services.task_board import BoardFilters, encode_cursor, get_board_page
+
+
+def seed(count):
+    user = User(email=f'owner{count}@example.com', first_name='Owner', last_name=str(count))
+    db.session.add(user)
+    db.session.flush()
+    family = Family(user_id=user.id, name=f'Family {count}')
+    db.session.add(family)
+    db.session.flush()
+    start = datetime(2020, 1, 1)
+    db.session.bulk_insert_mappings(Task, [
+        {
+            'title': f'Task {i}',
+            'family_id': family.id,
+            'due_date': None if i % 10 == 0 else start + timedelta(hours=i),
+            'priority': i % 3 + 1,
+            # Most of a large family's history is done
+            'completed': i < count * 0.9,
+            'assignee_id': user.id if i % 2 else None,
+        }
+        for i in range(count)
+    ])
+    db.session.commit()
+    return family.id
+
+
+def timed(fn, repeat=50):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+        db.session.remove()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:3]] or [1000, 100000]
+    directory = tempfile.mkdtemp()
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'famos.sqlite'),
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': directory,
+    })
+    print(f"{'tasks':>8} {'first open ms':>14} {'first all ms':>13} {'deep all ms':>12}")
+    with app.app_context():
+        for size in sizes:
+            family_id = seed(size)
+            middle = Task.query.filter_by(family_id=family_id).order_by(Task.id).offset(size // 2).first()
+            cursor = encode_cursor(middle)
+            db.session.remove()
+            first_open = timed(lambda: get_board_page(family_id))
+            first_all = timed(lambda: get_board_page(family_id, BoardFilters(status='all')))
+            deep_all = timed(lambda: get_board_page(family_id, BoardFilters(status='all'), cursor=cursor))
+            print(f"{size:>8} {first_open:>14.2f} {first_all:>13.2f} {deep_all:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compare bytes per task for the old task dicts and TaskRecord.
+
+Usage: python benchmarks/task_record_memory.py [task_count]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from famos.services.task_record import TaskRecord
+
+
+def raw_tasks(count, lists=5):
+    """Simulate Tasks API items spread over a few lists."""
+    for i in range(count):
+        list_index = i % lists
+        yield (
+            {
+                'id': f'MTY{i:020d}',
+                'title': f'Task number {i}',
+                'notes': 'Pick up groceries on the way home' if i % 3 == 0 else '',
+                'due': '2030-06-12T12:00:00Z',
+                'status': 'completed' if i % 4 == 0 else 'needsAction',
+                'completed': '',
+            },
+            # Each API page decodes a fresh copy of these strings
+            ''.join(['list-', str(list_index)]),
+            ''.join(['Family list ', str(list_index)]),
+        )
+
+
+def as_dict(task, list_id, list_name):
+    return {
+        'task_id': task.get('id', ''),
+        'list_id': list_id,
+        'title': task.get('title', ''),
+        'notes': task.get('notes', ''),
+        'due': task.get('due', ''),
+        'status': task.get('status', ''),
+        'list_name': list_name,
+        'completed': task.get('completed', '')
+    }
+
+
+def as_record(task, list_id, list_name):
+    return TaskRecord.from_google(task, list_id, list_name, due=task.get('due', ''))
+
+
+def measure(build, count):
+    items = list(raw_tasks(count))
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tasks = [build(*item) for item in items]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del tasks
+    return size / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    dict_bytes = measure(as_dict, count)
+    record_bytes = measure(as_record, count)
+    print(f"tasks:              {count}")
+    print(f"dict bytes/task:    {dict_bytes:.0f}")
+    print(f"record bytes/task:  {record_bytes:.0f}")
+    print(f"saving:             {100 * (1 - record_bytes / dict_bytes):.0f}%")
+
+
+if __name__ == '__main__':
+    main()
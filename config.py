@@ -9,6 +9,12 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'app.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Number of reverse proxies in front of the app whose X-Forwarded-For is trusted
+    PROXY_FIX_HOPS = int(os.getenv('PROXY_FIX_HOPS', '0'))
+    
+    # Logging (see famos/utils/logger.py)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    
     # Google OAuth Configuration
     GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
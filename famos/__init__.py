@@ -4,9 +4,16 @@ from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from flask_session import Session
+from famos.utils.compression import Compress
+from famos.utils.assets import StaticAssets
+from famos.utils.sessions import SqliteSessionInterface
+from famos.utils.sqlite_profile import SqliteProfile
+from famos.utils.sql_profiler import SqlProfiler
+from famos.utils.logger import setup_logger
+from famos.utils.schema import ensure_schema
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
-import logging
-from logging.handlers import RotatingFileHandler
 from datetime import timedelta, datetime
 from config import Config
 
@@ -16,6 +23,10 @@ migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
 sess = Session()
+compress = Compress()
+assets = StaticAssets()
+sqlite_profile = SqliteProfile()
+sql_profiler = SqlProfiler()
 login_manager.login_view = 'auth.login'
 login_manager.login_message_category = 'info'
 
@@ -31,10 +42,13 @@ def create_app(test_config=None):
         DATABASE=os.path.join(app.instance_path, 'famos.sqlite'),
         SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(app.instance_path, 'famos.sqlite'),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
-        # Session configuration
-        SESSION_TYPE='filesystem',
+        # Session configuration; 'sqlite' uses our own store, anything else goes to Flask-Session
+        SESSION_TYPE='sqlite',
         PERMANENT_SESSION_LIFETIME=timedelta(days=31),
-        SESSION_FILE_DIR=os.path.join(app.instance_path, 'flask_session')
+        SESSION_FILE_DIR=os.path.join(app.instance_path, 'flask_session'),
+        SESSION_SQLITE_PATH=os.path.join(app.instance_path, 'sessions.sqlite'),
+        # Number of tasks per list rendered with the dashboard; the rest load on scroll
+        DASHBOARD_TASK_WINDOW=50
     )
 
     if test_config is None:
@@ -51,38 +65,42 @@ def create_app(test_config=None):
     except OSError:
         pass
 
-    # Initialize Flask-Session
-    sess.init_app(app)
+    # Compiled templates are kept on disk, so restarted workers skip the Jinja compile step
+    app.config.setdefault(
+        'JINJA_BYTECODE_CACHE_DIR', None if app.testing else os.path.join(app.instance_path, 'jinja_cache')
+    )
+    if app.config['JINJA_BYTECODE_CACHE_DIR']:
+        os.makedirs(app.config['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['JINJA_BYTECODE_CACHE_DIR'])
+
+    # Initialize server-side sessions
+    if app.config['SESSION_TYPE'] == 'sqlite':
+        app.session_interface = SqliteSessionInterface.from_app(app)
+    else:
+        sess.init_app(app)
 
     # Initialize extensions
     db.init_app(app)
+    sqlite_profile.init_app(app, db)
+    sql_profiler.init_app(app, db)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     csrf.init_app(app)
+    compress.init_app(app)
+    assets.init_app(app)
     
-    # Set up logging
-    if not app.testing:
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        
-        # Delete existing log file if it exists
-        log_file = 'logs/famos.log'
-        if os.path.exists(log_file):
-            try:
-                os.remove(log_file)
-            except OSError:
-                pass
-                
-        file_handler = RotatingFileHandler(log_file, maxBytes=10240, backupCount=10)
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        app.logger.setLevel(logging.INFO)
+    # Behind a reverse proxy, take the client address, scheme and host from
+    # the X-Forwarded-* headers set by this many trusted proxies
+    app.config.setdefault('PROXY_FIX_HOPS', 0)
+    if app.config['PROXY_FIX_HOPS']:
+        hops = app.config['PROXY_FIX_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
+    # Structured, queue-backed logging; off under test unless LOG_PIPELINE_ENABLED is set
+    setup_logger(app)
     
     # Register blueprints
-    from famos.routes import auth, main, family, tasks, calendar, contacts, account, integrations, dashboard
+    from famos.routes import auth, main, family, tasks, calendar, contacts, account, integrations, dashboard, search, metrics, admin, health
     app.register_blueprint(auth.bp, url_prefix='/auth')
     app.register_blueprint(main.bp)
     app.register_blueprint(dashboard.bp)
@@ -92,6 +110,10 @@ def create_app(test_config=None):
     app.register_blueprint(contacts.bp, url_prefix='/contacts')
     app.register_blueprint(account.bp, url_prefix='/account')
     app.register_blueprint(integrations.bp)
+    app.register_blueprint(search.bp, url_prefix='/search')
+    app.register_blueprint(metrics.bp)
+    app.register_blueprint(admin.bp, url_prefix='/admin')
+    app.register_blueprint(health.bp)
     
     # Custom template filters
     @app.template_filter('format_date')
@@ -99,31 +121,31 @@ def create_app(test_config=None):
         if not date_str:
             return ""
             
-        app.logger.debug(f"Formatting date: {date_str}")
+        app.logger.debug("Formatting date: %s", date_str)
         
         try:
             # Parse the date string - try different formats
             try:
                 date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-                app.logger.debug(f"Parsed as format 1: %Y-%m-%dT%H:%M:%S.%fZ")
+                app.logger.debug("Parsed as format 1: %Y-%m-%dT%H:%M:%S.%fZ")
             except ValueError:
                 try:
                     date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ")
-                    app.logger.debug(f"Parsed as format 2: %Y-%m-%dT%H:%M:%SZ")
+                    app.logger.debug("Parsed as format 2: %Y-%m-%dT%H:%M:%SZ")
                 except ValueError:
                     try:
                         date = datetime.strptime(date_str, "%Y-%m-%d")
-                        app.logger.debug(f"Parsed as format 3: %Y-%m-%d")
+                        app.logger.debug("Parsed as format 3: %Y-%m-%d")
                     except ValueError:
                         try:
                             date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S%z")
-                            app.logger.debug(f"Parsed as format 4: %Y-%m-%dT%H:%M:%S%z")
+                            app.logger.debug("Parsed as format 4: %Y-%m-%dT%H:%M:%S%z")
                         except ValueError:
                             try:
                                 date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                                app.logger.debug(f"Parsed as format 5: %Y-%m-%d %H:%M:%S")
+                                app.logger.debug("Parsed as format 5: %Y-%m-%d %H:%M:%S")
                             except ValueError:
-                                app.logger.error(f"Could not parse date: {date_str}")
+                                app.logger.error("Could not parse date: %s", date_str)
                                 return date_str
             
             # Convert to local timezone for display
@@ -146,25 +168,68 @@ def create_app(test_config=None):
             else:
                 result = date.strftime("%b %-d at %-I:%M %p")
             
-            app.logger.debug(f"Formatted date: {result}")
+            app.logger.debug("Formatted date: %s", result)
             return result
             
         except Exception as e:
-            app.logger.error(f"Error formatting date {date_str}: {str(e)}")
+            app.logger.error("Error formatting date %s: %s", date_str, e)
             return date_str
     
-    @login_manager.user_loader
-    def load_user(user_id):
-        from famos.models import User
-        return User.query.get(int(user_id))
+    # Backend of the caches the services share between workers
+    from famos import cache
+    cache.init_app(app)
+
+    # One joined query (or a cache hit) per request for user, family and integration
+    from famos.services import identity
+    identity.init_app(app)
+    login_manager.user_loader(identity.load_user)
+
+    # Password hashing runs on its own process pool
+    from famos.services import passwords
+    passwords.init_app(app)
+
+    # Failed-login limits, checked before any password work
+    from famos.services import login_throttle
+    login_throttle.init_app(app)
+
+    # Per-role contact counts, cached until a contact changes
+    from famos.services import contact_directory
+    contact_directory.init_app(app)
+
+    # Family rosters are memoized for the length of a request
+    from famos.services import family_roster
+    family_roster.init_app(app)
+
+    # Request, SQL, Google API and cache metrics, served at /metrics
+    from famos.services import metrics as metrics_service
+    metrics_service.init_app(app, db)
+
+    # Admin-triggered CPU/memory profiles and the slow-request watchdog
+    from famos.services import profiling
+    profiling.init_app(app)
+
+    # Per-request trace IDs, with sampled requests exported as span waterfalls
+    from famos.services import tracing
+    tracing.init_app(app, db)
+
+    # Who calls the Google APIs, from where, and how often; see /admin/google-api
+    from famos.services import google_ledger
+    google_ledger.init_app(app, db)
+
+    # Recently fetched tasks are kept for a short while
+    from famos.services import google_tasks
+    google_tasks.init_app(app)
+
+    # Workers warm their caches for recently active users before /readyz reports ready
+    from famos.services import warmup
+    warmup.init_app(app)
     
     # Import models
     from famos.models import User, Family, Task, Contact
     from famos.models.integrations import GoogleIntegration
     
-    # Create tables for any models that don't exist yet
-    with app.app_context():
-        db.create_all()
+    # Create tables for any models that don't exist yet; a no-op check when the schema is unchanged
+    ensure_schema(app, db)
         
     # Template filters
     @app.template_filter('datetime')
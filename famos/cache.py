@@ -0,0 +1,348 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from importlib import import_module
+from famos.utils.sqlite_store import SqliteStore
+from famos.utils.ttl_cache import TTLCache
+import json
+import logging
+import os
+import threading
+import time
+
+# Get a logger for this module
+logger = logging.getLogger('famos.cache')
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entries ('
+    ' key TEXT PRIMARY KEY,'
+    ' value TEXT NOT NULL,'
+    ' expires_at REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at)',
+    'CREATE TABLE IF NOT EXISTS cache_versions ('
+    ' namespace TEXT PRIMARY KEY,'
+    ' version INTEGER NOT NULL'
+    ') WITHOUT ROWID',
+)
+
+_MISSING = object()
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    raise TypeError(f"Can't cache {type(value).__name__}; cache plain data such as a dict of its columns")
+
+
+def _object_hook(obj):
+    if len(obj) == 1:
+        if '__datetime__' in obj:
+            return datetime.fromisoformat(obj['__datetime__'])
+        if '__date__' in obj:
+            return date.fromisoformat(obj['__date__'])
+    return obj
+
+
+def dumps(value):
+    """Serialize a cache value: JSON plus dates and datetimes.
+
+    Anything else raises TypeError. ORM instances in particular are never
+    pickled into a cache another process reads; cache their column values.
+    Tuples come back as lists.
+    """
+    return json.dumps(value, default=_default, separators=(',', ':'))
+
+
+def loads(text):
+    return json.loads(text, object_hook=_object_hook)
+
+
+class CacheBackend(ABC):
+    """The tier a Cache shares with every other worker.
+
+    Keys and values are strings; values are already serialized. To share
+    a cache between hosts, implement these methods over a network store
+    (memcached, Redis, ...) and name the class in ``CACHE_BACKEND`` as
+    ``'package.module:ClassName'``; it is created with ``from_app(app)``.
+    """
+
+    @classmethod
+    def from_app(cls, app):
+        return cls()
+
+    @abstractmethod
+    def get(self, key):
+        """The value stored under ``key``, or None when missing or expired."""
+
+    @abstractmethod
+    def set(self, key, value, ttl):
+        """Store ``value`` under ``key`` for ``ttl`` seconds."""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove ``key``; a missing key is not an error."""
+
+    @abstractmethod
+    def version(self, namespace):
+        """The current version of ``namespace``; 0 until it is first bumped."""
+
+    @abstractmethod
+    def bump_version(self, namespace):
+        """Move ``namespace`` to a new version, orphaning every entry under the old one."""
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Keeps the "shared" tier in this process; for tests and single-process servers."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (now + ttl, value)
+            if len(self._entries) > self.max_entries:
+                self._entries = {name: entry for name, entry in self._entries.items() if entry[0] > now}
+                # Still full of live entries: drop the oldest writes
+                for name in list(self._entries)[:len(self._entries) - self.max_entries]:
+                    del self._entries[name]
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def version(self, namespace):
+        return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self._lock:
+            version = self._versions[namespace] = self._versions.get(namespace, 0) + 1
+        return version
+
+
+class SqliteCacheBackend(CacheBackend):
+    """Share entries between the workers on one host through a SQLite file.
+
+    Reads and writes are single statements on the store's per-thread WAL
+    connection, so readers don't wait for writers; see ``SqliteStore`` for
+    how expired rows are collected.
+    """
+
+    def __init__(self, path, gc_interval=300, gc_batch_size=500):
+        self.store = SqliteStore(path, SCHEMA, gc_interval=gc_interval, gc_batch_size=gc_batch_size)
+
+    @classmethod
+    def from_app(cls, app):
+        app.config.setdefault('CACHE_SQLITE_PATH', os.path.join(app.instance_path, 'cache.sqlite'))
+        app.config.setdefault('CACHE_GC_INTERVAL', 300)
+        app.config.setdefault('CACHE_GC_BATCH_SIZE', 500)
+        return cls(
+            app.config['CACHE_SQLITE_PATH'],
+            gc_interval=app.config['CACHE_GC_INTERVAL'],
+            gc_batch_size=app.config['CACHE_GC_BATCH_SIZE']
+        )
+
+    def _connection(self):
+        return self.store.connection()
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        self._connection().execute(
+            'INSERT INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at',
+            (key, value, now + ttl)
+        )
+        self.collect_garbage(now)
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def version(self, namespace):
+        row = self._connection().execute(
+            'SELECT version FROM cache_versions WHERE namespace = ?', (namespace,)
+        ).fetchone()
+        return row[0] if row is not None else 0
+
+    def bump_version(self, namespace):
+        conn = self._connection()
+        conn.execute(
+            'INSERT INTO cache_versions (namespace, version) VALUES (?, 1) '
+            'ON CONFLICT(namespace) DO UPDATE SET version = version + 1',
+            (namespace,)
+        )
+        return self.version(namespace)
+
+    def collect_garbage(self, now=None, force=False):
+        """Delete expired entries in batches; returns the number of rows removed."""
+        removed = self.store.collect_expired('cache_entries', 'key', now or time.time(), force=force)
+        if removed:
+            logger.info("Removed %d expired cache entries", removed)
+        return removed
+
+BACKENDS = {
+    'memory': MemoryCacheBackend,
+    'sqlite': SqliteCacheBackend,
+}
+
+
+class Cache:
+    """A namespaced cache: this process's LRU in front of a tier shared by every worker.
+
+    Lookups try the local tier first, then the shared backend, copying
+    shared hits into the local tier. Local entries live at most
+    ``local_ttl`` seconds, which bounds how long a ``delete`` or
+    ``invalidate`` in another worker goes unseen here; the shared tier
+    keeps them for ``ttl``. ``invalidate()`` bumps the namespace's
+    version, dropping every entry in it at once.
+
+    Values are stored with ``dumps``. ``encode`` turns a value into that
+    plain form and ``decode`` turns it back, so callers can cache objects
+    such as TaskRecords; the local tier holds decoded values, which must
+    be treated as read-only. Backend errors are logged and count as misses.
+    """
+
+    def __init__(self, namespace, backend, ttl=60, local_ttl=5, local_size=1024, prefix='',
+                 encode=None, decode=None):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.local_ttl = min(local_ttl, ttl)
+        self.prefix = prefix
+        self.encode = encode
+        self.decode = decode
+        self.shared_hits = 0
+        self._local = TTLCache(self.local_ttl, local_size)
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+
+    @classmethod
+    def from_app(cls, app, namespace, ttl, local_size=1024, encode=None, decode=None):
+        """A cache in ``namespace`` on the app's shared backend (see ``init_app``)."""
+        return cls(
+            namespace, app.extensions['famos_cache_backend'], ttl=ttl,
+            local_ttl=app.config['CACHE_LOCAL_TTL'], local_size=local_size,
+            prefix=app.config['CACHE_KEY_PREFIX'], encode=encode, decode=decode
+        )
+
+    @property
+    def hits(self):
+        return self._local.hits + self.shared_hits
+
+    @property
+    def misses(self):
+        return self._local.misses - self.shared_hits
+
+    def __len__(self):
+        return len(self._local)
+
+    def _current_version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked >= self.local_ttl:
+            try:
+                version = self.backend.version(self.namespace)
+            except Exception as e:
+                logger.warning("Cache backend failed reading the %s version: %s", self.namespace, e)
+                version = self._version or 0
+            if version != self._version:
+                # Everything held locally belongs to the old version
+                self._local.clear()
+                self._version = version
+            self._version_checked = now
+        return self._version
+
+    def _key(self, key, version):
+        return f'{self.prefix}{self.namespace}:{version}:{key}'
+
+    def _load(self, text):
+        value = loads(text)
+        return self.decode(value) if self.decode else value
+
+    def get(self, key, default=None):
+        version = self._current_version()
+        value = self._local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        try:
+            text = self.backend.get(self._key(key, version))
+        except Exception as e:
+            logger.warning("Cache backend failed reading %s: %s", self.namespace, e)
+            text = None
+        if text is None:
+            return default
+        value = self._load(text)
+        self._local.set(key, value)
+        with self._lock:
+            self.shared_hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        text = dumps(self.encode(value) if self.encode else value)
+        version = self._current_version()
+        # Keep what the other workers will read, not the caller's own (mutable) object
+        self._local.set(key, self._load(text), min(ttl, self.local_ttl))
+        try:
+            self.backend.set(self._key(key, version), text, ttl)
+        except Exception as e:
+            logger.warning("Cache backend failed writing %s: %s", self.namespace, e)
+
+    def delete(self, key):
+        self._local.delete(key)
+        try:
+            self.backend.delete(self._key(key, self._current_version()))
+        except Exception as e:
+            logger.warning("Cache backend failed deleting from %s: %s", self.namespace, e)
+
+    def invalidate(self):
+        """Drop every entry in this namespace, in every worker within ``local_ttl``."""
+        try:
+            version = self.backend.bump_version(self.namespace)
+        except Exception as e:
+            logger.warning("Cache backend failed invalidating %s: %s", self.namespace, e)
+            version = (self._version or 0) + 1
+        self._local.clear()
+        self._version = version
+        self._version_checked = time.monotonic()
+
+
+def _load_backend(name):
+    if name in BACKENDS:
+        return BACKENDS[name]
+    module, _, attr = name.partition(':')
+    if not attr:
+        raise ValueError(f"Unknown CACHE_BACKEND {name!r}; use one of {sorted(BACKENDS)} or 'module:Class'")
+    return getattr(import_module(module), attr)
+
+
+def init_app(app):
+    """Create the shared cache backend the services' caches use."""
+    from famos import db
+    from famos.utils.schema import schema_fingerprint
+    # Without a worker-shared file under test, where every app gets a fresh cache
+    app.config.setdefault('CACHE_BACKEND', 'memory' if app.testing else 'sqlite')
+    app.config.setdefault('CACHE_LOCAL_TTL', 5)
+    # Entries written by code with different models are never read back
+    app.config.setdefault('CACHE_KEY_PREFIX', f'{schema_fingerprint(db.metadata):08x}:')
+    backend = _load_backend(app.config['CACHE_BACKEND']).from_app(app)
+    app.extensions['famos_cache_backend'] = backend
+    logger.debug("Cache backend: %s", type(backend).__name__)
+    return backend
@@ -4,5 +4,6 @@ from famos.models.task import Task
 from famos.models.contact import Contact
 from famos.models.family_member import FamilyMember
 from famos.models.integrations import GoogleIntegration
+from famos.models.google_api_usage import GoogleApiCall, GoogleApiDailyUsage
 
-__all__ = ['User', 'Family', 'Task', 'Contact', 'FamilyMember', 'GoogleIntegration']
+__all__ = ['User', 'Family', 'Task', 'Contact', 'FamilyMember', 'GoogleIntegration', 'GoogleApiCall', 'GoogleApiDailyUsage']
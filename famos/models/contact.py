@@ -2,6 +2,14 @@ from famos import db
 from datetime import datetime
 
 class Contact(db.Model):
+    __table_args__ = (
+        # Family contact lists, sorted by name
+        db.Index('ix_contact_family_id_name', 'family_id', 'last_name', 'first_name'),
+        # Role-filtered lists by name, and the newest-first listing
+        db.Index('ix_contact_family_id_role_name', 'family_id', 'role', 'last_name', 'first_name'),
+        db.Index('ix_contact_family_id_created_at', 'family_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
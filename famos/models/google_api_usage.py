@@ -0,0 +1,43 @@
+from famos import db
+from datetime import datetime
+
+
+class GoogleApiCall(db.Model):
+    """One Google API call, written in batches by the ledger service."""
+    __tablename__ = 'google_api_calls'
+    __table_args__ = (
+        # Per-user history and the calls-per-view report over recent days
+        db.Index('ix_google_api_calls_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_google_api_calls_created_at_endpoint', 'created_at', 'endpoint'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, nullable=True)
+    endpoint = db.Column(db.String(64), nullable=False, default='')
+    method = db.Column(db.String(64), nullable=False)
+    # 'ok', the HTTP status of an API error, or the exception class name
+    status = db.Column(db.String(32), nullable=False)
+    latency_ms = db.Column(db.Integer, nullable=False)
+    response_bytes = db.Column(db.Integer, nullable=False, default=0)
+    # Groups the calls made while serving one request
+    request_id = db.Column(db.String(32), nullable=False)
+
+
+class GoogleApiDailyUsage(db.Model):
+    """Google API calls per day, user, endpoint and method, updated as the ledger is written."""
+    __tablename__ = 'google_api_daily_usage'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'user_id', 'endpoint', 'method', name='uq_google_api_daily_usage_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    # 0 for calls made without a signed-in user, so the unique key always applies
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+    endpoint = db.Column(db.String(64), nullable=False, default='')
+    method = db.Column(db.String(64), nullable=False)
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    latency_ms = db.Column(db.BigInteger, nullable=False, default=0)
+    response_bytes = db.Column(db.BigInteger, nullable=False, default=0)
@@ -11,7 +11,7 @@ class GoogleIntegration(db.Model):
     __tablename__ = 'google_integrations'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True, index=True)
     access_token = db.Column(db.String(255), nullable=True)  
     refresh_token = db.Column(db.String(255), nullable=True)
     token_uri = db.Column(db.String, nullable=True)
@@ -27,13 +27,11 @@ class GoogleIntegration(db.Model):
 
     def is_connected(self):
         """Check if the integration is connected and valid."""
-        logger.info(f"Checking connection status for user {self.user_id}")
-        logger.info(f"Access token: {'Present' if self.access_token else 'Missing'}")
-        logger.info(f"Refresh token: {'Present' if self.refresh_token else 'Missing'}")
-        logger.info(f"Token expiry: {self.token_expiry}")
+        logger.debug("Checking connection status for user %s (access token: %s, refresh token: %s, expiry: %s)",
+                     self.user_id, bool(self.access_token), bool(self.refresh_token), self.token_expiry)
         
         if not self.access_token:
-            logger.warning(f"No access token for user {self.user_id}")
+            logger.warning("No access token for user %s", self.user_id)
             return False
             
         if self.token_expiry:
@@ -46,10 +44,10 @@ class GoogleIntegration(db.Model):
                 if expiry < datetime.now(tz.utc):
                     # Only consider it expired if we don't have a refresh token
                     if not self.refresh_token:
-                        logger.warning(f"Token expired for user {self.user_id} and no refresh token")
+                        logger.warning("Token expired for user %s and no refresh token", self.user_id)
                         return False
             except (ValueError, TypeError) as e:
-                logger.warning(f"Invalid token expiry format for user {self.user_id}: {self.token_expiry}")
+                logger.warning("Invalid token expiry format for user %s: %s", self.user_id, self.token_expiry)
                 return False
                 
         return True
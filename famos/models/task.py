@@ -24,3 +24,8 @@ class Task(db.Model):
         
     def __repr__(self):
         return f'<Task {self.title}>'
+
+
+# Task board order within a family or an assignee: due date, highest priority, ID
+db.Index('ix_task_family_board', Task.family_id, Task.completed, Task.due_date, Task.priority.desc(), Task.id)
+db.Index('ix_task_assignee_board', Task.assignee_id, Task.completed, Task.due_date, Task.priority.desc(), Task.id)
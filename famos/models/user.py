@@ -1,12 +1,8 @@
-from famos import db, login_manager
+from famos import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from famos.services.passwords import hash_password, verify_password
 from datetime import datetime
 
-@login_manager.user_loader
-def load_user(id):
-    return User.query.get(int(id))
-
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -23,10 +19,10 @@ class User(UserMixin, db.Model):
     google_integration = db.relationship('GoogleIntegration', back_populates='user', uselist=False)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     @property
     def full_name(self):
@@ -1,8 +1,9 @@
 from flask import Blueprint, render_template, flash, redirect, url_for, request
 from flask_login import login_required, current_user
-from werkzeug.security import check_password_hash, generate_password_hash
 from famos import db
 from famos.forms.account import AccountSettingsForm
+from famos.services.identity import invalidate_identity
+from famos.services.passwords import PasswordHasherBusy
 from famos.utils.logger import logger
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -29,11 +30,11 @@ def settings():
                         flash('Current password is required to set a new password.', 'error')
                         return render_template('account/settings.html', form=form)
                     
-                    if not check_password_hash(current_user.password_hash, form.current_password.data):
+                    if not current_user.check_password(form.current_password.data):
                         flash('Current password is incorrect.', 'error')
                         return render_template('account/settings.html', form=form)
                     
-                    current_user.password_hash = generate_password_hash(form.new_password.data)
+                    current_user.set_password(form.new_password.data)
                 
                 # Update other fields
                 current_user.first_name = form.first_name.data
@@ -42,9 +43,14 @@ def settings():
                 current_user.phone = form.phone.data
                 
                 db.session.commit()
+                invalidate_identity(current_user.id)
                 flash('Account settings updated successfully!', 'success')
                 return redirect(url_for('main.dashboard'))
                 
+            except PasswordHasherBusy:
+                db.session.rollback()
+                flash('The server is busy right now. Please try again in a moment.', 'error')
+                return render_template('account/settings.html', form=form), 503
             except SQLAlchemyError as e:
                 db.session.rollback()
                 logger.error(f'Error updating account settings: {str(e)}')
@@ -0,0 +1,78 @@
+from datetime import datetime
+from functools import wraps
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, send_from_directory
+from flask_login import login_required, current_user
+from famos.models.user import User
+from famos.services.google_ledger import usage_report
+from famos.services.profiling import MODES, PROFILE_FILE_RE, get_profiler
+from famos.utils.logger import logger
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+MAX_TARGET_MINUTES = 240
+REPORT_DAYS = (1, 7, 30)
+
+
+def admin_required(view):
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if not current_user.is_admin:
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+@bp.route('/profiles')
+@admin_required
+def profiles():
+    profiler = get_profiler()
+    targets = {user_id: dict(entry, until_at=datetime.fromtimestamp(entry['until']))
+               for user_id, entry in profiler.targets.active().items()}
+    users = {user.id: user for user in User.query.filter(User.id.in_(list(targets)))} if targets else {}
+    return render_template('admin/profiles.html', files=profiler.files(), targets=targets, users=users,
+                           modes=MODES)
+
+
+@bp.route('/profiles/targets', methods=['POST'])
+@admin_required
+def add_target():
+    user = User.query.filter_by(email=(request.form.get('email') or '').strip().lower()).first()
+    if user is None:
+        flash('No user with that email.', 'error')
+        return redirect(url_for('admin.profiles'))
+    try:
+        minutes = max(1, min(int(request.form.get('minutes') or 15), MAX_TARGET_MINUTES))
+    except ValueError:
+        flash('Minutes must be a number.', 'error')
+        return redirect(url_for('admin.profiles'))
+    modes = [mode for mode in request.form.getlist('modes') if mode in MODES] or ['cpu']
+    get_profiler().targets.enable(user.id, minutes, modes)
+    logger.info(f'Admin {current_user.email} enabled {",".join(modes)} profiling for {user.email} for {minutes} min')
+    flash(f'Profiling {user.email} for {minutes} minutes.', 'success')
+    return redirect(url_for('admin.profiles'))
+
+
+@bp.route('/profiles/targets/<int:user_id>/delete', methods=['POST'])
+@admin_required
+def remove_target(user_id):
+    get_profiler().targets.disable(user_id)
+    flash('Profiling stopped.', 'success')
+    return redirect(url_for('admin.profiles'))
+
+
+@bp.route('/profiles/<name>')
+@admin_required
+def download_profile(name):
+    if not PROFILE_FILE_RE.match(name):
+        abort(404)
+    return send_from_directory(get_profiler().directory, name, as_attachment=True)
+
+
+@bp.route('/google-api')
+@admin_required
+def google_api_usage():
+    days = request.args.get('days', 7, type=int)
+    if days not in REPORT_DAYS:
+        days = 7
+    return render_template('admin/google_api.html', report=usage_report(days), report_days=REPORT_DAYS)
@@ -6,9 +6,9 @@ import traceback
 from famos import db
 from famos.models import User, GoogleIntegration, Family
 from famos.forms import LoginForm, RegistrationForm
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from pytz import UTC
+from famos.services.identity import invalidate_identity
+from famos.services.passwords import PasswordHasherBusy, hash_password, needs_rehash
+from famos.services.login_throttle import get_throttle
 import os
 
 bp = Blueprint('auth', __name__)
@@ -21,8 +21,33 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
+        # Refuse throttled attempts before any database or hashing work
+        throttle = get_throttle()
+        if throttle is not None:
+            retry_after = throttle.check(request.remote_addr, form.email.data)
+            if retry_after:
+                flash('Too many failed login attempts. Please wait a moment and try again.', 'danger')
+                response = current_app.make_response((render_template('auth/login.html', form=form), 429))
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+
         user = User.query.filter_by(email=form.email.data).first()
-        if user is None or not user.check_password(form.password.data):
+        try:
+            valid = user is not None and user.check_password(form.password.data)
+            if valid and needs_rehash(user.password_hash):
+                # Hash parameters changed since this password was set
+                user.password_hash = hash_password(form.password.data)
+                db.session.commit()
+                invalidate_identity(user.id)
+                current_app.logger.info(f'Rehashed password for user: {user.email}')
+        except PasswordHasherBusy:
+            db.session.rollback()
+            current_app.logger.warning(f'Password hashing busy during login for email: {form.email.data}')
+            flash('The server is busy right now. Please try again in a moment.', 'danger')
+            return render_template('auth/login.html', form=form), 503
+        if not valid:
+            if throttle is not None:
+                throttle.record_failure(request.remote_addr, form.email.data)
             current_app.logger.warning(f'Failed login attempt for email: {form.email.data}')
             flash('Invalid email or password', 'danger')
             return redirect(url_for('auth.login'))
@@ -31,6 +56,8 @@ def login():
         if current_user.is_authenticated:
             logout_user()
             
+        if throttle is not None:
+            throttle.record_success(request.remote_addr, form.email.data)
         login_user(user, remember=form.remember.data)
         current_app.logger.info(f'Successful login for user: {user.email}')
         
@@ -77,6 +104,11 @@ def register():
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('auth.login'))
             
+        except PasswordHasherBusy:
+            db.session.rollback()
+            current_app.logger.warning(f'Password hashing busy during registration for email: {form.email.data}')
+            flash('The server is busy right now. Please try again in a moment.', 'danger')
+            return render_template('auth/register.html', form=form), 503
         except Exception as e:
             current_app.logger.error(f'Error during registration: {str(e)}')
             current_app.logger.error(traceback.format_exc())
@@ -98,6 +130,8 @@ def logout():
 @login_required
 def google_auth():
     """Start the Google OAuth flow."""
+    # The OAuth client libraries are slow to import and only needed here
+    from google_auth_oauthlib.flow import Flow
     try:
         # Create flow instance to manage the OAuth 2.0 Authorization Grant Flow
         flow = Flow.from_client_config(
@@ -134,6 +168,7 @@ def google_auth():
 @login_required
 def google_callback():
     """Handle the callback from Google's OAuth 2.0 server."""
+    from google_auth_oauthlib.flow import Flow
     try:
         # Verify state matches
         state = session.get('state')
@@ -169,11 +204,12 @@ def google_callback():
         integration.access_token = credentials.token
         integration.refresh_token = credentials.refresh_token
         # Store token expiry with timezone info
-        integration.token_expiry = credentials.expiry.astimezone(UTC).replace(microsecond=0).isoformat()
+        integration.token_expiry = credentials.expiry.astimezone(timezone.utc).replace(microsecond=0).isoformat()
         integration.tasks_enabled = True
         
         db.session.add(integration)
         db.session.commit()
+        invalidate_identity(current_user.id)
         
         current_app.logger.info(f'Successfully connected Google account for user {current_user.email}')
         flash('Successfully connected Google account!', 'success')
@@ -3,6 +3,9 @@ from flask_login import login_required, current_user
 from famos import db
 from famos.models.contact import Contact
 from famos.forms.family import ContactForm
+from famos.services.contact_directory import (
+    InvalidContactQuery, SORTS, get_contacts_page, invalidate_role_counts, role_counts
+)
 from famos.utils.logger import logger
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -16,14 +19,26 @@ def index():
         flash('You need to create or join a family first.', 'error')
         return redirect(url_for('family.create'))
     
+    sort = request.args.get('sort', 'name')
+    role = request.args.get('role') or None
     try:
-        contacts = Contact.query.filter_by(family_id=current_user.family.id).all()
+        page = get_contacts_page(current_user.family.id, sort=sort, role=role, cursor=request.args.get('cursor'))
+        counts = role_counts(current_user.family.id)
+    except InvalidContactQuery as e:
+        flash(f'Invalid contact listing: {e}', 'error')
+        return redirect(url_for('contacts.index'))
     except SQLAlchemyError as e:
         logger.error(f'Database error while fetching contacts: {str(e)}')
         flash('An error occurred while loading contacts.', 'error')
-        contacts = []
+        return render_template('contacts/index.html', contacts=[], next_url=None, counts={}, sort=sort,
+                               role=role, sorts=SORTS, is_first_page=True, contact_form=form)
     
-    return render_template('contacts/index.html', contacts=contacts, contact_form=form)
+    next_url = None
+    if page.next_cursor:
+        next_url = url_for('contacts.index', sort=sort, role=role, cursor=page.next_cursor)
+    return render_template('contacts/index.html', contacts=page.contacts, next_url=next_url, counts=counts,
+                           sort=sort, role=role, sorts=SORTS, is_first_page=not request.args.get('cursor'),
+                           contact_form=form)
 
 @bp.route('/add', methods=['POST'])
 @login_required
@@ -46,6 +61,7 @@ def add_contact():
             )
             db.session.add(contact)
             db.session.commit()
+            invalidate_role_counts(contact.family_id)
             flash('Contact added successfully!', 'success')
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -72,6 +88,7 @@ def edit_contact(id):
             contact.role = form.role.data
             contact.notes = form.notes.data
             db.session.commit()
+            invalidate_role_counts(contact.family_id)
             flash('Contact updated successfully!', 'success')
             return redirect(url_for('contacts.index'))
         except SQLAlchemyError as e:
@@ -1,9 +1,9 @@
 from flask import Blueprint, render_template, current_app
 from flask_login import login_required, current_user
 from famos.services.google_tasks import get_user_tasks
+from famos.services.task_presenter import present_tasks
+from famos.services.identity import invalidate_identity
 from famos.models.integrations import GoogleIntegration
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 import traceback
 import logging
 import sys
@@ -24,31 +24,24 @@ def test():
 @login_required
 def dashboard():
     try:
-        logger.debug("=== DASHBOARD ROUTE START (DEBUG) ===")
-        logger.info("=== DASHBOARD ROUTE START (INFO) ===")
-        logger.error("=== DASHBOARD ROUTE START (ERROR) ===")
-        logger.debug(f"Current user: {current_user}")
-        logger.debug(f"Current user ID: {current_user.id}")
-        logger.debug(f"Current user is authenticated: {current_user.is_authenticated}")
+        logger.debug("Tasks dashboard for user %s", current_user.id)
         
         # Check if user has Google integration
-        integration = GoogleIntegration.query.filter_by(user_id=current_user.id).first()
-        logger.debug(f"Integration query result: {integration}")
-        logger.info(f"Integration found: {integration is not None}")
+        integration = current_user.google_integration
+        logger.debug("Integration found: %s", integration is not None)
         
         google_tasks = []
         if integration:
             logger.debug("Integration exists, checking status...")
             is_connected = integration.is_connected()
-            logger.debug(f"Integration connected: {is_connected}")
-            logger.debug(f"Access token: {integration.access_token[:10] if integration.access_token else 'None'}...")
-            logger.debug(f"Refresh token present: {bool(integration.refresh_token)}")
-            logger.debug(f"Token expiry: {integration.token_expiry}")
-            logger.debug(f"Tasks enabled: {integration.tasks_enabled}")
+            logger.debug("Integration connected: %s, tasks enabled: %s", is_connected, integration.tasks_enabled)
             
             if is_connected and integration.tasks_enabled:  
                 logger.debug("Integration is connected and tasks are enabled, fetching tasks...")
                 try:
+                    from google.oauth2.credentials import Credentials
+                    from google.auth.transport.requests import Request
+                    
                     # Create credentials to test if they're valid
                     creds = Credentials(
                         token=integration.access_token,
@@ -66,27 +59,16 @@ def dashboard():
                         integration.access_token = creds.token
                         integration.token_expiry = creds.expiry
                         db.session.commit()
+                        invalidate_identity(current_user.id)
                         logger.debug("Access token refreshed successfully")
                     
                     # Now try to fetch tasks
                     logger.debug("About to call get_user_tasks...")
                     google_tasks = get_user_tasks(current_user.id)  
-                    logger.debug(f"Retrieved {len(google_tasks)} tasks")
+                    logger.debug("Retrieved %d tasks", len(google_tasks))
                     
-                    # Add validation of task format
-                    validated_tasks = []
-                    for task in google_tasks:
-                        if not isinstance(task, dict):
-                            logger.error(f"Task is not a dictionary: {task}")
-                            continue
-                        if 'title' not in task:
-                            logger.error(f"Task missing title: {task}")
-                            continue
-                        if not task.get('title'):
-                            logger.error(f"Task has empty title: {task}")
-                            continue
-                        validated_tasks.append(task)
-                    google_tasks = validated_tasks
+                    # Validate and compute display fields in a single pass
+                    google_tasks = present_tasks(google_tasks)
                     
                 except ValueError as e:
                     logger.error(f"Invalid integration state: {str(e)}")
@@ -5,6 +5,8 @@ from famos.models.family import Family
 from famos.models.user import User
 from famos.models.contact import Contact
 from famos.forms.family import FamilyMemberForm, CreateFamilyForm
+from famos.services.identity import invalidate_identity
+from famos.services.family_roster import get_family_roster, forget_roster
 from famos.utils.logger import logger
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -31,6 +33,7 @@ def create():
             db.session.add(family)
             current_user.family = family
             db.session.commit()
+            invalidate_identity(current_user.id)
             flash('Family created successfully!', 'success')
             return redirect(url_for('family.manage'))
         except SQLAlchemyError as e:
@@ -52,11 +55,11 @@ def manage():
         return redirect(url_for('family.create'))
     
     try:
-        members = User.query.join(Family).filter(Family.id == family.id).all()
+        roster = get_family_roster(family.id)
     except SQLAlchemyError as e:
         logger.error(f'Database error while fetching family members: {str(e)}')
         flash('An error occurred while loading family members.', 'error')
-        members = []
+        roster = None
     
     if request.method == 'POST' and member_form.validate_on_submit():
         try:
@@ -69,6 +72,9 @@ def manage():
             )
             db.session.add(new_member)
             db.session.commit()
+            forget_roster(family.id)
+            invalidate_identity(current_user.id)
+            invalidate_identity(new_member.id)
             logger.info(f'New family member added: {new_member.email}')
             flash('Family member added successfully!', 'success')
             return redirect(url_for('family.manage'))
@@ -77,13 +83,15 @@ def manage():
             logger.error(f'Error adding family member: {str(e)}')
             flash('An error occurred while adding the family member.', 'error')
     
-    return render_template('family/manage.html', form=member_form, members=members)
+    return render_template('family/manage.html', form=member_form, roster=roster,
+                           members=roster.users if roster else [])
 
 @bp.route('/member/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_member(id):
     member = User.query.get_or_404(id)
-    if not current_user.family or member.family.id != current_user.family.id:
+    roster = get_family_roster(current_user.family.id) if current_user.family else None
+    if roster is None or not roster.has_user(member.id):
         flash('Unauthorized access', 'error')
         return redirect(url_for('family.manage'))
     
@@ -95,6 +103,8 @@ def edit_member(id):
             member.email = form.email.data
             member.phone = form.phone.data
             db.session.commit()
+            forget_roster(roster.family.id)
+            invalidate_identity(member.id)
             flash('Family member updated successfully!', 'success')
             return redirect(url_for('family.manage'))
         except SQLAlchemyError as e:
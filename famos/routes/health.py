@@ -0,0 +1,48 @@
+from flask import Blueprint, jsonify
+from sqlalchemy import text
+from famos import db
+from famos.services.warmup import get_warmup
+import logging
+
+# Get a logger for this module
+logger = logging.getLogger('famos.routes.health')
+
+bp = Blueprint('health', __name__)
+
+NO_STORE = {'Cache-Control': 'no-store'}
+
+
+@bp.route('/healthz')
+def healthz():
+    """Liveness: the worker is up and answering requests."""
+    return jsonify({'status': 'ok'}), 200, NO_STORE
+
+
+@bp.route('/readyz')
+def readyz():
+    """Readiness: the database answers and the host has finished warming up.
+
+    Under the prefork server any worker may answer, so this waits for every
+    current worker of the server, not just the one that took the request.
+    Returns 503 until then, so a load balancer holds traffic back from a
+    host whose caches are still cold.
+    """
+    body = {'status': 'ready'}
+    warmup = get_warmup()
+    if warmup is not None:
+        body['warmup'] = warmup.status()
+        host = warmup.host_status()
+        if host is not None:
+            body['warmup']['workers'] = host
+        if not warmup.ready or (host is not None and (not host['expected'] or host['ready'] < host['expected'])):
+            body['status'] = 'warming'
+
+    try:
+        db.session.execute(text('SELECT 1'))
+    except Exception as e:
+        logger.warning("Readiness check could not reach the database: %s", e)
+        body['status'] = 'unavailable'
+    finally:
+        db.session.remove()
+
+    return jsonify(body), 200 if body['status'] == 'ready' else 503, NO_STORE
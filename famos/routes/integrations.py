@@ -1,11 +1,11 @@
 from flask import Blueprint, render_template, redirect, url_for, session, request, flash, current_app
 from flask_login import login_required, current_user
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
 from datetime import datetime, timedelta
 import json
 from famos import db
 from famos.models.integrations import GoogleIntegration
+from famos.services.identity import invalidate_identity
+from famos.services.google_tasks import invalidate_user_tasks
 from famos.config.google import (
     GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REDIRECT_URI, GOOGLE_SCOPES
 )
@@ -19,6 +19,8 @@ bp = Blueprint('integrations', __name__, url_prefix='/account/integrations')
 
 def create_flow():
     """Create OAuth flow with the configured credentials."""
+    # The OAuth client libraries are slow to import and only needed here
+    from google_auth_oauthlib.flow import Flow
     client_config = {
         "web": {
             "client_id": GOOGLE_CLIENT_ID,
@@ -40,7 +42,7 @@ def create_flow():
 @login_required
 def google_settings():
     try:
-        integration = GoogleIntegration.query.filter_by(user_id=current_user.id).first()
+        integration = current_user.google_integration
         logger.info(f"Fetched Google integration status for user {current_user.id}: {'Connected' if integration and integration.is_connected() else 'Not connected'}")
         return render_template('account/integrations/google.html', integration=integration)
     except Exception as e:
@@ -102,6 +104,8 @@ def google_callback():
         integration.token_expiry = datetime.utcnow() + timedelta(seconds=credentials.expiry.timestamp() - datetime.now().timestamp())
         
         db.session.commit()
+        invalidate_identity(current_user.id)
+        invalidate_user_tasks(current_user.id)
         logger.info(f"Successfully saved Google integration for user {current_user.id}")
         flash("Successfully connected to Google!", "success")
         return redirect(url_for('integrations.google_settings'))
@@ -124,6 +128,8 @@ def google_disconnect():
             integration.tasks_enabled = False
             integration.docs_enabled = False
             db.session.commit()
+            invalidate_identity(current_user.id)
+            invalidate_user_tasks(current_user.id)
             flash("Successfully disconnected from Google.", "success")
         else:
             logger.info(f"No Google integration found for user {current_user.id} during disconnect attempt")
@@ -155,6 +161,7 @@ def google_update():
         integration.docs_enabled = 'docs' in request.form
         
         db.session.commit()
+        invalidate_identity(current_user.id)
         logger.info(f"Successfully updated Google integration settings for user {current_user.id}")
         flash("Integration settings updated successfully!", "success")
     except Exception as e:
@@ -1,10 +1,14 @@
 from flask import Blueprint, render_template, redirect, url_for, current_app, request, jsonify, session
 from flask_login import login_required, current_user
 from flask_wtf.csrf import generate_csrf
-from famos.services.google_tasks import get_user_tasks, update_task, get_tasks_service
+from famos.services.google_tasks import (
+    get_user_tasks, get_list_tasks, update_task, get_task_lists, snapshot_tasks, get_snapshot_tasks
+)
+from famos.services.task_presenter import TaskPresenter, select_tasks
+from famos.services.task_tree import build_task_trees, find_node
+from famos.services.task_windows import window_tasks_by_list, sort_by_due, slice_window
+from famos.services.family_roster import get_family_roster
 from famos.models.integrations import GoogleIntegration
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 import traceback
 import logging
 import sys
@@ -26,15 +30,16 @@ def index():
 @login_required
 def dashboard():
     try:
-        logger.debug("=== DASHBOARD ROUTE START ===")
-        logger.debug(f"Current user: {current_user}")
+        logger.debug("Dashboard for user %s", current_user.id)
         
         # Check if user has Google integration
-        integration = GoogleIntegration.query.filter_by(user_id=current_user.id).first()
-        logger.info(f"Integration found: {integration is not None}")
+        integration = current_user.google_integration
+        logger.debug("Integration found: %s", integration is not None)
         
         google_tasks = []
+        task_windows = []
         task_lists = []
+        snapshot = None
         selected_lists = request.args.getlist('lists') or session.get('selected_lists', [])
         error_message = None
         has_integration = integration is not None
@@ -43,57 +48,34 @@ def dashboard():
         if integration:
             logger.debug("Integration exists, checking status...")
             integration_connected = integration.is_connected()
-            logger.debug(f"Integration connected: {integration_connected}")
-            logger.debug(f"Access token: {integration.access_token[:10] if integration.access_token else 'None'}...")
-            logger.debug(f"Refresh token present: {bool(integration.refresh_token)}")
-            logger.debug(f"Token expiry: {integration.token_expiry}")
-            logger.debug(f"Tasks enabled: {integration.tasks_enabled}")
+            logger.debug("Integration connected: %s, tasks enabled: %s",
+                         integration_connected, integration.tasks_enabled)
             
             if integration_connected and integration.tasks_enabled:  
                 logger.debug("Integration is connected and tasks are enabled, fetching tasks...")
                 try:
-                    # Get task lists before fetching tasks
-                    service = get_tasks_service(current_user.id)
-                    task_lists_result = service.tasklists().list().execute()
-                    task_lists = [{'id': tl['id'], 'title': tl['title']} for tl in task_lists_result.get('items', [])]
+                    # Get task lists before fetching tasks; both come from the task cache when warm
+                    task_lists = get_task_lists(current_user.id)
                     task_lists.sort(key=lambda x: x['title'])
                     
                     # If no lists selected, default to first list
                     if not selected_lists and task_lists:
                         selected_lists = [task_lists[0]['id']]  # Use ID instead of title
-                        session['selected_lists'] = selected_lists
-                    
-                    # Store selected lists in session
-                    session['selected_lists'] = selected_lists
                     
-                    # Get all tasks from the service
-                    google_tasks = get_user_tasks(current_user.id)
-                    
-                    # Debug log for task dates
-                    for task in google_tasks:
-                        logger.debug(f"Task: {task.get('title')}, Due: {task.get('due')}, Raw due: {task.get('raw_due')}")
+                    # Store selected lists in session, only writing the session when they change
+                    if session.get('selected_lists') != selected_lists:
+                        session['selected_lists'] = selected_lists
                     
-                    # Filter tasks based on selected lists
-                    if selected_lists:
-                        google_tasks = [task for task in google_tasks if task.get('list_id') in selected_lists]
+                    # Get all tasks from the service, keeping only the selected lists
+                    google_tasks = select_tasks(get_user_tasks(current_user.id), list_ids=selected_lists or None)
+                    snapshot = snapshot_tasks(current_user.id, google_tasks)
                     
-                    logger.debug(f"Retrieved {len(google_tasks)} tasks")
-                    logger.debug(f"Selected lists: {selected_lists}")
+                    logger.debug("Retrieved %d tasks from lists %s", len(google_tasks), selected_lists)
                     
-                    # Add validation of task format
-                    validated_tasks = []
-                    for task in google_tasks:
-                        if not isinstance(task, dict):
-                            logger.error(f"Task is not a dictionary: {task}")
-                            continue
-                        if 'title' not in task:
-                            logger.error(f"Task missing title: {task}")
-                            continue
-                        if not task.get('title'):
-                            logger.error(f"Task has empty title: {task}")
-                            continue
-                        validated_tasks.append(task)
-                    google_tasks = validated_tasks
+                    # Only the first window of each list goes out with the page
+                    task_windows = window_tasks_by_list(
+                        google_tasks, task_lists, current_app.config['DASHBOARD_TASK_WINDOW'], TaskPresenter()
+                    )
                     
                 except Exception as e:
                     logger.error(f"Error fetching tasks: {str(e)}")
@@ -102,9 +84,13 @@ def dashboard():
             else:
                 error_message = "Google Tasks integration is not properly configured"
                 
+        family = current_user.family
         return render_template(
             'dashboard.html',
+            roster=get_family_roster(family.id) if family else None,
             tasks=google_tasks,
+            task_windows=task_windows,
+            snapshot=snapshot,
             task_lists=task_lists,
             selected_lists=selected_lists,
             error_message=error_message,
@@ -116,3 +102,77 @@ def dashboard():
         logger.error(f"Error in dashboard route: {str(e)}")
         logger.error(traceback.format_exc())
         return render_template('dashboard.html', error_message="An error occurred")
+
+def _fragment_tasks(list_id):
+    """A list's tasks for a fragment, plus the snapshot token its further fragments carry.
+
+    The tasks come from the snapshot named in the URL; without one the list is
+    fetched once and snapshotted. Returns ``(None, token)`` once the snapshot
+    has expired.
+    """
+    token = request.args.get('snapshot')
+    if token is None:
+        tasks = select_tasks(get_list_tasks(current_user.id, list_id))
+        return tasks, snapshot_tasks(current_user.id, tasks)
+    tasks = get_snapshot_tasks(current_user.id, token, list_id)
+    return (select_tasks(tasks) if tasks is not None else None), token
+
+def _expired_fragment():
+    return render_template('dashboard/_task_window_expired.html'), 410
+
+@bp.route('/dashboard/tasks/<list_id>')
+@login_required
+def task_window(list_id):
+    """Render the next window of a task list's top-level tasks as an HTML fragment."""
+    try:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        size = current_app.config['DASHBOARD_TASK_WINDOW']
+        
+        tasks, snapshot = _fragment_tasks(list_id)
+        if tasks is None:
+            return _expired_fragment()
+        presenter = TaskPresenter()
+        roots = sort_by_due(build_task_trees(tasks).get(list_id, []), presenter)
+        window, next_offset = slice_window(roots, offset, size)
+        presenter.present_nodes(window)
+        
+        return render_template(
+            'dashboard/_task_window.html',
+            nodes=window,
+            snapshot=snapshot,
+            more_url=url_for('main.task_window', list_id=list_id, offset=next_offset, snapshot=snapshot) if next_offset else None
+        )
+        
+    except Exception as e:
+        logger.error(f"Error loading task window for list {list_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return '', 502
+
+@bp.route('/dashboard/tasks/<list_id>/<task_id>/subtasks')
+@login_required
+def subtasks(list_id, task_id):
+    """Render the direct subtasks of a task as an HTML fragment."""
+    try:
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        size = current_app.config['DASHBOARD_TASK_WINDOW']
+        
+        tasks, snapshot = _fragment_tasks(list_id)
+        if tasks is None:
+            return _expired_fragment()
+        node = find_node(build_task_trees(tasks).get(list_id, []), task_id)
+        if node is None:
+            return '', 404
+        window, next_offset = slice_window(node.children, offset, size)
+        TaskPresenter().present_nodes(window)
+        
+        return render_template(
+            'dashboard/_task_window.html',
+            nodes=window,
+            snapshot=snapshot,
+            more_url=url_for('main.subtasks', list_id=list_id, task_id=task_id, offset=next_offset, snapshot=snapshot) if next_offset else None
+        )
+        
+    except Exception as e:
+        logger.error(f"Error loading subtasks of {task_id} in list {list_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return '', 502
@@ -0,0 +1,46 @@
+from flask import Blueprint, Response, abort, current_app, request
+from famos import csrf
+from famos.services.metrics import CONTENT_TYPE, get_registry
+import hmac
+
+bp = Blueprint('metrics', __name__)
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+FORWARDING_HEADERS = ('X-Forwarded-For', 'Forwarded', 'X-Real-IP')
+
+
+def _is_local():
+    if request.remote_addr not in LOCAL_ADDRESSES:
+        return False
+    # Without PROXY_FIX_HOPS, remote_addr is the proxy's own address, so a
+    # forwarded request from anywhere would look local
+    if not current_app.config.get('PROXY_FIX_HOPS'):
+        return not any(header in request.headers for header in FORWARDING_HEADERS)
+    return True
+
+
+def _allowed():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            return True
+    return current_app.config.get('METRICS_ALLOW_REMOTE') or _is_local()
+
+
+@bp.route('/metrics')
+@csrf.exempt
+def metrics():
+    """Every worker's metrics in the Prometheus text format.
+
+    Only served to local scrapers unless ``METRICS_ALLOW_REMOTE`` is set or
+    the request carries ``METRICS_TOKEN`` as a bearer token. Requests that
+    came through a proxy count as local only once ``PROXY_FIX_HOPS`` has
+    resolved the client's real address.
+    """
+    registry = get_registry()
+    if registry is None:
+        abort(404)
+    if not _allowed():
+        abort(403)
+    return Response(registry.render(), content_type=CONTENT_TYPE, headers={'Cache-Control': 'no-store'})
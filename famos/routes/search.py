@@ -0,0 +1,49 @@
+from flask import Blueprint, render_template, request, jsonify, url_for
+from flask_login import login_required, current_user
+from famos.services.search import KIND_CODES, search as search_family
+from famos.utils.logger import logger
+from sqlalchemy.exc import SQLAlchemyError
+
+bp = Blueprint('search', __name__, url_prefix='/search')
+
+SUGGEST_LIMIT = 8
+RESULTS_LIMIT = 25
+
+
+def _result_url(result):
+    if result.kind == 'contact':
+        return url_for('contacts.edit_contact', id=result.id)
+    if result.kind == 'member':
+        return url_for('family.manage')
+    return url_for('tasks.board')
+
+
+def _run_search(limit):
+    family = current_user.family
+    if not family:
+        return []
+    kinds = [kind for kind in request.args.get('kinds', '').split(',') if kind in KIND_CODES]
+    try:
+        return search_family(family.id, request.args.get('q', ''), kinds=kinds or None, limit=limit)
+    except SQLAlchemyError as e:
+        logger.error(f'Search failed: {str(e)}')
+        return []
+
+
+@bp.route('/')
+@login_required
+def index():
+    results = _run_search(RESULTS_LIMIT)
+    return render_template('search/index.html', query=request.args.get('q', ''), results=results,
+                           result_url=_result_url)
+
+
+@bp.route('/suggest')
+@login_required
+def suggest():
+    """Prefix autocomplete for the navbar search box."""
+    results = _run_search(SUGGEST_LIMIT)
+    return jsonify({
+        'success': True,
+        'results': [dict(result.to_dict(), url=_result_url(result)) for result in results]
+    })
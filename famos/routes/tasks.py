@@ -1,9 +1,18 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from flask_login import login_required, current_user
-from famos.services.google_tasks import get_tasks_service
+from famos.models import User, Family
+from famos.services.google_tasks import get_tasks_service, invalidate_user_tasks
+from famos.services import google_api
+from famos.services.task_board import (
+    BoardFilters, InvalidBoardQuery, PRIORITY_LABELS, get_board_page, task_to_dict
+)
+from famos.utils.logger import LazyJson
 from datetime import datetime
 import logging
 
+# Get a logger for this module
+logger = logging.getLogger('famos.routes.tasks')
+
 bp = Blueprint('tasks', __name__, url_prefix='/tasks')
 
 @bp.route('/')
@@ -11,30 +20,74 @@ bp = Blueprint('tasks', __name__, url_prefix='/tasks')
 def index():
     return render_template('tasks/index.html')
 
+def _board_args():
+    """Current filter arguments, without the cursor, for building page links."""
+    args = request.args.to_dict()
+    args.pop('cursor', None)
+    return args
+
+@bp.route('/board')
+@login_required
+def board():
+    family = current_user.family
+    if not family:
+        flash('You need to create or join a family first.', 'error')
+        return redirect(url_for('family.create'))
+
+    try:
+        filters = BoardFilters.from_args(request.args)
+        page = get_board_page(family.id, filters, cursor=request.args.get('cursor'))
+    except InvalidBoardQuery as e:
+        flash(f'Invalid task filter: {e}', 'error')
+        return redirect(url_for('tasks.board'))
+
+    assignees = User.query.join(Family).filter(Family.id == family.id).all()
+    more_url = url_for('tasks.board_rows', cursor=page.next_cursor, **_board_args()) if page.next_cursor else None
+    return render_template('tasks/board.html', tasks=page.tasks, more_url=more_url, filters=filters,
+                           assignees=assignees, priorities=PRIORITY_LABELS)
+
+@bp.route('/board/rows')
+@login_required
+def board_rows():
+    """Next page of board rows, as an HTML fragment or JSON."""
+    family = current_user.family
+    if not family:
+        return '', 404
+
+    try:
+        filters = BoardFilters.from_args(request.args)
+        page = get_board_page(family.id, filters, cursor=request.args.get('cursor'))
+    except InvalidBoardQuery as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'success': True,
+            'tasks': [task_to_dict(task) for task in page.tasks],
+            'next_cursor': page.next_cursor
+        })
+    more_url = url_for('tasks.board_rows', cursor=page.next_cursor, **_board_args()) if page.next_cursor else None
+    return render_template('tasks/_board_rows.html', tasks=page.tasks, more_url=more_url,
+                           priorities=PRIORITY_LABELS)
+
 @bp.route('/test')
 @login_required
 def test():
-    print("=== Test route called ===")
+    logger.debug("Tasks test route called")
     return jsonify({'success': True, 'message': 'Tasks blueprint is working'})
 
 @bp.route('/update', methods=['POST'])
 @login_required
 def update_task():
     try:
-        print("=== Starting task update ===")
         data = request.get_json()
-        print("Request data:", data)
         if not data:
-            print("No JSON data received")
             return jsonify({'success': False, 'error': 'No JSON data received'}), 400
             
         task_id = data.get('task_id')
         task_list_id = data.get('task_list_id')
-        print("Task ID:", task_id)
-        print("Task List ID:", task_list_id)
 
         if not task_id or not task_list_id:
-            print("Missing task_id or task_list_id")
             return jsonify({'success': False, 'error': 'Missing task_id or task_list_id'}), 400
             
         updates = {}
@@ -50,38 +103,31 @@ def update_task():
                 due_date = datetime.fromisoformat(data['due'])
                 updates['due'] = due_date.isoformat() + 'Z'
             except ValueError as e:
-                print("Error parsing due date:", e)
                 return jsonify({'success': False, 'error': f'Invalid date format: {e}'}), 400
         
-        print("Updates to apply:", updates)
+        logger.debug("Updating task %s in list %s: %s", task_id, task_list_id, LazyJson(updates))
         
         try:
-            print("Getting tasks service...")
             service = get_tasks_service(current_user.id)
-            print("Getting current task...")
-            task = service.tasks().get(tasklist=task_list_id, task=task_id).execute()
-            print("Current task:", task)
+            task = google_api.execute(service.tasks().get(tasklist=task_list_id, task=task_id), 'tasks.get')
             
             # Update task with new values
             task.update(updates)
-            print("Task after updates:", task)
             
             # Send update to Google Tasks API
-            print("Sending update to Google Tasks API...")
-            updated_task = service.tasks().update(
+            updated_task = google_api.execute(service.tasks().update(
                 tasklist=task_list_id,
                 task=task_id,
                 body=task
-            ).execute()
-            print("Update successful:", updated_task)
+            ), 'tasks.update')
+            logger.debug("Updated task: %s", LazyJson(updated_task))
+            invalidate_user_tasks(current_user.id)
             
             return jsonify({'success': True, 'task': updated_task})
         except Exception as e:
-            print("Error updating task:", e)
-            logging.error(f"Error updating task: {e}")
+            logger.error("Error updating task %s: %s", task_id, e)
             return jsonify({'success': False, 'error': str(e)}), 500
             
     except Exception as e:
-        print("Unexpected error in update_task:", e)
-        logging.error(f"Unexpected error in update_task: {e}")
+        logger.error("Unexpected error in update_task: %s", e, exc_info=True)
         return jsonify({'success': False, 'error': 'Server error'}), 500
@@ -0,0 +1,428 @@
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+import argparse
+import atexit
+import errno
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+
+# Get a logger for this module
+logger = logging.getLogger('famos.server')
+
+# Set for a master started by USR2: the listening socket it inherits, and the old master to retire
+LISTEN_FD_ENV = 'FAMOS_LISTEN_FD'
+REPLACE_PID_ENV = 'FAMOS_REPLACE_PID'
+# Set in each worker: its ID, unique among the workers this master has started
+WORKER_ID_ENV = 'FAMOS_WORKER_ID'
+
+THREADS_PER_WORKER = 4
+LISTEN_BACKLOG = 2048
+
+
+def available_cpus():
+    """CPUs this process may run on, which can be fewer than the machine has (e.g. in a container)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _parse_bind(bind):
+    host, _, port = bind.rpartition(':')
+    return host.strip('[]') or '127.0.0.1', int(port)
+
+
+class _RequestHandler(WSGIRequestHandler):
+    # One request per connection, so an idle keep-alive client can't hold one
+    # of the worker's few threads; run behind a proxy that keeps client connections open
+    protocol_version = 'HTTP/1.0'
+    # Seconds a client may take to send its request
+    timeout = 30
+    access_log = False
+
+    def log_request(self, code='-', size='-'):
+        if self.access_log:
+            super().log_request(code, size)
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """A Werkzeug server that handles connections on a fixed pool of threads.
+
+    A connection is only accepted once a thread is free for it, so work this
+    worker can't take yet stays in the shared listen queue for its siblings.
+    """
+
+    def __init__(self, host, app, fd, threads, handler, master_pid):
+        self.master_pid = master_pid
+        self._slots = threading.BoundedSemaphore(threads)
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix='famos-request')
+        self._stopping = False
+        super().__init__(host, 0, app, handler=handler, fd=fd)
+        # Sibling workers race for each connection; the losers get EAGAIN instead of blocking
+        self.socket.setblocking(False)
+
+    def get_request(self):
+        if not self._slots.acquire(timeout=0.5):
+            raise BlockingIOError(errno.EAGAIN, 'no free request thread')
+        try:
+            return super().get_request()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request(self, request, client_address):
+        try:
+            self._pool.submit(self._process, request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def stop(self):
+        """Stop accepting connections; serve_forever then returns. Safe to call from a signal handler."""
+        if not self._stopping:
+            self._stopping = True
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def service_actions(self):
+        # Orphaned workers would otherwise keep serving after the master dies
+        if os.getppid() != self.master_pid:
+            self.stop()
+
+    def drain(self):
+        """Wait for requests that are still running."""
+        self._pool.shutdown(wait=True)
+
+
+class PreforkServer:
+    """Serve a WSGI app from forked worker processes sharing one listening socket.
+
+    The master calls ``app_factory`` and then ``preload(app)`` once, before
+    forking, so workers share the loaded code and warmed caches
+    copy-on-write. Each worker calls ``post_fork(app)``, serves connections
+    on ``threads`` threads and calls ``worker_exit(app)`` once it has
+    stopped. Dead workers are replaced. Whenever the set of current workers
+    changes, the master calls ``workers_changed(app, worker_ids)`` with the
+    ``FAMOS_WORKER_ID`` of each.
+
+    Signals to the master:
+      TERM, INT   stop gracefully, giving requests ``graceful_timeout`` seconds
+      HUP         replace every worker with a fresh fork, gracefully
+      USR2        start a new master running the current code on the same
+                  socket; once its workers are up it stops this one
+      TTIN, TTOU  add or remove a worker
+    """
+
+    def __init__(self, app_factory, bind='127.0.0.1:8000', workers=None, threads=None,
+                 graceful_timeout=30.0, access_log=False, preload=None, post_fork=None, worker_exit=None,
+                 workers_changed=None):
+        self.app_factory = app_factory
+        self.bind = bind
+        self.workers = workers or available_cpus()
+        self.threads = threads or THREADS_PER_WORKER
+        self.graceful_timeout = graceful_timeout
+        self.access_log = access_log
+        self.preload = preload
+        self.post_fork = post_fork
+        self.worker_exit = worker_exit
+        self.workers_changed = workers_changed
+        self.app = None
+        self.socket = None
+        self.children = {}   # pid -> generation
+        self.worker_ids = {}  # pid -> worker ID
+        self.retiring = {}   # pid -> time by which it must have exited
+        self.generation = 0
+        self._spawned = 0
+        self._reported = None
+        self._signals = []
+        self._wakeup = None
+
+    def _listen(self):
+        inherited = os.environ.pop(LISTEN_FD_ENV, None)
+        if inherited:
+            sock = socket.socket(fileno=int(inherited))
+        else:
+            host, port = _parse_bind(self.bind)
+            sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((host, port))
+            sock.listen(LISTEN_BACKLOG)
+        sock.set_inheritable(False)
+        return sock
+
+    @property
+    def address(self):
+        host, port = self.socket.getsockname()[:2]
+        return f'{host}:{port}'
+
+    def run(self):
+        """Run the master until it is stopped; returns the exit status."""
+        self.socket = self._listen()
+        self.app = self.app_factory()
+        if self.preload is not None:
+            self.preload(self.app)
+        # Objects loaded so far are never collected, so the collector doesn't
+        # write to (and un-share) their pages in every worker
+        gc.collect()
+        gc.freeze()
+
+        self._install_signals()
+        self.generation = 1
+        for _ in range(self.workers):
+            self._spawn()
+        logger.info("Listening on http://%s with %d workers of %d threads",
+                    self.address, self.workers, self.threads)
+
+        replace = os.environ.pop(REPLACE_PID_ENV, None)
+        if replace:
+            logger.info("Taking over from master %s", replace)
+            self._kill(int(replace), signal.SIGTERM)
+
+        try:
+            return self._loop()
+        finally:
+            self.socket.close()
+
+    def _install_signals(self):
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        os.set_blocking(write_fd, False)
+        self._wakeup = (read_fd, write_fd)
+        signal.set_wakeup_fd(write_fd)
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR2,
+                    signal.SIGTTIN, signal.SIGTTOU, signal.SIGCHLD):
+            signal.signal(sig, lambda signum, frame: self._signals.append(signum))
+
+    def _loop(self):
+        while True:
+            self._reap()
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    return self._stop()
+                if signum == signal.SIGHUP:
+                    self._reload()
+                elif signum == signal.SIGUSR2:
+                    self._reexec()
+                elif signum == signal.SIGTTIN:
+                    self.workers += 1
+                elif signum == signal.SIGTTOU:
+                    self.workers = max(1, self.workers - 1)
+            self._maintain()
+            self._report_workers()
+            try:
+                select.select([self._wakeup[0]], [], [], 1.0)
+                os.read(self._wakeup[0], 4096)
+            except (BlockingIOError, InterruptedError):
+                pass
+
+    def _spawn(self):
+        self._spawned += 1
+        worker_id = str(self._spawned)
+        pid = os.fork()
+        if pid:
+            self.children[pid] = self.generation
+            self.worker_ids[pid] = worker_id
+            return pid
+        os.environ[WORKER_ID_ENV] = worker_id
+        status = 0
+        try:
+            self._worker_main()
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+            status = 1
+        finally:
+            # Flush logs, metrics and other buffers, but don't unwind into the master's code
+            atexit._run_exitfuncs()
+            os._exit(status)
+
+    def _worker_main(self):
+        master_pid = os.getppid()
+        signal.set_wakeup_fd(-1)
+        os.close(self._wakeup[0])
+        os.close(self._wakeup[1])
+        for sig in (signal.SIGHUP, signal.SIGUSR2, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, signal.SIG_IGN)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+        if self.post_fork is not None:
+            self.post_fork(self.app)
+        handler = type('RequestHandler', (_RequestHandler,), {'access_log': self.access_log})
+        host = self.socket.getsockname()[0]
+        server = _PooledWSGIServer(host, self.app, self.socket.fileno(), self.threads, handler, master_pid)
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: server.stop())
+        server.serve_forever(poll_interval=0.5)
+        server.drain()
+        if self.worker_exit is not None:
+            self.worker_exit(self.app)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            generation = self.children.pop(pid, None)
+            self.worker_ids.pop(pid, None)
+            expected = self.retiring.pop(pid, None) is not None
+            if generation is not None and not expected:
+                logger.warning("Worker %d exited unexpectedly (status %d)", pid, status)
+
+    def _maintain(self):
+        current = [pid for pid, generation in self.children.items()
+                   if generation == self.generation and pid not in self.retiring]
+        for _ in range(self.workers - len(current)):
+            self._spawn()
+        for pid in current[self.workers:]:
+            self._retire(pid)
+        self._kill_overdue()
+
+    def _report_workers(self):
+        if self.workers_changed is None:
+            return
+        current = sorted((self.worker_ids[pid] for pid, generation in self.children.items()
+                          if generation == self.generation and pid not in self.retiring), key=int)
+        if current != self._reported:
+            self._reported = current
+            try:
+                self.workers_changed(self.app, current)
+            except Exception:
+                logger.exception("workers_changed hook failed")
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                logger.warning("Worker %d didn't stop in %.0fs, killing it", pid, self.graceful_timeout)
+                self._kill(pid, signal.SIGKILL)
+                self.retiring[pid] = now + 3600
+
+    def _retire(self, pid):
+        if pid not in self.retiring:
+            self.retiring[pid] = time.monotonic() + self.graceful_timeout
+            self._kill(pid, signal.SIGTERM)
+
+    def _kill(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _reload(self):
+        logger.info("Reloading: replacing %d workers", len(self.children))
+        old = list(self.children)
+        self.generation += 1
+        for _ in range(self.workers):
+            self._spawn()
+        for pid in old:
+            self._retire(pid)
+
+    def _reexec(self):
+        logger.info("Starting a new master on the same socket")
+        env = dict(os.environ)
+        env[LISTEN_FD_ENV] = str(self.socket.fileno())
+        env[REPLACE_PID_ENV] = str(os.getpid())
+        argv = getattr(sys, 'orig_argv', None) or [sys.executable] + sys.argv
+        if os.fork() == 0:
+            try:
+                signal.set_wakeup_fd(-1)
+                self.socket.set_inheritable(True)
+                os.execve(sys.executable, argv, env)
+            finally:
+                os._exit(1)
+
+    def _stop(self):
+        logger.info("Stopping %d workers", len(self.children))
+        for pid in list(self.children):
+            self._retire(pid)
+        while self.children:
+            self._reap()
+            self._kill_overdue()
+            time.sleep(0.1)
+        return 0
+
+
+def _preload_famos(app):
+    from famos import db
+    from famos.services.warmup import warm_shared_state
+    warm_shared_state(app)
+    warmup = app.extensions.get('famos_warmup')
+    if warmup is not None:
+        # Workers report readiness for the whole host through this directory
+        warmup.prepare_host()
+    registry = app.extensions.get('famos_metrics')
+    if registry is not None:
+        # Workers share metrics through files; counters from an earlier run are stale
+        registry.share_directory(registry.directory or os.path.join(app.instance_path, 'metrics'))
+    hasher = app.extensions.get('famos_passwords')
+    if hasher is not None:
+        # Workers start their own pool on first use; wait, so none inherit processes started here
+        hasher.shutdown(wait=True)
+    # Connections must not be shared with the workers
+    db.get_engine(app).dispose()
+
+
+def _post_fork_famos(app):
+    warmup = app.extensions.get('famos_warmup')
+    if warmup is not None:
+        warmup.join_host(os.getppid(), os.environ[WORKER_ID_ENV])
+        # Start warming now rather than on the first request; /readyz reports when it's done
+        warmup.start(app)
+
+
+def _workers_changed_famos(app, worker_ids):
+    warmup = app.extensions.get('famos_warmup')
+    if warmup is not None:
+        warmup.expect_workers(worker_ids)
+
+
+def _worker_exit_famos(app):
+    hasher = app.extensions.get('famos_passwords')
+    if hasher is not None:
+        # Wait here: the exit handlers stop the queue that tells the pool's processes to exit
+        hasher.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve famOS from preforked worker processes.')
+    parser.add_argument('--bind', default=os.getenv('FAMOS_BIND', '127.0.0.1:8000'),
+                        help='host:port to listen on (default 127.0.0.1:8000)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('FAMOS_WORKERS', 0)),
+                        help='worker processes (default: one per available CPU)')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('FAMOS_THREADS', 0)),
+                        help=f'request threads per worker (default {THREADS_PER_WORKER})')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help='seconds workers get to finish requests when stopping')
+    parser.add_argument('--access-log', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+
+    from famos import create_app
+    server = PreforkServer(
+        create_app, bind=args.bind, workers=args.workers or None, threads=args.threads or None,
+        graceful_timeout=args.graceful_timeout, access_log=args.access_log,
+        preload=_preload_famos, post_fork=_post_fork_famos, worker_exit=_worker_exit_famos,
+        workers_changed=_workers_changed_famos
+    )
+    return server.run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+from flask import current_app
+from sqlalchemy import func, tuple_
+from famos import db
+from famos.models.contact import Contact
+from famos.cache import Cache
+import base64
+import json
+import logging
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.contact_directory')
+
+CONTACTS_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+# Sort name -> (key columns, descending). Every key ends in the primary key
+# so it is unique, and each one is backed by an index on contact.
+SORTS = {
+    'name': ((Contact.last_name, Contact.first_name, Contact.id), False),
+    'name_desc': ((Contact.last_name, Contact.first_name, Contact.id), True),
+    'newest': ((Contact.created_at, Contact.id), True),
+}
+
+
+class InvalidContactQuery(ValueError):
+    """Raised for unknown sorts or cursors that can't be parsed."""
+
+
+@dataclass
+class ContactPage:
+    contacts: List[Contact] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+def init_app(app):
+    """Set up the role count cache, shared by the workers, for ``app``."""
+    app.config.setdefault('CONTACT_COUNTS_TTL', 300)
+    app.extensions['famos_contact_counts'] = Cache.from_app(app, 'contact_counts', app.config['CONTACT_COUNTS_TTL'])
+
+
+def _cache():
+    return current_app.extensions['famos_contact_counts']
+
+
+def _encode(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode(cursor, sort):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if sort == 'newest':
+            return [datetime.fromisoformat(values[0]), int(values[1])]
+        last_name, first_name, contact_id = values
+        return [str(last_name), str(first_name), int(contact_id)]
+    except (ValueError, TypeError):
+        raise InvalidContactQuery('Invalid cursor')
+
+
+def get_contacts_page(family_id, sort='name', role=None, cursor=None, limit=CONTACTS_PAGE_SIZE):
+    """Return one keyset-paginated page of a family's contacts.
+
+    The cursor holds the sort key of the last contact shown, so each page is
+    an index range scan of ``limit`` rows however many contacts come before it.
+    """
+    if sort not in SORTS:
+        raise InvalidContactQuery(f'Unknown sort: {sort}')
+    columns, descending = SORTS[sort]
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    query = Contact.query.filter(Contact.family_id == family_id)
+    if role:
+        query = query.filter(Contact.role == role)
+    if cursor:
+        key = tuple_(*columns)
+        after = tuple_(*_decode(cursor, sort))
+        query = query.filter(key < after if descending else key > after)
+    order = [column.desc() if descending else column for column in columns]
+    contacts = query.order_by(*order).limit(limit + 1).all()
+
+    page = ContactPage(contacts=contacts[:limit])
+    if len(contacts) > limit:
+        last = page.contacts[-1]
+        page.next_cursor = _encode([getattr(last, column.key) for column in columns])
+    return page
+
+
+def role_counts(family_id):
+    """Number of contacts per role for a family, cached until the next change."""
+    counts = _cache().get(family_id)
+    if counts is None:
+        rows = db.session.query(Contact.role, func.count(Contact.id)).filter(
+            Contact.family_id == family_id
+        ).group_by(Contact.role).all()
+        counts = dict(rows)
+        _cache().set(family_id, counts)
+    return counts
+
+
+def invalidate_role_counts(family_id):
+    """Drop the cached role counts after a contact was added, edited or removed."""
+    if family_id is not None:
+        _cache().delete(family_id)
@@ -0,0 +1,91 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+from flask import g
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from famos import db
+from famos.models.family import Family
+from famos.models.user import User
+from famos.models.family_member import FamilyMember
+from famos.services.contact_directory import get_contacts_page, role_counts
+import logging
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.family_roster')
+
+# Contacts shown with the family; the contacts page lists the rest
+KEY_CONTACTS = 10
+
+
+def _by_name(person):
+    return ((person.last_name or '').lower(), (person.first_name or '').lower(), person.id)
+
+
+@dataclass
+class FamilyRoster:
+    """Everyone attached to a family: its users and dependents, and its first contacts by name.
+
+    ``contacts`` holds at most ``KEY_CONTACTS``; ``contact_count`` is the total.
+    """
+    family: Family
+    users: List = field(default_factory=list)
+    members: List = field(default_factory=list)
+    contacts: List = field(default_factory=list)
+    contact_count: int = 0
+
+    @property
+    def counts(self):
+        return {'users': len(self.users), 'members': len(self.members), 'contacts': self.contact_count}
+
+    def has_user(self, user_id):
+        return any(user.id == user_id for user in self.users)
+
+
+def init_app(app):
+    """Clear memoized rosters when each request ends."""
+    @app.teardown_request
+    def _forget_rosters(exc):
+        g.pop('_famos_rosters', None)
+
+
+def _load(family_id):
+    # The identity loader usually has the family and its user in the session
+    # already; otherwise fetch both in one joined query
+    family = db.session.identity_map.get(identity_key(Family, family_id))
+    if family is not None and 'user' in inspect(family).unloaded:
+        user = db.session.identity_map.get(identity_key(User, family.user_id))
+        if user is not None:
+            set_committed_value(family, 'user', user)
+    if family is None or 'user' in inspect(family).unloaded:
+        family = Family.query.options(joinedload(Family.user)).filter_by(id=family_id).first()
+        if family is None:
+            return None
+
+    # Fill the members directly so nothing lazy-loads them later
+    if 'members' in inspect(family).unloaded:
+        set_committed_value(family, 'members', FamilyMember.query.filter_by(family_id=family_id).all())
+    # Contacts can run to hundreds; only the first few are shown, with the (cached) total
+    return FamilyRoster(
+        family=family,
+        users=[family.user] if family.user is not None else [],
+        members=sorted(family.members, key=_by_name),
+        contacts=get_contacts_page(family_id, 'name', limit=KEY_CONTACTS).contacts,
+        contact_count=sum(role_counts(family_id).values())
+    )
+
+
+def get_family_roster(family_id) -> Optional[FamilyRoster]:
+    """Return the roster for ``family_id``, loading it at most once per request."""
+    if family_id is None:
+        return None
+    memo = g.setdefault('_famos_rosters', {})
+    if family_id not in memo:
+        memo[family_id] = _load(family_id)
+    return memo[family_id]
+
+
+def forget_roster(family_id):
+    """Drop the memoized roster after the family's people changed in this request."""
+    g.setdefault('_famos_rosters', {}).pop(family_id, None)
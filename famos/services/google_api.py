@@ -0,0 +1,50 @@
+from famos.services.google_ledger import record_call
+from famos.services.metrics import record_google_call
+from famos.services.tracing import span
+import logging
+import time
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.google_api')
+
+
+def _measure_response(api_request, size):
+    # HttpRequest hands the raw body to postproc before parsing it; note its length
+    postproc = getattr(api_request, 'postproc', None)
+    if not callable(postproc):
+        return
+
+    def measured(resp, content):
+        size[0] = len(content or b'')
+        return postproc(resp, content)
+    api_request.postproc = measured
+
+
+def execute(api_request, method):
+    """Execute a Google API request, recording its latency and any error under ``method``.
+
+    ``method`` is the API method name, e.g. ``'tasks.list'``. Errors are
+    labelled with the HTTP status for API errors and the exception class
+    otherwise, then re-raised. Every call also goes to the usage ledger.
+    """
+    started = time.perf_counter()
+    error = None
+    size = [0]
+    _measure_response(api_request, size)
+    with span(f'google {method}', kind='CLIENT', **{'google.method': method}) as current:
+        try:
+            return api_request.execute()
+        except Exception as e:
+            # Imported lazily, like the rest of the Google client libraries
+            from googleapiclient.errors import HttpError
+            if isinstance(e, HttpError):
+                error = str(getattr(e.resp, 'status', 'http'))
+            else:
+                error = type(e).__name__
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            record_google_call(method, elapsed, error)
+            record_call(method, error or 'ok', elapsed, size[0])
+            if current is not None and error is not None:
+                current.set_tag('error', error)
@@ -0,0 +1,322 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import List, Optional
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from famos import db
+from famos.models.google_api_usage import GoogleApiCall, GoogleApiDailyUsage
+from famos.models.user import User
+from famos.services.tracing import current_trace_id
+import atexit
+import logging
+import os
+import threading
+import time
+import weakref
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.google_ledger')
+
+ROLLUP_KEY = ('day', 'user_id', 'endpoint', 'method')
+ROLLUP_TOTALS = ('calls', 'errors', 'latency_ms', 'response_bytes')
+
+
+class GoogleApiLedger:
+    """Buffer Google API call records and write them to the database in batches.
+
+    Each batch is one multi-row insert into the ledger plus one upsert of the
+    daily rollup rows it touches, so the rollups stay current without ever
+    re-scanning the ledger. With an ``interval``, a background thread writes
+    the buffer every ``interval`` seconds (sooner once it holds
+    ``batch_size`` calls); without one, it's written when full or on
+    ``flush()``. Ledger rows older than ``retention_days`` are pruned; the
+    rollups are kept.
+    """
+
+    def __init__(self, engine, batch_size=200, interval=5.0, max_buffer=10000, retention_days=14):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self.retention_days = retention_days
+        self.dropped = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+        self._last_prune = 0.0
+        _ledgers.add(self)
+
+    def _ensure_running(self):
+        # A forked worker must not write calls its parent already buffered
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._buffer = []
+            self._wake = threading.Event()
+        threading.Thread(target=self._run, name='famos-google-ledger', daemon=True).start()
+
+    def record(self, entry):
+        if self.interval:
+            self._ensure_running()
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            if self.interval:
+                self._wake.set()
+            else:
+                self.flush()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+            if time.monotonic() - self._last_prune >= 3600:
+                self._last_prune = time.monotonic()
+                try:
+                    self.prune()
+                except Exception as e:
+                    logger.warning("Could not prune the Google API ledger: %s", e)
+
+    def flush(self):
+        """Write everything buffered; returns the number of calls written."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        try:
+            self._write(rows)
+        except Exception as e:
+            logger.error("Could not write %d Google API ledger rows: %s", len(rows), e)
+            return 0
+        return len(rows)
+
+    def _write(self, rows):
+        rollups = {}
+        for row in rows:
+            key = (row['created_at'].date(), row['user_id'] or 0, row['endpoint'], row['method'])
+            totals = rollups.get(key)
+            if totals is None:
+                totals = rollups[key] = dict(zip(ROLLUP_KEY, key), calls=0, errors=0, latency_ms=0, response_bytes=0)
+            totals['calls'] += 1
+            totals['errors'] += row['status'] != 'ok'
+            totals['latency_ms'] += row['latency_ms']
+            totals['response_bytes'] += row['response_bytes']
+
+        with self.engine.begin() as conn:
+            conn.execute(GoogleApiCall.__table__.insert(), rows)
+            table = GoogleApiDailyUsage.__table__
+            insert = postgresql.insert if conn.dialect.name == 'postgresql' else sqlite.insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(ROLLUP_KEY),
+                set_={name: table.c[name] + stmt.excluded[name] for name in ROLLUP_TOTALS}
+            )
+            conn.execute(stmt, list(rollups.values()))
+
+    def prune(self, now=None):
+        """Delete ledger rows past the retention period; returns how many went."""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        with self.engine.begin() as conn:
+            result = conn.execute(GoogleApiCall.__table__.delete().where(GoogleApiCall.created_at < cutoff))
+        return result.rowcount
+
+
+# Every ledger in this process, so buffered calls are written at exit
+_ledgers = weakref.WeakSet()
+
+
+def _flush_at_exit():
+    for ledger in list(_ledgers):
+        if ledger._pid in (None, os.getpid()):
+            ledger.flush()
+
+
+atexit.register(_flush_at_exit)
+
+
+def init_app(app, db):
+    """Record every Google API call made while serving ``app`` in the ledger."""
+    app.config.setdefault('GOOGLE_LEDGER_ENABLED', True)
+    app.config.setdefault('GOOGLE_LEDGER_BATCH_SIZE', 200)
+    # Under test, calls are written when the batch fills or on flush()
+    app.config.setdefault('GOOGLE_LEDGER_FLUSH_INTERVAL', 0 if app.testing else 5.0)
+    app.config.setdefault('GOOGLE_LEDGER_RETENTION_DAYS', 14)
+    # The Google Cloud project's daily request quota, shown on the report when set
+    app.config.setdefault('GOOGLE_API_DAILY_QUOTA', None)
+    if not app.config['GOOGLE_LEDGER_ENABLED']:
+        return None
+
+    ledger = GoogleApiLedger(
+        db.get_engine(app),
+        batch_size=app.config['GOOGLE_LEDGER_BATCH_SIZE'],
+        interval=app.config['GOOGLE_LEDGER_FLUSH_INTERVAL'],
+        retention_days=app.config['GOOGLE_LEDGER_RETENTION_DAYS']
+    )
+    app.extensions['famos_google_ledger'] = ledger
+    return ledger
+
+
+def get_ledger():
+    """Return the current app's ledger, or None when it's off."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('famos_google_ledger')
+
+
+def record_call(method, status, seconds, response_bytes=0):
+    """Add one Google API call, attributed to the current user and endpoint, to the ledger."""
+    ledger = get_ledger()
+    if ledger is None:
+        return
+    user_id, endpoint = None, ''
+    if has_request_context():
+        endpoint = request.endpoint or 'unmatched'
+        if getattr(current_user, 'is_authenticated', False):
+            user_id = current_user.id
+        request_id = current_trace_id() or g.get('_famos_ledger_request_id')
+        if request_id is None:
+            request_id = g._famos_ledger_request_id = os.urandom(16).hex()
+    else:
+        request_id = os.urandom(16).hex()
+    ledger.record({
+        'created_at': datetime.utcnow(),
+        'user_id': user_id,
+        'endpoint': endpoint[:64],
+        'method': method[:64],
+        'status': status[:32],
+        'latency_ms': int(seconds * 1000),
+        'response_bytes': response_bytes,
+        'request_id': request_id,
+    })
+
+
+def recent_users(limit, days=3, today=None):
+    """IDs of up to ``limit`` users who called Google in the last ``days`` days.
+
+    Read from the daily rollups: the users active most recently come first,
+    and the busiest first among those active on the same day.
+    """
+    today = today or datetime.utcnow().date()
+    usage = GoogleApiDailyUsage
+    rows = (
+        db.session.query(usage.user_id)
+        .filter(usage.day > today - timedelta(days=days), usage.user_id != 0)
+        .group_by(usage.user_id)
+        .order_by(func.max(usage.day).desc(), func.sum(usage.calls).desc())
+        .limit(limit)
+    )
+    return [user_id for user_id, in rows]
+
+
+@dataclass
+class ConsumerUsage:
+    user_id: int
+    email: Optional[str]
+    calls: int
+    errors: int
+    response_bytes: int
+    share: float
+
+
+@dataclass
+class MethodUsage:
+    method: str
+    calls: int
+    errors: int
+    avg_latency_ms: float
+
+    @property
+    def error_rate(self):
+        return self.errors / self.calls if self.calls else 0.0
+
+
+@dataclass
+class ViewUsage:
+    endpoint: str
+    calls: int
+    views: int
+
+    @property
+    def calls_per_view(self):
+        return self.calls / self.views if self.views else 0.0
+
+
+@dataclass
+class UsageReport:
+    days: int
+    since: date
+    calls: int = 0
+    errors: int = 0
+    today_calls: int = 0
+    daily_quota: Optional[int] = None
+    consumers: List[ConsumerUsage] = field(default_factory=list)
+    methods: List[MethodUsage] = field(default_factory=list)
+    views: List[ViewUsage] = field(default_factory=list)
+    daily: list = field(default_factory=list)
+
+    @property
+    def error_rate(self):
+        return self.errors / self.calls if self.calls else 0.0
+
+
+def usage_report(days=7, limit=20, today=None):
+    """Summarize Google API usage over the last ``days`` days, today included.
+
+    Totals, top consumers and per-method error rates come from the daily
+    rollups; calls per view come from the ledger, which has each request's
+    calls, so the window there is capped by the ledger's retention.
+    """
+    today = today or datetime.utcnow().date()
+    since = today - timedelta(days=days - 1)
+    report = UsageReport(days=days, since=since, daily_quota=current_app.config.get('GOOGLE_API_DAILY_QUOTA'))
+    usage = GoogleApiDailyUsage
+
+    for day, calls, errors in (db.session.query(usage.day, func.sum(usage.calls), func.sum(usage.errors))
+                               .filter(usage.day >= since).group_by(usage.day).order_by(usage.day)):
+        report.daily.append((day, calls, errors))
+        report.calls += calls
+        report.errors += errors
+        if day == today:
+            report.today_calls = calls
+
+    consumers = (db.session.query(usage.user_id, func.sum(usage.calls), func.sum(usage.errors),
+                                  func.sum(usage.response_bytes))
+                 .filter(usage.day >= since).group_by(usage.user_id)
+                 .order_by(func.sum(usage.calls).desc()).limit(limit).all())
+    user_ids = [user_id for user_id, *_ in consumers if user_id]
+    emails = dict(db.session.query(User.id, User.email).filter(User.id.in_(user_ids))) if user_ids else {}
+    report.consumers = [
+        ConsumerUsage(user_id, emails.get(user_id), calls, errors, response_bytes,
+                      calls / report.calls if report.calls else 0.0)
+        for user_id, calls, errors, response_bytes in consumers
+    ]
+
+    report.methods = [
+        MethodUsage(method, calls, errors, latency_ms / calls if calls else 0.0)
+        for method, calls, errors, latency_ms in (
+            db.session.query(usage.method, func.sum(usage.calls), func.sum(usage.errors), func.sum(usage.latency_ms))
+            .filter(usage.day >= since).group_by(usage.method).order_by(func.sum(usage.calls).desc())
+        )
+    ]
+
+    call = GoogleApiCall
+    report.views = [
+        ViewUsage(endpoint or '(no request)', calls, views)
+        for endpoint, calls, views in (
+            db.session.query(call.endpoint, func.count(call.id), func.count(func.distinct(call.request_id)))
+            .filter(call.created_at >= datetime.combine(since, dt_time.min))
+            .group_by(call.endpoint).order_by(func.count(call.id).desc())
+        )
+    ]
+    return report
@@ -1,25 +1,103 @@
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from flask import current_app
 from famos.models.integrations import GoogleIntegration
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import json
 import os
 import logging
+import re
 import sys
 import traceback
-from google.auth.transport.requests import Request
 from famos.extensions import db
+from famos.services.task_record import TaskRecord
+from famos.services.identity import get_google_integration, invalidate_identity
+from famos.services import google_api
+from famos.services.tracing import traced
+from famos.utils.logger import LazyJson
+from famos.cache import Cache
 
 # Get a logger for this module
 logger = logging.getLogger('famos.services.google_tasks')
 
+# Largest page the Tasks API allows; its default of 20 silently truncates big lists
+TASKS_PAGE_SIZE = 100
+
+SNAPSHOT_TOKEN_RE = re.compile(r'^[0-9a-f]{16}$')
+
+def _encode_entry(entry):
+    task_lists, tasks = entry
+    return {'lists': list(task_lists), 'tasks': [task.to_dict() for task in tasks]}
+
+def _decode_entry(value):
+    return tuple(value['lists']), tuple(TaskRecord.coerce(row) for row in value['tasks'])
+
+def _encode_snapshot(tasks):
+    return [task.to_dict() for task in tasks]
+
+def _decode_snapshot(value):
+    return tuple(TaskRecord.coerce(row) for row in value)
+
+def init_app(app):
+    """Set up the cache of each user's task lists and tasks, shared by the workers, for ``app``."""
+    # Off under test, where each request should see what the mocked API returns now
+    app.config.setdefault('GOOGLE_TASKS_CACHE_TTL', 0 if app.testing else 60)
+    app.config.setdefault('GOOGLE_TASKS_CACHE_SIZE', 256)
+    if app.config['GOOGLE_TASKS_CACHE_TTL']:
+        app.extensions['famos_google_tasks'] = Cache.from_app(
+            app, 'google_task_lists', app.config['GOOGLE_TASKS_CACHE_TTL'],
+            local_size=app.config['GOOGLE_TASKS_CACHE_SIZE'],
+            encode=_encode_entry,
+            decode=_decode_entry
+        )
+    # The dashboard's fragments page through the tasks it rendered from
+    app.config.setdefault('GOOGLE_TASKS_SNAPSHOT_TTL', 900)
+    app.extensions['famos_task_snapshots'] = Cache.from_app(
+        app, 'google_task_snapshots', app.config['GOOGLE_TASKS_SNAPSHOT_TTL'],
+        local_size=64,
+        encode=_encode_snapshot,
+        decode=_decode_snapshot
+    )
+
+def _task_cache():
+    return current_app.extensions.get('famos_google_tasks')
+
+def invalidate_user_tasks(user_id):
+    """Drop the cached tasks for ``user_id`` after one of them changed."""
+    cache = _task_cache()
+    if cache is not None and user_id is not None:
+        cache.delete(int(user_id))
+
+def snapshot_tasks(user_id, tasks):
+    """Keep ``tasks`` for later fragments of the same page; returns the snapshot's token.
+
+    Fragment URLs carry the token, so "load more" and subtask requests slice
+    what the page was rendered from instead of fetching the list again.
+    """
+    token = os.urandom(8).hex()
+    current_app.extensions['famos_task_snapshots'].set(f'{int(user_id)}:{token}', tuple(tasks))
+    return token
+
+def get_snapshot_tasks(user_id, token, list_id):
+    """The tasks of ``list_id`` in a snapshot, or None once it has expired."""
+    if not SNAPSHOT_TOKEN_RE.match(token or ''):
+        return None
+    tasks = current_app.extensions['famos_task_snapshots'].get(f'{int(user_id)}:{token}')
+    if tasks is None:
+        return None
+    return [task for task in tasks if task.list_id == list_id]
+
+@lru_cache(maxsize=None)
+def tasks_discovery_document():
+    """The Tasks API discovery document bundled with the client library, parsed once per process."""
+    from googleapiclient.discovery_cache import get_static_doc
+    return json.loads(get_static_doc('tasks', 'v1'))
+
+@traced()
 def get_tasks_service(user_id):
     """Get a Google Tasks service instance for the given user."""
-    logger.info(f"=== Getting tasks service for user {user_id} ===")
+    logger.debug("Getting tasks service for user %s", user_id)
     
-    integration = GoogleIntegration.query.filter_by(user_id=user_id).first()
+    integration = get_google_integration(user_id)
     if not integration:
         logger.error(f"No integration found for user {user_id}")
         raise ValueError(f"No integration found for user {user_id}")
@@ -29,9 +107,14 @@ def get_tasks_service(user_id):
         raise ValueError(f"No access token for user {user_id}")
         
     try:
-        logger.info(f"Creating credentials with token: {integration.access_token[:10]}...")
-        logger.info(f"Refresh token present: {bool(integration.refresh_token)}")
-        logger.info(f"Token expiry: {integration.token_expiry}")
+        # The Google client libraries take a while to import; workers that
+        # never talk to Google don't pay for them
+        from google.oauth2.credentials import Credentials
+        from google.auth.transport.requests import Request
+        from googleapiclient.discovery import build_from_document
+        
+        logger.debug("Creating credentials (refresh token present: %s, expiry: %s)",
+                     bool(integration.refresh_token), integration.token_expiry)
         
         # Check if we have all required config
         if not current_app.config.get('GOOGLE_CLIENT_ID'):
@@ -54,24 +137,24 @@ def get_tasks_service(user_id):
         if integration.token_expiry:
             expiry = datetime.fromisoformat(integration.token_expiry).replace(tzinfo=timezone.utc)
             if expiry < datetime.now(timezone.utc):
-                logger.info(f"Token expired at {expiry}, current time is {datetime.now(timezone.utc)}")
+                logger.info("Token for user %s expired at %s, refreshing", user_id, expiry)
                 if not integration.refresh_token:
                     logger.error("No refresh token available")
                     raise ValueError(f"Access token expired and no refresh token available for user {user_id}")
                     
-                logger.info("Attempting to refresh token...")
                 creds.refresh(Request())
                 
                 # Update the integration with new tokens
                 integration.access_token = creds.token
                 integration.token_expiry = creds.expiry.isoformat()
                 db.session.commit()
+                invalidate_identity(user_id)
                 
-                logger.info(f"Token refreshed successfully. New expiry: {integration.token_expiry}")
+                logger.info("Token refreshed for user %s, new expiry %s", user_id, integration.token_expiry)
         
-        logger.info("Building tasks service...")
-        service = build('tasks', 'v1', credentials=creds)
-        logger.info("Tasks service built successfully")
+        # Same document build() would read and parse from disk on every call
+        service = build_from_document(tasks_discovery_document(), credentials=creds)
+        logger.debug("Tasks service built for user %s", user_id)
         return service
         
     except Exception as e:
@@ -84,31 +167,31 @@ def standardize_date(date_str):
     if not date_str:
         return ""
         
-    logger.debug(f"Standardizing date: {date_str}")
+    logger.debug("Standardizing date: %s", date_str)
     
     try:
         # Try parsing different formats
         try:
             date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S.%fZ")
-            logger.debug(f"Parsed as format 1: %Y-%m-%dT%H:%M:%S.%fZ")
+            logger.debug("Parsed as format 1: %Y-%m-%dT%H:%M:%S.%fZ")
         except ValueError:
             try:
                 date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ")
-                logger.debug(f"Parsed as format 2: %Y-%m-%dT%H:%M:%SZ")
+                logger.debug("Parsed as format 2: %Y-%m-%dT%H:%M:%SZ")
             except ValueError:
                 try:
                     date = datetime.strptime(date_str, "%Y-%m-%d")
-                    logger.debug(f"Parsed as format 3: %Y-%m-%d")
+                    logger.debug("Parsed as format 3: %Y-%m-%d")
                 except ValueError:
                     try:
                         date = datetime.strptime(date_str, "%Y-%m-%dT%H:%M:%S%z")
-                        logger.debug(f"Parsed as format 4: %Y-%m-%dT%H:%M:%S%z")
+                        logger.debug("Parsed as format 4: %Y-%m-%dT%H:%M:%S%z")
                     except ValueError:
                         try:
                             date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                            logger.debug(f"Parsed as format 5: %Y-%m-%d %H:%M:%S")
+                            logger.debug("Parsed as format 5: %Y-%m-%d %H:%M:%S")
                         except ValueError:
-                            logger.error(f"Could not parse date: {date_str}")
+                            logger.error("Could not parse date: %s", date_str)
                             return date_str
         
         # Convert to UTC if it has a timezone
@@ -121,20 +204,47 @@ def standardize_date(date_str):
         
         # Convert to standard format
         result = date.strftime("%Y-%m-%dT%H:%M:%SZ")
-        logger.debug(f"Standardized date: {result}")
+        logger.debug("Standardized date: %s", result)
         return result
     except Exception as e:
         logger.error(f"Error standardizing date {date_str}: {str(e)}")
         return date_str
 
+@traced()
 def get_user_tasks(user_id):
-    """Fetch all tasks from Google Tasks for the given user."""
-    logger.info(f"=== Starting to fetch tasks for user {user_id} ===")
+    """Fetch all tasks from Google Tasks for the given user.
+
+    Complete results are kept for ``GOOGLE_TASKS_CACHE_TTL`` seconds, so
+    repeated page loads don't refetch every list.
+    """
+    return list(_load_user_tasks(user_id)[1])
+
+@traced()
+def get_task_lists(user_id):
+    """The user's task lists as ``{'id', 'title'}`` dicts, in Google's order.
+
+    With the task cache on they come from the same cached entry as the
+    tasks, so a warmed dashboard makes no Google calls at all.
+    """
+    if _task_cache() is None:
+        service = get_tasks_service(user_id)
+        task_lists_result = google_api.execute(service.tasklists().list(), 'tasklists.list')
+        return [{'id': tl['id'], 'title': tl['title']} for tl in task_lists_result.get('items', [])]
+    return [dict(task_list) for task_list in _load_user_tasks(user_id)[0]]
+
+def _load_user_tasks(user_id):
+    """Return ``(task lists, tasks)`` for the user, from the cache or fetched from Google."""
+    logger.debug("Fetching tasks for user %s", user_id)
+    
+    cache = _task_cache()
+    if cache is not None:
+        cached = cache.get(user_id)
+        if cached is not None:
+            logger.debug("Using %d cached tasks for user %s", len(cached[1]), user_id)
+            return cached
     
     try:
-        logger.debug("About to call get_tasks_service...")
         service = get_tasks_service(user_id)
-        logger.debug(f"get_tasks_service returned: {service}")
         
         if not service:
             error_msg = f"Could not create tasks service for user {user_id}"
@@ -142,84 +252,115 @@ def get_user_tasks(user_id):
             raise ValueError(error_msg)
         
         # Get all task lists
-        logger.info("Fetching task lists...")
         try:
-            task_lists_result = service.tasklists().list().execute()
-            logger.debug(f"Raw task lists response: {json.dumps(task_lists_result)}")
+            task_lists_result = google_api.execute(service.tasklists().list(), 'tasklists.list')
+            logger.debug("Raw task lists response: %s", LazyJson(task_lists_result))
         except Exception as e:
             logger.error(f"Error fetching task lists: {str(e)}")
             logger.error(traceback.format_exc())
             raise
             
         task_lists = task_lists_result.get('items', [])
-        logger.info(f"Found {len(task_lists)} task lists")
+        logger.debug("Found %d task lists", len(task_lists))
         
         all_tasks = []
+        complete = True
         
         # Get tasks from each task list
         for task_list in task_lists:
             list_id = task_list['id']
             list_title = task_list['title']
-            logger.info(f"Fetching tasks from list: {list_title} (ID: {list_id})")
+            logger.debug("Fetching tasks from list %s (ID: %s)", list_title, list_id)
             
             try:
-                # Get tasks from this list
-                tasks_result = service.tasks().list(tasklist=list_id).execute()
-                logger.debug(f"Raw tasks response for list {list_title}: {json.dumps(tasks_result)}")
-                
-                tasks = tasks_result.get('items', [])
-                logger.info(f"Found {len(tasks)} tasks in list {list_title}")
-                
-                # Process each task
-                for task in tasks:
-                    try:
-                        task_data = {
-                            'task_id': task.get('id', ''),
-                            'list_id': list_id,
-                            'title': task.get('title', ''),
-                            'notes': task.get('notes', ''),
-                            'due': standardize_date(task.get('due', '')),
-                            'status': task.get('status', ''),
-                            'list_name': list_title,
-                            'completed': task.get('completed', '')
-                        }
-                        
-                        # Log the raw task data for debugging
-                        logger.debug(f"Raw task data: {task}")
-                        logger.debug(f"Processed task data: {task_data}")
-                        
-                        all_tasks.append(task_data)
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing task in list {list_title}: {str(e)}")
-                        logger.error(f"Problem task data: {json.dumps(task)}")
-                        logger.error(traceback.format_exc())
-                        continue
-                    
+                all_tasks.extend(_fetch_list_tasks(service, list_id, list_title))
             except Exception as e:
                 logger.error(f"Error fetching tasks from list {list_title}: {str(e)}")
                 logger.error(traceback.format_exc())
+                complete = False
                 continue
                 
-        logger.info(f"=== Finished fetching tasks for user {user_id}. Found {len(all_tasks)} tasks ===")
-        return all_tasks
+        logger.info("Fetched %d tasks from %d lists for user %s", len(all_tasks), len(task_lists), user_id)
+        lists = tuple({'id': task_list['id'], 'title': task_list['title']} for task_list in task_lists)
+        # A list that failed may work on the next load; don't hide it until the entry expires
+        if cache is not None and complete:
+            cache.set(user_id, (lists, tuple(all_tasks)))
+        return lists, all_tasks
         
     except Exception as e:
         logger.error(f"Error in get_user_tasks: {str(e)}")
         logger.error(traceback.format_exc())
         raise
 
+@traced()
+def _fetch_list_tasks(service, list_id, list_title):
+    """Fetch every task in one list, following nextPageToken, as TaskRecords."""
+    list_tasks = []
+    page_token = None
+    
+    while True:
+        tasks_result = google_api.execute(service.tasks().list(
+            tasklist=list_id,
+            maxResults=TASKS_PAGE_SIZE,
+            pageToken=page_token
+        ), 'tasks.list')
+        logger.debug("Raw tasks response for list %s: %s", list_title, LazyJson(tasks_result))
+        
+        tasks = tasks_result.get('items', [])
+        logger.debug("Found %d tasks in list %s", len(tasks), list_title)
+        
+        # Process each task
+        for task in tasks:
+            try:
+                task_data = TaskRecord.from_google(
+                    task, list_id, list_title, due=standardize_date(task.get('due', ''))
+                )
+                
+                list_tasks.append(task_data)
+                
+            except Exception as e:
+                logger.error(f"Error processing task in list {list_title}: {str(e)}")
+                logger.error("Problem task data: %s", LazyJson(task))
+                logger.error(traceback.format_exc())
+                continue
+        
+        page_token = tasks_result.get('nextPageToken')
+        if not page_token:
+            return list_tasks
+
+@traced()
+def get_list_tasks(user_id, list_id):
+    """Fetch the tasks of a single Google task list for the given user.
+
+    With the task cache on they come from the user's cached tasks, so
+    paging through a list's fragments doesn't refetch it from Google.
+    """
+    logger.debug("Fetching tasks from list %s for user %s", list_id, user_id)
+    
+    if _task_cache() is not None:
+        return [task for task in get_user_tasks(user_id) if task.list_id == list_id]
+    
+    try:
+        service = get_tasks_service(user_id)
+        list_title = google_api.execute(service.tasklists().get(tasklist=list_id), 'tasklists.get').get('title', '')
+        return _fetch_list_tasks(service, list_id, list_title)
+    except Exception as e:
+        logger.error(f"Error in get_list_tasks: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise
+
+@traced()
 def update_task(user_id, task_list_id, task_id, updates):
     """Update a task with new information."""
-    logger.info(f"=== Updating task {task_id} in list {task_list_id} for user {user_id} ===")
-    logger.debug(f"Updates to apply: {json.dumps(updates)}")
+    logger.info("Updating task %s in list %s for user %s", task_id, task_list_id, user_id)
+    logger.debug("Updates to apply: %s", LazyJson(updates))
     
     try:
         service = get_tasks_service(user_id)
         
         # First get the current task
-        task = service.tasks().get(tasklist=task_list_id, task=task_id).execute()
-        logger.debug(f"Current task state: {json.dumps(task)}")
+        task = google_api.execute(service.tasks().get(tasklist=task_list_id, task=task_id), 'tasks.get')
+        logger.debug("Current task state: %s", LazyJson(task))
         
         # Apply updates
         for key, value in updates.items():
@@ -227,14 +368,14 @@ def update_task(user_id, task_list_id, task_id, updates):
                 task[key] = value
         
         # Update the task
-        updated_task = service.tasks().update(
+        updated_task = google_api.execute(service.tasks().update(
             tasklist=task_list_id,
             task=task_id,
             body=task
-        ).execute()
+        ), 'tasks.update')
         
-        logger.info("Task updated successfully")
-        logger.debug(f"Updated task: {json.dumps(updated_task)}")
+        logger.debug("Updated task: %s", LazyJson(updated_task))
+        invalidate_user_tasks(user_id)
         
         # Return raw task response
         return updated_task
@@ -244,8 +385,9 @@ def update_task(user_id, task_list_id, task_id, updates):
         logger.error(traceback.format_exc())
         raise
 
+@traced()
 def get_task_list_title(user_id, list_id):
     """Get the title of a task list by its ID."""
     service = get_tasks_service(user_id)
-    task_list = service.tasklists().get(tasklist=list_id).execute()
+    task_list = google_api.execute(service.tasklists().get(tasklist=list_id), 'tasklists.get')
     return task_list.get('title', '')
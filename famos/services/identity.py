@@ -0,0 +1,121 @@
+from flask import current_app, has_request_context
+from flask_login import current_user
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from famos import db
+from famos.models.user import User
+from famos.models.family import Family
+from famos.models.integrations import GoogleIntegration
+from famos.cache import Cache
+import logging
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.identity')
+
+# Kept out of the shared cache (unless empty) and loaded from the database when read
+SECRET_COLUMNS = {
+    User: ('password_hash',),
+    GoogleIntegration: ('access_token', 'refresh_token'),
+}
+
+
+def init_app(app):
+    """Set up the identity cache, shared by the workers, for ``app``."""
+    app.config.setdefault('IDENTITY_CACHE_TTL', 30)
+    app.config.setdefault('IDENTITY_CACHE_SIZE', 1024)
+    app.extensions['famos_identity'] = Cache.from_app(
+        app, 'identity', app.config['IDENTITY_CACHE_TTL'], local_size=app.config['IDENTITY_CACHE_SIZE']
+    )
+
+
+def _cache():
+    return current_app.extensions['famos_identity']
+
+
+def _snapshot(obj):
+    """Copy an instance's column values into a plain dict, leaving out any secret that is set."""
+    if obj is None:
+        return None
+    secrets = SECRET_COLUMNS.get(type(obj), ())
+    values = {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+    return {key: value for key, value in values.items() if key not in secrets or value is None}
+
+
+def _attach(model, values):
+    """Turn a snapshot back into a persistent instance without querying.
+
+    Secrets left out of the snapshot are expired, so the first read of
+    one loads them from the database.
+    """
+    if values is None:
+        return None
+    session = db.session
+    existing = session.identity_map.get(identity_key(model, values['id']))
+    if existing is not None:
+        return existing
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    session.add(obj)
+    missing = [key for key in SECRET_COLUMNS.get(model, ()) if key not in values]
+    if missing:
+        session.expire(obj, missing)
+    return obj
+
+
+def load_user(user_id):
+    """Flask-Login user loader.
+
+    Loads the user together with their family and Google integration in one
+    joined query, then keeps a snapshot of their columns in a short-lived
+    cache shared by the workers. Cached requests rebuild the instances in
+    the current session without touching the database.
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    existing = db.session.identity_map.get(identity_key(User, user_id))
+    if existing is not None:
+        return existing
+
+    snapshot = _cache().get(user_id)
+    if snapshot is None:
+        user = User.query.options(
+            joinedload(User.family),
+            joinedload(User.google_integration)
+        ).filter_by(id=user_id).first()
+        if user is None:
+            return None
+        _cache().set(user_id, {
+            'user': _snapshot(user),
+            'family': _snapshot(user.family),
+            'google_integration': _snapshot(user.google_integration)
+        })
+        return user
+
+    user = _attach(User, snapshot['user'])
+    family = _attach(Family, snapshot['family'])
+    integration = _attach(GoogleIntegration, snapshot['google_integration'])
+    set_committed_value(user, 'family', family)
+    set_committed_value(user, 'google_integration', integration)
+    if family is not None:
+        set_committed_value(family, 'user', user)
+    if integration is not None:
+        set_committed_value(integration, 'user', user)
+    return user
+
+
+def invalidate_identity(user_id):
+    """Drop the cached identity for ``user_id`` after its user, family or integration changed."""
+    if user_id is not None:
+        _cache().delete(int(user_id))
+
+
+def get_google_integration(user_id):
+    """Return the Google integration for ``user_id``, reusing the preloaded one when possible."""
+    if has_request_context() and current_user.is_authenticated and current_user.id == user_id:
+        return current_user.google_integration
+    return GoogleIntegration.query.filter_by(user_id=user_id).first()
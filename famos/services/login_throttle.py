@@ -0,0 +1,209 @@
+from collections import Counter, OrderedDict, deque
+from flask import current_app
+from famos.utils.sqlite_store import SqliteStore
+import math
+import os
+import threading
+import time
+import logging
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.login_throttle')
+
+
+class MemoryBackend:
+    """Failed-attempt timestamps per key, kept in this worker only.
+
+    Keys are kept in order of their latest failure, so the key that has
+    been quiet the longest is dropped first once ``max_keys`` is reached.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, now):
+        with self._lock:
+            self._attempts.setdefault(key, deque()).append(now)
+            self._attempts.move_to_end(key)
+            while len(self._attempts) > self.max_keys:
+                self._attempts.popitem(last=False)
+
+    def recent(self, key, since):
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if not attempts:
+                return []
+            while attempts and attempts[0] <= since:
+                attempts.popleft()
+            if not attempts:
+                del self._attempts[key]
+                return []
+            return list(attempts)
+
+    def clear(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def prune(self, before):
+        with self._lock:
+            while self._attempts:
+                key, attempts = next(iter(self._attempts.items()))
+                if attempts[-1] > before:
+                    break
+                del self._attempts[key]
+
+
+class SqliteBackend:
+    """Failed-attempt timestamps in a SQLite file shared by every worker on the host."""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS login_attempts (key TEXT NOT NULL, attempted_at REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_login_attempts_key_time ON login_attempts (key, attempted_at)',
+    )
+
+    def __init__(self, path):
+        self.store = SqliteStore(path, self.SCHEMA)
+
+    def _connection(self):
+        return self.store.connection()
+
+    def add(self, key, now):
+        self._connection().execute(
+            'INSERT INTO login_attempts (key, attempted_at) VALUES (?, ?)', (key, now)
+        )
+
+    def recent(self, key, since):
+        rows = self._connection().execute(
+            'SELECT attempted_at FROM login_attempts WHERE key = ? AND attempted_at > ? '
+            'ORDER BY attempted_at',
+            (key, since)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self, key):
+        self._connection().execute('DELETE FROM login_attempts WHERE key = ?', (key,))
+
+    def prune(self, before):
+        self._connection().execute('DELETE FROM login_attempts WHERE attempted_at <= ?', (before,))
+
+
+class LoginThrottle:
+    """Sliding-window limits on failed logins, per client IP and per email from that IP.
+
+    The first few failures in ``window`` seconds are free. After that each
+    further attempt must wait ``base_delay`` seconds, doubling per failure up
+    to ``max_delay``; at ``lockout`` failures the key is locked until enough
+    of them age out of the window. ``check`` only reads counters, so callers
+    can reject an attempt before doing any database or hashing work.
+
+    Email counters are kept per client IP, so failures from one address
+    never lock the account's owner out from another.
+    """
+
+    def __init__(self, backend, window=900, ip_free=20, ip_lockout=100, email_free=5, email_lockout=10,
+                 base_delay=1.0, max_delay=60.0, prune_interval=300):
+        self.backend = backend
+        self.window = window
+        self.limits = {
+            'ip': (ip_free, ip_lockout),
+            'email': (email_free, email_lockout),
+        }
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.prune_interval = prune_interval
+        self.rejected = Counter()
+        self._last_prune = time.time()
+
+    @classmethod
+    def from_app(cls, app):
+        app.config.setdefault('LOGIN_THROTTLE_BACKEND', 'memory')
+        app.config.setdefault('LOGIN_THROTTLE_SQLITE_PATH', os.path.join(app.instance_path, 'login_throttle.sqlite'))
+        app.config.setdefault('LOGIN_THROTTLE_WINDOW', 900)
+        app.config.setdefault('LOGIN_THROTTLE_IP_FREE', 20)
+        app.config.setdefault('LOGIN_THROTTLE_IP_LOCKOUT', 100)
+        app.config.setdefault('LOGIN_THROTTLE_EMAIL_FREE', 5)
+        app.config.setdefault('LOGIN_THROTTLE_EMAIL_LOCKOUT', 10)
+        app.config.setdefault('LOGIN_THROTTLE_BASE_DELAY', 1.0)
+        app.config.setdefault('LOGIN_THROTTLE_MAX_DELAY', 60.0)
+        if app.config['LOGIN_THROTTLE_BACKEND'] == 'sqlite':
+            backend = SqliteBackend(app.config['LOGIN_THROTTLE_SQLITE_PATH'])
+        else:
+            backend = MemoryBackend()
+        return cls(
+            backend,
+            window=app.config['LOGIN_THROTTLE_WINDOW'],
+            ip_free=app.config['LOGIN_THROTTLE_IP_FREE'],
+            ip_lockout=app.config['LOGIN_THROTTLE_IP_LOCKOUT'],
+            email_free=app.config['LOGIN_THROTTLE_EMAIL_FREE'],
+            email_lockout=app.config['LOGIN_THROTTLE_EMAIL_LOCKOUT'],
+            base_delay=app.config['LOGIN_THROTTLE_BASE_DELAY'],
+            max_delay=app.config['LOGIN_THROTTLE_MAX_DELAY']
+        )
+
+    def _keys(self, ip, email):
+        keys = []
+        if ip:
+            keys.append(('ip', f'ip:{ip}'))
+        if email:
+            keys.append(('email', f'email:{ip or ""}:{email.strip().lower()}'))
+        return keys
+
+    def _retry_after(self, kind, failures, now):
+        free, lockout = self.limits[kind]
+        count = len(failures)
+        if count >= lockout:
+            # Locked until the count drops back under the lockout threshold
+            return 'lockout', failures[count - lockout] + self.window - now
+        if count >= free:
+            delay = min(self.base_delay * 2 ** (count - free), self.max_delay)
+            return 'delay', failures[-1] + delay - now
+        return None, 0
+
+    def check(self, ip, email, now=None):
+        """Return the number of seconds the caller must wait, or 0 if the attempt may proceed."""
+        now = now or time.time()
+        wait = 0
+        for kind, key in self._keys(ip, email):
+            reason, retry_after = self._retry_after(kind, self.backend.recent(key, now - self.window), now)
+            if reason and retry_after > wait:
+                wait = retry_after
+                self.rejected[f'{kind}_{reason}'] += 1
+        if wait > 0:
+            logger.warning(f"Throttled login attempt for {email} from {ip} for {wait:.0f}s")
+            return math.ceil(wait)
+        return 0
+
+    def record_failure(self, ip, email, now=None):
+        now = now or time.time()
+        for _, key in self._keys(ip, email):
+            self.backend.add(key, now)
+        if now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            self.backend.prune(now - self.window)
+
+    def record_success(self, ip, email):
+        # Only the account's failures from this IP are cleared; the IP keeps its history
+        for kind, key in self._keys(ip, email):
+            if kind == 'email':
+                self.backend.clear(key)
+
+    def stats(self):
+        """Rejected attempts by key type and reason since the worker started."""
+        return dict(self.rejected)
+
+
+def init_app(app):
+    """Create the login throttle for ``app``."""
+    app.config.setdefault('LOGIN_THROTTLE_ENABLED', True)
+    throttle = LoginThrottle.from_app(app)
+    app.extensions['famos_login_throttle'] = throttle
+    return throttle
+
+
+def get_throttle():
+    """Return the app's login throttle, or None when throttling is disabled."""
+    if not current_app.config.get('LOGIN_THROTTLE_ENABLED'):
+        return None
+    return current_app.extensions.get('famos_login_throttle')
@@ -0,0 +1,453 @@
+from bisect import bisect_left
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from famos.cache import Cache
+from famos.utils.ttl_cache import TTLCache
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+import weakref
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.metrics')
+
+# Seconds; request and upstream latencies
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements per request
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metric:
+    """A named family of samples keyed by label values.
+
+    ``multiprocess_mode`` says how samples from several worker processes are
+    combined: counters and histograms always add up; gauges are either
+    summed over live workers ('sum') or the largest value wins ('max').
+    """
+    kind = None
+
+    def __init__(self, name, help, labelnames=(), multiprocess_mode='sum'):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.multiprocess_mode = multiprocess_mode
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {labels}')
+        return tuple(str(label) for label in labels)
+
+    def samples(self):
+        with self._lock:
+            return {labels: list(value) if isinstance(value, list) else value
+                    for labels, value in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def describe(self):
+        return {'kind': self.kind, 'help': self.help, 'labels': list(self.labelnames),
+                'mode': self.multiprocess_mode}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, *labels):
+        """Mirror a running total kept elsewhere, such as a cache's hit count."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # One count per bucket plus +Inf, then the running sum
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+
+    def describe(self):
+        return dict(super().describe(), buckets=list(self.buckets))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(total, value):
+    if isinstance(value, list):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+    return value if total is None else total + value
+
+
+class MetricsRegistry:
+    """Metrics for one worker, optionally shared with sibling workers through files.
+
+    With a ``directory``, each process periodically writes its samples to
+    ``metrics-<pid>.json`` there, and a scrape served by any worker adds up
+    every file. The directory should be emptied when the server starts, since
+    counters from a previous run would otherwise carry over.
+    """
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self.collectors = []
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _registries.add(self)
+
+    def _add(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=(), multiprocess_mode='sum'):
+        return self._add(Gauge(name, help, labelnames, multiprocess_mode))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """Call ``collector(registry)`` before every snapshot to refresh pulled values."""
+        self.collectors.append(collector)
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def share_directory(self, directory):
+        """Start sharing samples through ``directory``, removing files left by an earlier run."""
+        os.makedirs(directory, exist_ok=True)
+        for filename in os.listdir(directory):
+            if filename.startswith('metrics-') and filename.endswith(('.json', '.tmp')):
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except OSError:
+                    pass
+        self.directory = directory
+
+    def snapshot(self):
+        for collector in self.collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                logger.error("Metrics collector %s failed: %s", getattr(collector, '__name__', collector), e)
+        return {
+            name: dict(metric.describe(), samples=[[list(labels), value]
+                                                   for labels, value in metric.samples().items()])
+            for name, metric in self.metrics.items()
+        }
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def flush(self, force=False):
+        """Write this process's samples for sibling workers, at most every ``flush_interval`` seconds."""
+        if not self.directory:
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return False
+        if not self._flush_lock.acquire(blocking=False):
+            return False
+        try:
+            self._last_flush = now
+            pid = os.getpid()
+            path = self._path(pid)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'pid': pid, 'metrics': self.snapshot()}, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            logger.error("Could not write metrics file: %s", e)
+            return False
+        finally:
+            self._flush_lock.release()
+
+    def _snapshots(self):
+        pid = os.getpid()
+        yield pid, self.snapshot()
+        if not self.directory:
+            return
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get('pid') != pid:
+                yield data['pid'], data['metrics']
+
+    def collect(self):
+        """Samples from every worker, combined per metric and label set."""
+        merged = {}
+        for pid, snapshot in self._snapshots():
+            alive = None
+            for name, family in snapshot.items():
+                target = merged.setdefault(name, dict(family, samples={}))
+                if family['kind'] == 'gauge' and family['mode'] == 'sum':
+                    # Gauges describe the present, so dead workers drop out
+                    if alive is None:
+                        alive = pid == os.getpid() or _pid_alive(pid)
+                    if not alive:
+                        continue
+                for labels, value in family['samples']:
+                    key = tuple(labels)
+                    current = target['samples'].get(key)
+                    if family['kind'] == 'gauge' and family['mode'] == 'max':
+                        target['samples'][key] = value if current is None else max(current, value)
+                    else:
+                        target['samples'][key] = _merge(current, value)
+        _add_cache_hit_ratios(merged)
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f'# HELP {name} {_escape_help(family["help"])}')
+            lines.append(f'# TYPE {name} {family["kind"]}')
+            labelnames = family['labels']
+            for labels, value in sorted(family['samples'].items()):
+                if family['kind'] == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(family['buckets'] + [math.inf], value[:-1]):
+                        cumulative += count
+                        le = '+Inf' if bound == math.inf else _format_value(bound)
+                        lines.append(f'{name}_bucket{_labels(labelnames, labels, le=le)} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(labelnames, labels)} {_format_value(value[-1])}')
+                    lines.append(f'{name}_count{_labels(labelnames, labels)} {cumulative}')
+                else:
+                    lines.append(f'{name}{_labels(labelnames, labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_help(text):
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _escape_label(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(str(value))}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+def _add_cache_hit_ratios(merged):
+    hits = merged.get('famos_cache_hits_total')
+    misses = merged.get('famos_cache_misses_total')
+    if not hits or not misses:
+        return
+    ratios = {}
+    for labels, hit_count in hits['samples'].items():
+        total = hit_count + misses['samples'].get(labels, 0)
+        if total:
+            ratios[labels] = hit_count / total
+    merged['famos_cache_hit_ratio'] = {
+        'kind': 'gauge', 'help': 'Share of cache lookups served from the cache, across workers',
+        'labels': ['cache'], 'mode': 'sum', 'samples': ratios
+    }
+
+
+# Every registry in this process, so a forked worker can drop what it inherited
+_registries = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    for registry in list(_registries):
+        registry.reset()
+        registry._last_flush = 0.0
+
+
+def _flush_at_exit():
+    for registry in list(_registries):
+        registry.flush(force=True)
+
+
+atexit.register(_flush_at_exit)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _collect_caches(app):
+    def collector(registry):
+        hits = registry.metrics['famos_cache_hits_total']
+        misses = registry.metrics['famos_cache_misses_total']
+        entries = registry.metrics['famos_cache_entries']
+        shared_hits = registry.metrics['famos_cache_shared_hits_total']
+        for key, extension in app.extensions.items():
+            if isinstance(extension, (TTLCache, Cache)):
+                name = key[len('famos_'):] if key.startswith('famos_') else key
+                hits.set_total(extension.hits, name)
+                misses.set_total(extension.misses, name)
+                entries.set(len(extension), name)
+            if isinstance(extension, Cache):
+                shared_hits.set_total(extension.shared_hits, name)
+    return collector
+
+
+def _collect_login_throttle(app):
+    def collector(registry):
+        throttle = app.extensions.get('famos_login_throttle')
+        if throttle is None:
+            return
+        rejected = registry.metrics['famos_login_throttle_rejected_total']
+        for key, count in throttle.stats().items():
+            kind, _, reason = key.partition('_')
+            rejected.set_total(count, kind, reason)
+    return collector
+
+
+def _collect_logging(app):
+    def collector(registry):
+        pipeline = app.extensions.get('famos_logging')
+        if pipeline is None:
+            return
+        registry.metrics['famos_log_records_dropped_total'].set_total(pipeline.handler.dropped)
+    return collector
+
+
+def init_app(app, db):
+    """Create the metrics registry and record request, SQL and cache metrics for ``app``."""
+    app.config.setdefault('METRICS_ENABLED', True)
+    app.config.setdefault('METRICS_DIR', None)
+    app.config.setdefault('METRICS_FLUSH_INTERVAL', 5.0)
+    app.config.setdefault('METRICS_ALLOW_REMOTE', False)
+    app.config.setdefault('METRICS_TOKEN', None)
+    if not app.config['METRICS_ENABLED']:
+        return None
+
+    registry = MetricsRegistry(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+    requests_total = registry.counter(
+        'famos_http_requests_total', 'HTTP requests by endpoint, method and status',
+        ('endpoint', 'method', 'status'))
+    request_seconds = registry.histogram(
+        'famos_http_request_duration_seconds', 'Time spent handling a request', ('endpoint',))
+    sql_queries = registry.histogram(
+        'famos_sql_queries_per_request', 'SQL statements executed per request', ('endpoint',),
+        buckets=QUERY_BUCKETS)
+    registry.histogram(
+        'famos_google_api_request_duration_seconds', 'Google API call latency by method', ('method',))
+    registry.counter(
+        'famos_google_api_errors_total', 'Failed Google API calls by method and reason', ('method', 'reason'))
+    registry.counter('famos_cache_hits_total', 'Cache lookups that found an entry', ('cache',))
+    registry.counter('famos_cache_misses_total', 'Cache lookups that missed', ('cache',))
+    registry.counter('famos_cache_shared_hits_total', 'Cache hits served by the tier shared between workers',
+                     ('cache',))
+    registry.gauge('famos_cache_entries', 'Entries currently cached in this process', ('cache',))
+    registry.counter(
+        'famos_login_throttle_rejected_total', 'Login attempts rejected by the throttle', ('kind', 'reason'))
+    registry.counter('famos_log_records_dropped_total', 'Log records dropped because the log queue was full')
+    registry.register_collector(_collect_caches(app))
+    registry.register_collector(_collect_login_throttle(app))
+    registry.register_collector(_collect_logging(app))
+
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g._famos_sql_queries = g.get('_famos_sql_queries', 0) + 1
+
+    event.listen(db.get_engine(app), 'before_cursor_execute', count_query)
+
+    @app.before_request
+    def _start_request_metrics():
+        g._famos_request_started = time.perf_counter()
+        g._famos_sql_queries = 0
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop('_famos_request_started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        requests_total.inc(endpoint, request.method, response.status_code)
+        request_seconds.observe(time.perf_counter() - started, endpoint)
+        sql_queries.observe(g.pop('_famos_sql_queries', 0), endpoint)
+        registry.flush()
+        return response
+
+    app.extensions['famos_metrics'] = registry
+    return registry
+
+
+def get_registry():
+    """Return the current app's metrics registry, or None when metrics are off."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('famos_metrics')
+
+
+def record_google_call(method, seconds, error=None):
+    """Record one Google API call's latency and, if it failed, why."""
+    registry = get_registry()
+    if registry is None:
+        return
+    registry.metrics['famos_google_api_request_duration_seconds'].observe(seconds, method)
+    if error is not None:
+        registry.metrics['famos_google_api_errors_total'].inc(method, error)
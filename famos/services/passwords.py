@@ -0,0 +1,174 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+from famos.utils.logger import get_pipeline
+import multiprocessing
+import os
+import threading
+import logging
+
+try:
+    from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS
+except ImportError:
+    DEFAULT_PBKDF2_ITERATIONS = 260000
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.passwords')
+
+# Pool processes start from a clean single-threaded server, not as forks of
+# a worker whose log, export and warmup threads may hold locks at that moment
+DEFAULT_MP_CONTEXT = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool is full or a hash took too long."""
+
+
+def _normalize_method(method):
+    # Werkzeug writes the iteration count into the hash even when it was implied
+    if method.startswith('pbkdf2') and method.count(':') == 1:
+        return f'{method}:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+def _init_pool_process():
+    # With the 'fork' context a hashing process restarted the parent's log
+    # listener; it never logs, so stop it
+    pipeline = get_pipeline()
+    if pipeline is not None:
+        pipeline.stop()
+
+
+class PasswordHasher:
+    """Hash and verify passwords on a small process pool.
+
+    PBKDF2 is deliberately CPU-expensive. hashlib releases the GIL while it
+    runs, but a burst of logins would still tie up every request thread and
+    core of the worker. Work is handed to ``PASSWORD_HASH_WORKERS`` processes
+    instead, which caps the CPU hashing can take; at most
+    ``PASSWORD_HASH_MAX_PENDING`` jobs may be queued or running, and callers
+    give up after ``PASSWORD_HASH_TIMEOUT`` seconds. Both raise
+    ``PasswordHasherBusy``. With zero workers hashing runs inline.
+    """
+
+    def __init__(self, method='pbkdf2:sha256', salt_length=16, workers=0,
+                 max_pending=32, timeout=5.0, mp_context=DEFAULT_MP_CONTEXT):
+        self.method = _normalize_method(method)
+        self.salt_length = salt_length
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.mp_context = mp_context
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    @classmethod
+    def from_app(cls, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+        app.config.setdefault('PASSWORD_HASH_SALT_LENGTH', 16)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 0 if app.testing else min(2, os.cpu_count() or 1))
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 32)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 5.0)
+        app.config.setdefault('PASSWORD_HASH_MP_CONTEXT', DEFAULT_MP_CONTEXT)
+        return cls(
+            method=app.config['PASSWORD_HASH_METHOD'],
+            salt_length=app.config['PASSWORD_HASH_SALT_LENGTH'],
+            workers=app.config['PASSWORD_HASH_WORKERS'],
+            max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+            timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+            mp_context=app.config['PASSWORD_HASH_MP_CONTEXT']
+        )
+
+    def start(self):
+        """Start the pool for this process, if it isn't running yet.
+
+        Called on the first hash or verify, so commands and scripts that
+        never touch a password don't start a pool. A forked process starts
+        its own, since a pool cannot be shared with a parent process.
+        """
+        if not self.workers:
+            return None
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.mp_context),
+                    initializer=_init_pool_process
+                )
+                self._pid = os.getpid()
+                logger.info("Started password hashing pool with %d workers", self.workers)
+            return self._pool
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+            self._pid = None
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Password hashing queue is full")
+            raise PasswordHasherBusy('too many pending password hashes')
+        try:
+            future = self.start().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the job actually finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(f"Password hashing took longer than {self.timeout}s")
+            raise PasswordHasherBusy('password hashing timed out')
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when ``pwhash`` was made with different parameters than the configured ones."""
+        if not pwhash or '$' not in pwhash:
+            return True
+        return pwhash.split('$', 1)[0] != self.method
+
+
+# Used outside an application context, e.g. from scripts
+_inline = PasswordHasher()
+
+
+def init_app(app):
+    """Create the password hasher for ``app``; its pool starts on first use."""
+    hasher = PasswordHasher.from_app(app)
+    app.extensions['famos_passwords'] = hasher
+    return hasher
+
+
+def get_hasher():
+    if has_app_context():
+        hasher = current_app.extensions.get('famos_passwords')
+        if hasher is not None:
+            return hasher
+    return _inline
+
+
+def hash_password(password):
+    return get_hasher().hash(password)
+
+
+def verify_password(pwhash, password):
+    return get_hasher().verify(pwhash, password)
+
+
+def needs_rehash(pwhash):
+    return get_hasher().needs_rehash(pwhash)
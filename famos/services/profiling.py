@@ -0,0 +1,350 @@
+from collections import Counter
+from datetime import datetime
+from flask import current_app, g, request
+from flask_login import current_user
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.profiling')
+
+MODES = ('cpu', 'sample', 'mem')
+PROFILE_FILE_RE = re.compile(r'^[\w.-]+\.(prof|txt|folded)$')
+_UNSAFE = re.compile(r'[^\w.-]+')
+
+
+class Sampler:
+    """Sample one thread's stack every ``interval`` seconds from a helper thread.
+
+    Much cheaper than cProfile on a slow request, at the price of only
+    statistical accuracy. Stacks are counted in the collapsed
+    ``frame;frame;frame count`` format flame graph tools read.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='famos-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class ProfileTargets:
+    """Users whose requests are profiled until a deadline, shared by all workers through a file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._targets = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._mtime, self._targets = None, {}
+            return self._targets
+        if mtime != self._mtime:
+            try:
+                with open(self.path) as f:
+                    self._targets = {int(user_id): entry for user_id, entry in json.load(f).items()}
+            except (OSError, ValueError):
+                self._targets = {}
+            self._mtime = mtime
+        return self._targets
+
+    def active(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            return {user_id: entry for user_id, entry in self._load().items() if entry['until'] > now}
+
+    def get(self, user_id, now=None):
+        return self.active(now).get(user_id)
+
+    def _save(self, targets):
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({str(user_id): entry for user_id, entry in targets.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def enable(self, user_id, minutes, modes=('cpu',), now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            targets = {uid: entry for uid, entry in self._load().items() if entry['until'] > now}
+            targets[int(user_id)] = {'until': now + minutes * 60, 'modes': list(modes)}
+            self._save(targets)
+
+    def disable(self, user_id):
+        with self._lock:
+            targets = dict(self._load())
+            targets.pop(int(user_id), None)
+            self._save(targets)
+
+
+class Watchdog:
+    """Dump every thread's stack when a request runs longer than ``threshold`` seconds."""
+
+    def __init__(self, directory, threshold=10.0, interval=1.0):
+        self.directory = directory
+        self.threshold = threshold
+        self.interval = interval
+        self.in_flight = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def ensure_running(self):
+        # A forked worker doesn't inherit the parent's thread
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.in_flight = {}
+        self._thread = threading.Thread(target=self._run, name='famos-watchdog', daemon=True)
+        self._thread.start()
+
+    def begin(self, description):
+        with self._lock:
+            self.in_flight[threading.get_ident()] = [time.monotonic(), description, False]
+
+    def end(self):
+        with self._lock:
+            self.in_flight.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Watchdog check failed: %s", e)
+
+    def check(self, now=None):
+        """Dump stacks for requests over the threshold; returns the files written."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stalled = [(ident, entry) for ident, entry in self.in_flight.items()
+                       if not entry[2] and now - entry[0] >= self.threshold]
+            for _, entry in stalled:
+                entry[2] = True
+        return [self._dump(ident, now - started, description) for ident, (started, description, _) in stalled]
+
+    def _dump(self, ident, elapsed, description):
+        frames = sys._current_frames()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        out = io.StringIO()
+        out.write(f'{description} has been running for {elapsed:.1f}s\n\n')
+        for thread_id in sorted(frames, key=lambda tid: tid != ident):
+            marker = ' (slow request)' if thread_id == ident else ''
+            out.write(f'--- Thread {names.get(thread_id, thread_id)}{marker}\n')
+            out.write(''.join(traceback.format_stack(frames[thread_id])))
+            out.write('\n')
+        path = _profile_path(self.directory, f'stall-{description}', 'txt')
+        with open(path, 'w') as f:
+            f.write(out.getvalue())
+        logger.warning("Request %s slower than %.0fs, stacks written to %s",
+                       description, self.threshold, os.path.basename(path))
+        return path
+
+
+def _profile_path(directory, label, extension):
+    stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')
+    return os.path.join(directory, f'{stamp}-{os.getpid()}-{_UNSAFE.sub("_", label)[:80]}.{extension}')
+
+
+class Profiler:
+    """Admin-only, per-request CPU and memory profiling.
+
+    A request is profiled when an admin adds ``?_profile=cpu`` (or
+    ``sample``, ``mem``, comma-separated), or when its user has been made a
+    profiling target from the admin pages. Results are written under
+    ``PROFILE_DIR`` and named in the ``X-Profile`` response header. Only one
+    request per worker is profiled at a time.
+    """
+
+    def __init__(self, directory, max_files=200, tracemalloc_frames=10, sample_interval=0.005):
+        self.directory = directory
+        self.max_files = max_files
+        self.tracemalloc_frames = tracemalloc_frames
+        self.sample_interval = sample_interval
+        self.targets = ProfileTargets(os.path.join(directory, 'targets.json'))
+        self._busy = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def requested_modes(self):
+        """Profiling modes for the current request, or an empty tuple."""
+        requested = request.args.get('_profile')
+        if not requested and not os.path.exists(self.targets.path):
+            return ()
+        if not current_user.is_authenticated:
+            return ()
+        if requested:
+            if not current_user.is_admin:
+                return ()
+            return tuple(mode for mode in requested.split(',') if mode in MODES) or ('cpu',)
+        target = self.targets.get(current_user.id)
+        return tuple(target['modes']) if target else ()
+
+    def start(self, modes):
+        if not self._busy.acquire(blocking=False):
+            return None
+        state = {'modes': modes, 'started': time.perf_counter()}
+        try:
+            if 'mem' in modes:
+                state['own_tracing'] = not tracemalloc.is_tracing()
+                if state['own_tracing']:
+                    tracemalloc.start(self.tracemalloc_frames)
+                state['before'] = tracemalloc.take_snapshot()
+            if 'sample' in modes:
+                state['sampler'] = Sampler(threading.get_ident(), self.sample_interval)
+                state['sampler'].start()
+            if 'cpu' in modes:
+                state['cpu'] = cProfile.Profile()
+                state['cpu'].enable()
+        except Exception:
+            self._busy.release()
+            raise
+        return state
+
+    def finish(self, state, label):
+        """Stop profiling and write the results; returns the file names."""
+        try:
+            if 'cpu' in state:
+                state['cpu'].disable()
+            if 'sampler' in state:
+                state['sampler'].stop()
+            after = tracemalloc.take_snapshot() if 'before' in state else None
+            if state.get('own_tracing'):
+                tracemalloc.stop()
+        finally:
+            self._busy.release()
+
+        elapsed = time.perf_counter() - state['started']
+        files = []
+        if 'cpu' in state:
+            path = _profile_path(self.directory, label, 'prof')
+            state['cpu'].dump_stats(path)
+            summary = io.StringIO()
+            summary.write(f'{label}: {elapsed * 1000:.1f} ms\n\n')
+            pstats.Stats(state['cpu'], stream=summary).sort_stats('cumulative').print_stats(60)
+            with open(path[:-len('prof')] + 'txt', 'w') as f:
+                f.write(summary.getvalue())
+            files.extend([path, path[:-len('prof')] + 'txt'])
+        if 'sampler' in state:
+            path = _profile_path(self.directory, f'{label}-samples', 'folded')
+            with open(path, 'w') as f:
+                f.write(state['sampler'].folded())
+            files.append(path)
+        if after is not None:
+            path = _profile_path(self.directory, f'{label}-mem', 'txt')
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen *>')]
+            stats = after.filter_traces(ignore).compare_to(state['before'].filter_traces(ignore), 'lineno')
+            with open(path, 'w') as f:
+                f.write(f'{label}: allocation changes during the request, largest first\n\n')
+                for stat in stats[:50]:
+                    f.write(f'{stat}\n')
+            files.append(path)
+        self.prune()
+        return [os.path.basename(path) for path in files]
+
+    def files(self):
+        """Stored profile files, newest first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if PROFILE_FILE_RE.match(name):
+                path = os.path.join(self.directory, name)
+                entries.append((os.path.getmtime(path), name, os.path.getsize(path)))
+        entries.sort(reverse=True)
+        return [{'name': name, 'size': size, 'modified': datetime.fromtimestamp(mtime)}
+                for mtime, name, size in entries]
+
+    def prune(self):
+        for entry in self.files()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, entry['name']))
+            except OSError:
+                pass
+
+
+def init_app(app):
+    """Set up admin profiling and the slow-request watchdog for ``app``."""
+    app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config.setdefault('PROFILE_MAX_FILES', 200)
+    app.config.setdefault('PROFILE_TRACEMALLOC_FRAMES', 10)
+    app.config.setdefault('PROFILE_WATCHDOG_ENABLED', not app.testing)
+    app.config.setdefault('PROFILE_SLOW_REQUEST_SECONDS', 10.0)
+
+    profiler = Profiler(app.config['PROFILE_DIR'], app.config['PROFILE_MAX_FILES'],
+                        app.config['PROFILE_TRACEMALLOC_FRAMES'])
+    app.extensions['famos_profiler'] = profiler
+    watchdog = None
+    if app.config['PROFILE_WATCHDOG_ENABLED']:
+        watchdog = Watchdog(app.config['PROFILE_DIR'], app.config['PROFILE_SLOW_REQUEST_SECONDS'])
+        app.extensions['famos_watchdog'] = watchdog
+
+    @app.before_request
+    def _start_profiling():
+        if watchdog is not None:
+            watchdog.ensure_running()
+            watchdog.begin(f'{request.method} {request.path}')
+        modes = profiler.requested_modes()
+        if modes:
+            g._famos_profile = profiler.start(modes)
+
+    @app.after_request
+    def _finish_profiling(response):
+        state = g.pop('_famos_profile', None)
+        if state is not None:
+            label = f'u{current_user.id}-{request.endpoint or "unmatched"}'
+            files = profiler.finish(state, label)
+            response.headers['X-Profile'] = ', '.join(files)
+            logger.info("Profiled %s %s: %s", request.method, request.path, ', '.join(files))
+        return response
+
+    @app.teardown_request
+    def _end_profiling(exc):
+        # Only reached with a profile still running when after_request never ran
+        state = g.pop('_famos_profile', None)
+        if state is not None:
+            profiler.finish(state, f'failed-{request.endpoint or "unmatched"}')
+        if watchdog is not None:
+            watchdog.end()
+
+    return profiler
+
+
+def get_profiler():
+    return current_app.extensions['famos_profiler']
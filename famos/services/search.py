@@ -0,0 +1,213 @@
+from dataclasses import dataclass
+from markupsafe import Markup, escape
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from famos import db
+from famos.models.contact import Contact
+from famos.models.family_member import FamilyMember
+from famos.models.task import Task
+import re
+import logging
+import weakref
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.search')
+
+SEARCH_TABLE = 'search_index'
+MAX_TERMS = 8
+MAX_RESULTS = 50
+
+# Every indexed row gets rowid = id * 4 + kind code, so rows can be replaced
+# or deleted without a lookup and the kind is recoverable from the rowid.
+KIND_CODES = {'contact': 1, 'member': 2, 'task': 3}
+KIND_NAMES = {code: kind for kind, code in KIND_CODES.items()}
+
+# The table itself (title, body and an "f<family_id>" scope token) is
+# created by the e7a4c1f9b3d6 migration.
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# Snippet markers that can't appear in user text, swapped for <mark> after escaping
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+
+def _contact_document(contact):
+    title = f'{contact.first_name} {contact.last_name}'
+    body = ' '.join(filter(None, [contact.role, contact.email, contact.phone, contact.notes]))
+    return title, body
+
+
+def _member_document(member):
+    return f'{member.first_name} {member.last_name}', member.relationship or ''
+
+
+def _task_document(task):
+    return task.title, task.description or ''
+
+
+# Model, kind, document builder and the attributes that feed the document
+INDEXED_MODELS = (
+    (Contact, 'contact', _contact_document,
+     ('first_name', 'last_name', 'role', 'email', 'phone', 'notes', 'family_id')),
+    (FamilyMember, 'member', _member_document,
+     ('first_name', 'last_name', 'relationship', 'family_id')),
+    (Task, 'task', _task_document,
+     ('title', 'description', 'family_id')),
+)
+
+
+def _rowid(kind, obj_id):
+    return obj_id * 4 + KIND_CODES[kind]
+
+
+def _table_exists(connection):
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': SEARCH_TABLE}
+    ).first() is not None
+
+
+# Engines whose database has the index table. Migrations only move forward
+# while the app runs, so a table once seen is taken to stay.
+_indexed_engines = weakref.WeakSet()
+
+
+def _index_exists(connection):
+    if connection.dialect.name != 'sqlite':
+        return False
+    if connection.engine in _indexed_engines:
+        return True
+    if _table_exists(connection):
+        _indexed_engines.add(connection.engine)
+        return True
+    return False
+
+
+def _write(connection, kind, obj, build):
+    title, body = build(obj)
+    connection.execute(
+        text(f'INSERT INTO {SEARCH_TABLE} (rowid, title, body, scope) VALUES (:rowid, :title, :body, :scope)'),
+        {'rowid': _rowid(kind, obj.id), 'title': title, 'body': body, 'scope': f'f{obj.family_id}'}
+    )
+
+
+def _delete(connection, kind, obj_id):
+    connection.execute(
+        text(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid'), {'rowid': _rowid(kind, obj_id)}
+    )
+
+
+def _register(model, kind, build, fields):
+    # The index is written on the flush's own connection, so it commits or
+    # rolls back together with the row it describes.
+    def after_insert(mapper, connection, target):
+        if _index_exists(connection):
+            _write(connection, kind, target, build)
+
+    def after_update(mapper, connection, target):
+        if not _index_exists(connection):
+            return
+        state = inspect(target)
+        if not any(state.attrs[field].history.has_changes() for field in fields):
+            return
+        _delete(connection, kind, target.id)
+        _write(connection, kind, target, build)
+
+    def after_delete(mapper, connection, target):
+        if _index_exists(connection):
+            _delete(connection, kind, target.id)
+
+    event.listen(model, 'after_insert', after_insert)
+    event.listen(model, 'after_update', after_update)
+    event.listen(model, 'after_delete', after_delete)
+
+
+def rebuild_index(connection):
+    """Re-index every contact, family member and task.
+
+    Needed after bulk inserts or raw SQL, which bypass the mapper events.
+    The index table must already exist.
+    """
+    connection.execute(text(f'DELETE FROM {SEARCH_TABLE}'))
+    session = Session(bind=connection)
+    try:
+        for model, kind, build, _ in INDEXED_MODELS:
+            for obj in session.query(model).yield_per(1000):
+                _write(connection, kind, obj, build)
+    finally:
+        session.close()
+    connection.execute(text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"))
+
+
+for _model, _kind, _build, _fields in INDEXED_MODELS:
+    _register(_model, _kind, _build, _fields)
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    kind: str
+    id: int
+    title: str
+    snippet: Markup
+    score: float
+
+    def to_dict(self):
+        return {'kind': self.kind, 'id': self.id, 'title': self.title, 'snippet': str(self.snippet)}
+
+
+def build_match(family_id, query):
+    """Turn free text into an FTS5 query: every term as a prefix, scoped to the family.
+
+    Terms are quoted, so FTS5 operators and column filters typed by the user
+    are treated as plain words. Returns None when there is nothing to search.
+    """
+    terms = TERM_RE.findall(query or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    words = ' AND '.join(f'"{term}"*' for term in terms)
+    return f'scope : "f{int(family_id)}" AND {{title body}} : ({words})'
+
+
+def _highlight(snippet):
+    return Markup(str(escape(snippet)).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def search(family_id, query, kinds=None, limit=10):
+    """Search a family's contacts, members and tasks.
+
+    Results are ranked with BM25, with title matches weighted well above
+    body matches, and carry an escaped snippet with the hits marked.
+    """
+    match = build_match(family_id, query)
+    if match is None:
+        return []
+    if not _index_exists(db.session.connection()):
+        logger.warning("No %s table; run 'flask db upgrade' to enable search", SEARCH_TABLE)
+        return []
+    limit = max(1, min(limit, MAX_RESULTS))
+
+    sql = (
+        f"SELECT rowid, title, snippet({SEARCH_TABLE}, 1, :start, :end, '…', 10), "
+        f"bm25({SEARCH_TABLE}, 10.0, 1.0, 0.0) AS score "
+        f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match"
+    )
+    params = {'match': match, 'start': MARK_START, 'end': MARK_END, 'limit': limit}
+    if kinds:
+        codes = [KIND_CODES[kind] for kind in kinds if kind in KIND_CODES]
+        if not codes:
+            return []
+        sql += f" AND rowid % 4 IN ({', '.join(str(code) for code in codes)})"
+    sql += ' ORDER BY score LIMIT :limit'
+
+    rows = db.session.execute(text(sql), params).fetchall()
+    return [
+        SearchResult(
+            kind=KIND_NAMES[rowid % 4],
+            id=rowid // 4,
+            title=title,
+            snippet=_highlight(snippet) if snippet else Markup(''),
+            score=score
+        )
+        for rowid, title, snippet, score in rows
+    ]
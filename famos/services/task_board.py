@@ -0,0 +1,179 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
+from famos.models.task import Task
+import base64
+import heapq
+import json
+import logging
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.task_board')
+
+BOARD_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+PRIORITY_LABELS = {1: 'Low', 2: 'Medium', 3: 'High'}
+STATUSES = {'open': (False,), 'done': (True,), 'all': (False, True)}
+
+
+class InvalidBoardQuery(ValueError):
+    """Raised for filters or cursors that can't be parsed."""
+
+
+@dataclass(frozen=True)
+class BoardFilters:
+    """Filters for the family task board, parsed from query-string arguments."""
+    status: str = 'open'
+    assignee_id: Optional[int] = None
+    unassigned: bool = False
+    priority: Optional[int] = None
+    due_from: Optional[datetime] = None
+    due_to: Optional[datetime] = None
+
+    @classmethod
+    def from_args(cls, args):
+        status = args.get('status') or 'open'
+        if status not in STATUSES:
+            raise InvalidBoardQuery(f'Unknown status: {status}')
+
+        assignee = args.get('assignee') or ''
+        try:
+            priority = int(args['priority']) if args.get('priority') else None
+            assignee_id = int(assignee) if assignee and assignee != 'none' else None
+            due_from = datetime.fromisoformat(args['due_from']) if args.get('due_from') else None
+            due_to = datetime.fromisoformat(args['due_to']) if args.get('due_to') else None
+        except ValueError as e:
+            raise InvalidBoardQuery(str(e))
+        if priority is not None and priority not in PRIORITY_LABELS:
+            raise InvalidBoardQuery(f'Unknown priority: {priority}')
+        # A bare date as the upper bound includes that whole day
+        if due_to is not None and len(args['due_to']) == 10:
+            due_to += timedelta(days=1)
+
+        return cls(status=status, assignee_id=assignee_id, unassigned=assignee == 'none',
+                   priority=priority, due_from=due_from, due_to=due_to)
+
+    @property
+    def has_due_range(self):
+        return self.due_from is not None or self.due_to is not None
+
+
+@dataclass
+class BoardPage:
+    tasks: List[Task] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
+def board_sort_key(task):
+    """Board order: due date (undated last), then highest priority, then ID."""
+    return (task.due_date is None, task.due_date or datetime.min, -(task.priority or 0), task.id)
+
+
+def encode_cursor(task):
+    due = task.due_date.isoformat() if task.due_date else None
+    raw = json.dumps([due, task.priority, task.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        due, priority, task_id = json.loads(raw)
+        return (datetime.fromisoformat(due) if due else None,
+                int(priority) if priority is not None else None, int(task_id))
+    except (ValueError, TypeError):
+        raise InvalidBoardQuery('Invalid cursor')
+
+
+def _after_priority(priority, task_id):
+    # priority DESC puts NULLs last in SQLite, matching board_sort_key
+    if priority is None:
+        return and_(Task.priority.is_(None), Task.id > task_id)
+    return or_(Task.priority < priority, Task.priority.is_(None),
+               and_(Task.priority == priority, Task.id > task_id))
+
+
+def _after_dated(cursor):
+    due, priority, task_id = cursor
+    # The leading range on due_date lets SQLite seek straight into the index
+    return and_(Task.due_date >= due, or_(Task.due_date > due, _after_priority(priority, task_id)))
+
+
+def _after_undated(cursor):
+    _, priority, task_id = cursor
+    return _after_priority(priority, task_id)
+
+
+def _partition_page(query, cursor, limit, include_undated):
+    """Up to ``limit`` tasks after ``cursor`` from one completed/open partition.
+
+    Dated tasks come first in index order; once they run out the undated
+    tasks follow, also in index order, so neither step needs a sort.
+    """
+    tasks = []
+    if cursor is None or cursor[0] is not None:
+        dated = query.filter(Task.due_date.isnot(None))
+        if cursor is not None:
+            dated = dated.filter(_after_dated(cursor))
+        tasks = dated.order_by(Task.due_date, Task.priority.desc(), Task.id).limit(limit).all()
+        if len(tasks) == limit or not include_undated:
+            return tasks
+        cursor = None
+
+    undated = query.filter(Task.due_date.is_(None))
+    if cursor is not None:
+        undated = undated.filter(_after_undated(cursor))
+    return tasks + undated.order_by(Task.priority.desc(), Task.id).limit(limit - len(tasks)).all()
+
+
+def get_board_page(family_id, filters=None, cursor=None, limit=BOARD_PAGE_SIZE):
+    """Return one page of a family's tasks in board order.
+
+    Pages are keyset-paginated on ``(due_date, priority, id)``, so the cost of
+    a page doesn't grow with the number of historical tasks. Open and completed
+    tasks are read as separate index-ordered streams and merged when both are
+    requested. Assignees are loaded with one extra query per stream.
+    """
+    filters = filters or BoardFilters()
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor else None
+
+    query = Task.query.options(selectinload(Task.assignee)).filter(Task.family_id == family_id)
+    if filters.assignee_id is not None:
+        query = query.filter(Task.assignee_id == filters.assignee_id)
+    elif filters.unassigned:
+        query = query.filter(Task.assignee_id.is_(None))
+    if filters.priority is not None:
+        query = query.filter(Task.priority == filters.priority)
+    if filters.due_from is not None:
+        query = query.filter(Task.due_date >= filters.due_from)
+    if filters.due_to is not None:
+        query = query.filter(Task.due_date < filters.due_to)
+
+    streams = [
+        _partition_page(query.filter(Task.completed == completed), position, limit + 1,
+                        include_undated=not filters.has_due_range)
+        for completed in STATUSES[filters.status]
+    ]
+    tasks = list(islice(heapq.merge(*streams, key=board_sort_key), limit + 1))
+
+    page = BoardPage(tasks=tasks[:limit])
+    if len(tasks) > limit:
+        page.next_cursor = encode_cursor(page.tasks[-1])
+    return page
+
+
+def task_to_dict(task):
+    return {
+        'id': task.id,
+        'title': task.title,
+        'description': task.description or '',
+        'due_date': task.due_date.isoformat() if task.due_date else None,
+        'priority': task.priority,
+        'priority_label': PRIORITY_LABELS.get(task.priority, ''),
+        'completed': bool(task.completed),
+        'assignee': task.assignee.full_name if task.assignee else None,
+    }
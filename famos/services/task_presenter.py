@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta, timezone
+import logging
+from famos.services.task_record import TaskRecord
+from famos.services.tracing import traced
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.task_presenter')
+
+DUE_FORMATS = (
+    "%Y-%m-%dT%H:%M:%SZ",
+    "%Y-%m-%dT%H:%M:%S.%fZ",
+    "%Y-%m-%d",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S",
+)
+
+def parse_due(date_str):
+    """Parse a Google due string into a local datetime, or None."""
+    if not date_str:
+        return None
+    for fmt in DUE_FORMATS:
+        try:
+            date = datetime.strptime(date_str, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        return None
+
+    # Standardized dates are UTC, even without an explicit offset
+    if date.tzinfo is None and fmt.endswith('Z'):
+        date = date.replace(tzinfo=timezone.utc)
+    if date.tzinfo is not None:
+        date = date.astimezone().replace(tzinfo=None)
+    return date
+
+
+@traced()
+def select_tasks(tasks, list_ids=None):
+    """Return the valid tasks as TaskRecords, without computing display fields.
+
+    Invalid tasks (not a record or dict, or without a title) are dropped, as
+    are tasks outside ``list_ids`` when given. Records are returned as they
+    are, not copied, so this is cheap even for thousands of cached tasks.
+    """
+    selected = []
+    dropped = 0
+
+    if list_ids is not None:
+        list_ids = set(list_ids)
+
+    for task in tasks:
+        task = TaskRecord.coerce(task)
+        if task is None or not task.title:
+            dropped += 1
+            continue
+        if list_ids is not None and task.list_id not in list_ids:
+            continue
+        selected.append(task)
+
+    if dropped:
+        logger.warning("Dropped %d tasks without a title", dropped)
+    return selected
+
+
+class PresentedTask:
+    """A task record with its display fields, for one request's templates.
+
+    Source fields (``title``, ``due``, ...) are read through from the record,
+    which stays shared with the task cache.
+    """
+    __slots__ = ('record', 'due_at', 'due_bucket', 'due_label', 'is_completed', 'sort_key')
+
+    def __init__(self, record, due_at, due_bucket, due_label, is_completed, sort_key):
+        self.record = record
+        self.due_at = due_at
+        self.due_bucket = due_bucket
+        self.due_label = due_label
+        self.is_completed = is_completed
+        self.sort_key = sort_key
+
+    def __getattr__(self, name):
+        # Only called for names not in __slots__
+        return getattr(self.record, name)
+
+    def __repr__(self):
+        return f'<PresentedTask {self.record.task_id} {self.due_bucket}>'
+
+
+class TaskPresenter:
+    """Display fields for tasks, all relative to a single ``now`` snapshot.
+
+    ``sort_key`` only needs the parsed due date, so a whole list can be
+    sorted without touching its records; ``present`` wraps a record in a
+    ``PresentedTask`` and is meant for the tasks that are actually rendered.
+    """
+
+    def __init__(self, now=None):
+        self.now = now or datetime.now()
+        self.today = self.now.date()
+        self.tomorrow = self.today + timedelta(days=1)
+        # Many tasks share a due date; parse and format each distinct string once
+        self._due_cache = {}
+
+    def due(self, due_str):
+        """Return ``(due_at, bucket, label)`` for a Google due string."""
+        cached = self._due_cache.get(due_str)
+        if cached is not None:
+            return cached
+
+        due_at = parse_due(due_str)
+        if due_at is None:
+            bucket = 'none'
+            label = due_str
+        else:
+            days = (due_at.date() - self.today).days
+            time_label = due_at.strftime('%-I:%M %p')
+            if days < 0:
+                bucket = 'overdue'
+                label = due_at.strftime('%b %-d at %-I:%M %p')
+            elif days == 0:
+                bucket = 'today'
+                label = f"Today at {time_label}"
+            elif due_at.date() == self.tomorrow:
+                bucket = 'tomorrow'
+                label = f"Tomorrow at {time_label}"
+            elif days < 6:
+                bucket = 'this_week'
+                label = f"{due_at.strftime('%A')} at {time_label}"
+            else:
+                bucket = 'later'
+                label = due_at.strftime('%b %-d at %-I:%M %p')
+        cached = self._due_cache[due_str] = (due_at, bucket, label)
+        return cached
+
+    def sort_key(self, task):
+        """Order by due date with undated tasks last, then by title."""
+        due_at = self.due(task.due)[0]
+        return (due_at is None, due_at or self.now, task.title)
+
+    def present(self, task):
+        due_at, bucket, label = self.due(task.due)
+        return PresentedTask(task, due_at, bucket, label, task.status == 'completed',
+                             (due_at is None, due_at or self.now, task.title))
+
+    def present_nodes(self, nodes):
+        """Fill in the display fields of the tasks in ``nodes``, in place."""
+        for node in nodes:
+            node.task = self.present(node.task)
+        return nodes
+
+
+@traced()
+def present_tasks(tasks, now=None, list_ids=None):
+    """Select the valid tasks and compute every display field for each.
+
+    Pages that render only a window of tasks should use ``select_tasks`` and
+    present just that window with a ``TaskPresenter`` instead.
+    """
+    presenter = TaskPresenter(now)
+    return [presenter.present(task) for task in select_tasks(tasks, list_ids)]
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+import sys
+
+# Fields that come from Google
+SOURCE_FIELDS = (
+    'task_id', 'list_id', 'title', 'notes', 'due', 'status', 'list_name', 'completed', 'parent', 'position'
+)
+
+
+@dataclass(frozen=True, slots=True)
+class TaskRecord:
+    """Compact, immutable view of one Google task.
+
+    List IDs, list names and statuses repeat across thousands of tasks, so
+    they are interned and every record shares the same string objects.
+    Per-request display fields live on ``task_presenter.PresentedTask``,
+    so cached records hold only what Google sent.
+    """
+    task_id: str
+    list_id: str
+    title: str
+    notes: str = ''
+    due: str = ''
+    status: str = ''
+    list_name: str = ''
+    completed: str = ''
+    parent: str = ''
+    position: str = ''
+
+    @classmethod
+    def from_google(cls, task, list_id, list_name, due=''):
+        """Build a record from a raw Tasks API item."""
+        return cls(
+            task_id=task.get('id') or '',
+            list_id=sys.intern(list_id),
+            title=task.get('title') or '',
+            notes=task.get('notes') or '',
+            due=due,
+            status=sys.intern(task.get('status') or ''),
+            list_name=sys.intern(list_name),
+            completed=task.get('completed') or '',
+            parent=task.get('parent') or '',
+            position=task.get('position') or ''
+        )
+
+    @classmethod
+    def coerce(cls, task):
+        """Return ``task`` as a TaskRecord, accepting legacy task dicts.
+
+        Returns None for anything that isn't a record or a mapping.
+        """
+        if isinstance(task, cls):
+            return task
+        if not isinstance(task, dict):
+            return None
+        return cls(
+            task_id=task.get('task_id') or task.get('id') or '',
+            list_id=sys.intern(task.get('list_id') or ''),
+            title=task.get('title') or '',
+            notes=task.get('notes') or '',
+            due=task.get('due') or '',
+            status=sys.intern(task.get('status') or ''),
+            list_name=sys.intern(task.get('list_name') or ''),
+            completed=task.get('completed') or '',
+            parent=task.get('parent') or '',
+            position=task.get('position') or ''
+        )
+
+    def to_dict(self):
+        """Return the Google-derived fields as a plain dict."""
+        return {name: getattr(self, name) for name in SOURCE_FIELDS}
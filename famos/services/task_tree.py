@@ -0,0 +1,103 @@
+class TaskNode:
+    """A task with its subtasks, as Google Tasks nests them via ``parent``."""
+    __slots__ = ('task', 'children', 'depth', 'descendant_count')
+
+    def __init__(self, task):
+        self.task = task
+        self.children = []
+        self.depth = 0
+        self.descendant_count = 0
+
+    @property
+    def child_count(self):
+        return len(self.children)
+
+    def __repr__(self):
+        return f'<TaskNode {self.task.task_id} depth={self.depth} children={self.child_count}>'
+
+
+def _position_key(node):
+    # Google positions are zero-padded strings, so they sort lexicographically
+    return (node.task.position or '\uffff', node.task.title)
+
+
+def _promote_cycles(nodes, roots, reached):
+    """Detach each task in a parent cycle from its parent and make it a root."""
+    for start in nodes.values():
+        path = {}
+        node = start
+        while node not in reached and node not in path:
+            path[node] = len(path)
+            node = nodes[(node.task.list_id, node.task.parent)]
+        if node not in path:
+            continue
+        cycle = list(path)[path[node]:]
+        for member in cycle:
+            nodes[(member.task.list_id, member.task.parent)].children.remove(member)
+        for member in cycle:
+            roots.setdefault(member.task.list_id, []).append(member)
+            stack = [member]
+            while stack:
+                current = stack.pop()
+                reached.add(current)
+                stack.extend(current.children)
+
+
+def build_task_trees(tasks):
+    """Assemble subtask trees for each list in linear time.
+
+    Tasks are indexed by ``(list_id, task_id)`` and attached to their parent in
+    a single pass. Tasks whose parent is missing (deleted, or filtered out),
+    and tasks in a parent cycle, become roots. Siblings are ordered by Google's ``position``. Returns a dict
+    mapping each list ID to its root nodes, in position order.
+    """
+    nodes = {}
+    for task in tasks:
+        nodes[(task.list_id, task.task_id)] = TaskNode(task)
+
+    roots = {}
+    for node in nodes.values():
+        task = node.task
+        parent = nodes.get((task.list_id, task.parent)) if task.parent else None
+        if parent is None or parent is node:
+            roots.setdefault(task.list_id, []).append(node)
+        else:
+            parent.children.append(node)
+
+    # A cycle of parents is unreachable from every root, so it would vanish
+    reached = set()
+    stack = [root for list_roots in roots.values() for root in list_roots]
+    while stack:
+        node = stack.pop()
+        reached.add(node)
+        stack.extend(node.children)
+    if len(reached) < len(nodes):
+        _promote_cycles(nodes, roots, reached)
+
+    # Walk each tree once to sort siblings and fill in depth and descendant counts
+    for list_roots in roots.values():
+        list_roots.sort(key=_position_key)
+        stack = [(root, False) for root in list_roots]
+        while stack:
+            node, visited = stack.pop()
+            if visited:
+                node.descendant_count = sum(child.descendant_count + 1 for child in node.children)
+                continue
+            node.children.sort(key=_position_key)
+            stack.append((node, True))
+            for child in node.children:
+                child.depth = node.depth + 1
+                stack.append((child, False))
+
+    return roots
+
+
+def find_node(roots, task_id):
+    """Return the node for ``task_id`` in a list of root nodes, or None."""
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        if node.task.task_id == task_id:
+            return node
+        stack.extend(node.children)
+    return None
@@ -0,0 +1,44 @@
+from famos.services.task_tree import build_task_trees
+
+
+def sort_by_due(nodes, presenter):
+    """Sort task nodes by due date, with undated tasks last."""
+    return sorted(nodes, key=lambda node: presenter.sort_key(node.task))
+
+
+def slice_window(items, offset, size):
+    """Return one window of already-sorted items plus the offset of the next one."""
+    window = items[offset:offset + size]
+    next_offset = offset + size if offset + size < len(items) else None
+    return window, next_offset
+
+
+def window_tasks_by_list(tasks, task_lists, size, presenter):
+    """Build subtask trees per list and keep only the first window of top-level tasks.
+
+    Top-level tasks are sorted by due date; subtasks stay attached to their
+    parent node and are rendered on demand. Only the tasks in each window are
+    presented with ``presenter``. Returns a list of dicts with
+    ``list_id``, ``title``, ``nodes`` (the window), ``total`` (top-level task
+    count) and ``next_offset`` (None when the list is fully rendered), ordered
+    like ``task_lists`` with unknown lists appended.
+    """
+    trees = build_task_trees(tasks)
+
+    titles = {tl['id']: tl['title'] for tl in task_lists}
+    order = [tl['id'] for tl in task_lists if tl['id'] in trees]
+    order.extend(list_id for list_id in trees if list_id not in titles)
+
+    windows = []
+    for list_id in order:
+        roots = sort_by_due(trees[list_id], presenter)
+        window, next_offset = slice_window(roots, 0, size)
+        presenter.present_nodes(window)
+        windows.append({
+            'list_id': list_id,
+            'title': titles.get(list_id) or roots[0].task.list_name,
+            'nodes': window,
+            'total': len(roots),
+            'next_offset': next_offset
+        })
+    return windows
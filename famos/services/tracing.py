@@ -0,0 +1,408 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from flask import g, request
+from sqlalchemy import event
+from famos.utils.logger import get_pipeline
+from famos.utils.sql_profiler import fingerprint
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; rotation is then only safe for a single process
+    fcntl = None
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.tracing')
+
+SERVICE_NAME = 'famos'
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+MAX_TAG_LENGTH = 512
+
+_current_trace = ContextVar('famos_trace', default=None)
+_current_span = ContextVar('famos_span', default=None)
+
+
+def _new_id(nbytes):
+    return os.urandom(nbytes).hex()
+
+
+class Trace:
+    """Spans recorded for one request. Unsampled traces only carry their ID."""
+    __slots__ = ('trace_id', 'sampled', 'spans', 'max_spans', 'dropped')
+
+    def __init__(self, trace_id=None, sampled=False, max_spans=1000):
+        self.trace_id = trace_id or _new_id(16)
+        self.sampled = sampled
+        self.spans = []
+        self.max_spans = max_spans
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'kind', 'start', 'duration', 'tags', '_started')
+
+    def __init__(self, trace, name, parent_id=None, kind=None, tags=None):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.tags = tags or {}
+        self.start = time.time()
+        self.duration = None
+        self._started = time.perf_counter()
+
+    def set_tag(self, key, value):
+        self.tags[key] = value
+
+    def finish(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+            if len(self.trace.spans) < self.trace.max_spans:
+                self.trace.spans.append(self)
+            else:
+                self.trace.dropped += 1
+
+    def to_zipkin(self):
+        """This span in Zipkin's v2 JSON format."""
+        span = {
+            'traceId': self.trace.trace_id,
+            'id': self.span_id,
+            'name': self.name,
+            'timestamp': int(self.start * 1e6),
+            'duration': max(1, int((self.duration or 0) * 1e6)),
+            'localEndpoint': {'serviceName': SERVICE_NAME},
+            'tags': {key: str(value)[:MAX_TAG_LENGTH] for key, value in self.tags.items()},
+        }
+        if self.parent_id:
+            span['parentId'] = self.parent_id
+        if self.kind:
+            span['kind'] = self.kind
+        return span
+
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def start_span(name, kind=None, **tags):
+    """Start a child of the current span, or return None when the trace isn't sampled."""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        return None
+    parent = _current_span.get()
+    return Span(trace, name, parent.span_id if parent is not None else None, kind, tags)
+
+
+@contextmanager
+def span(name, kind=None, **tags):
+    """Time the block as a span nested under the current one."""
+    current = start_span(name, kind, **tags)
+    if current is None:
+        yield None
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set_tag('error', type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+
+
+def traced(name=None):
+    """Decorator recording each call of a function as a span."""
+    def decorator(fn):
+        span_name = name or f'{fn.__module__.rsplit(".", 1)[-1]}.{fn.__name__}'
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None or not trace.sampled:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class JsonlSink:
+    """Append spans to a file, one Zipkin v2 span per line.
+
+    Once the file reaches ``max_bytes`` it is rotated to ``.1`` (up to
+    ``backups`` old files are kept), under an ``flock`` on a sidecar lock
+    file so that workers sharing the file rotate it once.
+    """
+
+    def __init__(self, path, max_bytes=0, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _rotate(self):
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{n}'):
+                os.replace(f'{self.path}.{n}', f'{self.path}.{n + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+    def _append(self, data):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def write(self, spans):
+        # One write per batch; O_APPEND keeps lines from several workers whole
+        data = ''.join(json.dumps(span, separators=(',', ':')) + '\n' for span in spans).encode()
+        if self.max_bytes <= 0:
+            self._append(data)
+            return
+        # Opened per batch, so a forked worker never shares its parent's lock
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                    self._rotate()
+                self._append(data)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class ZipkinSink:
+    """POST spans to a Zipkin-compatible collector's /api/v2/spans endpoint."""
+
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def write(self, spans):
+        body = json.dumps(spans, separators=(',', ':')).encode()
+        req = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+
+class BatchExporter:
+    """Hand finished traces to a sink from a background thread, in batches.
+
+    Requests never wait on the sink: a full queue drops the trace.
+    """
+
+    def __init__(self, sink, queue_size=1000, batch_size=50, interval=1.0):
+        self.sink = sink
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._pid = None
+        self._queue = None
+
+    def _ensure_running(self):
+        # A forked worker has the parent's queue but not its thread
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._queue = queue.Queue(self.queue_size)
+        threading.Thread(target=self._run, args=(self._queue,), name='famos-trace-export', daemon=True).start()
+
+    def export(self, trace):
+        self._ensure_running()
+        try:
+            self._queue.put_nowait([span.to_zipkin() for span in trace.spans])
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self, pending):
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(pending.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            spans = [span for trace in batch for span in trace]
+            try:
+                self.sink.write(spans)
+            except Exception as e:
+                logger.warning("Could not export %d spans: %s", len(spans), e)
+            finally:
+                for _ in batch:
+                    pending.task_done()
+
+    def flush(self):
+        """Block until every queued trace has been written."""
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+
+class RateLimit:
+    """Allow up to ``per_minute`` events a minute, in a steady trickle."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.allowance = float(per_minute)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        if self.per_minute <= 0:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self.allowance = min(self.per_minute, self.allowance + (now - self._last) * self.per_minute / 60)
+            self._last = now
+            if self.allowance < 1:
+                return False
+            self.allowance -= 1
+            return True
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamp log records with the current trace ID for correlation."""
+
+    def filter(self, record):
+        trace = _current_trace.get()
+        if trace is not None:
+            record.trace_id = trace.trace_id
+        return True
+
+
+def _parse_traceparent(header):
+    match = TRACEPARENT_RE.match((header or '').strip().lower())
+    if not match or match.group(1) == '0' * 32:
+        return None, None, False
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def _trace_templates(app):
+    base = app.jinja_env.template_class
+
+    class TracedTemplate(base):
+        def render(self, *args, **kwargs):
+            with span(f'render {self.name}', template=self.name):
+                return super().render(*args, **kwargs)
+
+    app.jinja_env.template_class = TracedTemplate
+
+
+def _trace_sql(engine):
+    def before(conn, cursor, statement, parameters, context, executemany):
+        current = start_span('sql', kind='CLIENT', **{'db.statement': fingerprint(statement)})
+        if current is not None:
+            conn.info.setdefault('_famos_sql_spans', []).append(current)
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get('_famos_sql_spans')
+        if spans:
+            spans.pop().finish()
+
+    def on_error(context):
+        spans = context.connection.info.get('_famos_sql_spans') if context.connection is not None else None
+        if spans:
+            current = spans.pop()
+            current.set_tag('error', type(context.original_exception).__name__)
+            current.finish()
+
+    event.listen(engine, 'before_cursor_execute', before)
+    event.listen(engine, 'after_cursor_execute', after)
+    event.listen(engine, 'handle_error', on_error)
+
+
+def init_app(app, db):
+    """Trace requests for ``app``; sampled traces go to ``TRACE_EXPORT``.
+
+    Every request gets a trace ID (from an incoming W3C ``traceparent``
+    header when there is one), returned as ``X-Trace-Id`` and stamped on its
+    log records. ``TRACE_SAMPLE_RATE`` of requests, plus any whose
+    traceparent is flagged as sampled (up to
+    ``TRACE_UPSTREAM_SAMPLED_PER_MINUTE`` per worker), record spans for the
+    request, template rendering, traced service functions, Google API calls
+    and SQL statements. The ``jsonl`` export rotates ``TRACE_FILE`` at
+    ``TRACE_FILE_MAX_BYTES``, keeping ``TRACE_FILE_BACKUPS`` old files.
+    """
+    app.config.setdefault('TRACE_ENABLED', True)
+    app.config.setdefault('TRACE_SAMPLE_RATE', 0.0 if app.testing else 0.01)
+    app.config.setdefault('TRACE_MAX_SPANS', 1000)
+    app.config.setdefault('TRACE_UPSTREAM_SAMPLED_PER_MINUTE', 60)
+    app.config.setdefault('TRACE_EXPORT', 'jsonl')
+    app.config.setdefault('TRACE_FILE', os.path.join(app.instance_path, 'traces', 'spans.jsonl'))
+    app.config.setdefault('TRACE_FILE_MAX_BYTES', 50 * 1024 * 1024)
+    app.config.setdefault('TRACE_FILE_BACKUPS', 3)
+    app.config.setdefault('TRACE_ZIPKIN_URL', 'http://localhost:9411/api/v2/spans')
+    if not app.config['TRACE_ENABLED']:
+        return None
+
+    if app.config['TRACE_EXPORT'] == 'zipkin':
+        sink = ZipkinSink(app.config['TRACE_ZIPKIN_URL'])
+    else:
+        sink = JsonlSink(app.config['TRACE_FILE'], app.config['TRACE_FILE_MAX_BYTES'],
+                         app.config['TRACE_FILE_BACKUPS'])
+    exporter = BatchExporter(sink)
+    app.extensions['famos_tracing'] = exporter
+    upstream_sampled = RateLimit(app.config['TRACE_UPSTREAM_SAMPLED_PER_MINUTE'])
+
+    _trace_templates(app)
+    _trace_sql(db.get_engine(app))
+
+    pipeline = get_pipeline()
+    if pipeline is not None:
+        pipeline.handler.addFilter(TraceContextFilter())
+
+    @app.before_request
+    def _start_trace():
+        trace_id, parent_id, sampled = _parse_traceparent(request.headers.get('traceparent'))
+        # Anyone can send a sampled traceparent, so only so many are honoured
+        sampled = (sampled and upstream_sampled.allow()) or random.random() < app.config['TRACE_SAMPLE_RATE']
+        trace = Trace(trace_id, sampled, app.config['TRACE_MAX_SPANS'])
+        root = Span(trace, f'{request.method} {request.url_rule or request.path}', parent_id, 'SERVER',
+                    {'http.method': request.method, 'http.path': request.path}) if sampled else None
+        g._famos_trace = (trace, root, _current_trace.set(trace), _current_span.set(root))
+
+    @app.after_request
+    def _tag_trace(response):
+        state = g.get('_famos_trace')
+        if state is not None:
+            trace, root = state[0], state[1]
+            response.headers['X-Trace-Id'] = trace.trace_id
+            if root is not None:
+                root.set_tag('http.status_code', response.status_code)
+                root.set_tag('endpoint', request.endpoint or 'unmatched')
+        return response
+
+    @app.teardown_request
+    def _finish_trace(exc):
+        state = g.pop('_famos_trace', None)
+        if state is None:
+            return
+        trace, root, trace_token, span_token = state
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        if root is not None:
+            if exc is not None:
+                root.set_tag('error', type(exc).__name__)
+            if trace.dropped:
+                root.set_tag('spans.dropped', trace.dropped)
+            root.finish()
+            exporter.export(trace)
+
+    return exporter
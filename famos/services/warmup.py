@@ -0,0 +1,314 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from flask import current_app
+from famos import db
+from famos.models.integrations import GoogleIntegration
+from famos.services.google_ledger import recent_users
+from famos.services.google_tasks import get_user_tasks, tasks_discovery_document
+import importlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; every worker then warms on its own
+    fcntl = None
+
+# Get a logger for this module
+logger = logging.getLogger('famos.services.warmup')
+
+# Imported lazily by the request code (see google_tasks and the OAuth routes)
+GOOGLE_MODULES = (
+    'google.oauth2.credentials',
+    'google.auth.transport.requests',
+    'googleapiclient.discovery',
+    'googleapiclient.errors',
+    'google_auth_oauthlib.flow',
+)
+
+
+def warm_shared_state(app):
+    """Load what each worker would otherwise load on its own first requests.
+
+    Imports the Google client libraries, parses the Tasks discovery document
+    and compiles every template. Run in the server's master process before
+    it forks, so workers share all of it copy-on-write. Returns the seconds
+    spent on each step.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    for name in GOOGLE_MODULES:
+        importlib.import_module(name)
+    timings['imports'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tasks_discovery_document()
+    timings['discovery'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    templates = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in templates:
+        app.jinja_env.get_template(name)
+    timings['templates'] = time.perf_counter() - started
+
+    logger.info("Warmed shared state: %s",
+                ', '.join(f'{step} {seconds * 1000:.0f} ms' for step, seconds in timings.items()),
+                extra={'fields': {'templates': len(templates)}})
+    return timings
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Warmup:
+    """Warm one worker process's caches before it reports ready.
+
+    Loads the shared state, then fetches the tasks of the ``users`` most
+    recently active users with Tasks enabled, ``concurrency`` at a time.
+    Fetching builds each user's client and refreshes expired tokens on the
+    way. Users not reached within ``deadline`` seconds are skipped, so a
+    slow Google can delay readiness but not prevent it.
+
+    Workers take turns through an exclusive lock on ``lock_path``, each
+    running the whole prefetch in its turn. The first fetches from Google
+    into the shared cache tier, so the later ones' fetches are answered
+    from that tier instead. A worker whose turn doesn't come before the
+    deadline skips the prefetch.
+
+    Under the prefork server, readiness is reported for the host: the
+    master lists its current workers in ``ready_dir`` and each worker marks
+    itself there once warm (see ``host_status``).
+    """
+
+    def __init__(self, users=50, active_days=3, deadline=60.0, concurrency=4, lock_path=None, ready_dir=None):
+        self.users = users
+        self.active_days = active_days
+        self.deadline = deadline
+        self.concurrency = concurrency
+        self.lock_path = lock_path
+        self.ready_dir = ready_dir
+        self.host_dir = None
+        self.worker_id = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self.state = 'pending'
+        self.started_at = None
+        self.seconds = None
+        self.warmed = 0
+        self.failed = 0
+        self.skipped = 0
+        self._done = threading.Event()
+
+    def start(self, app):
+        """Start warming this process in the background, once per process."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker has none of its parent's per-worker caches
+            self._pid = os.getpid()
+            self._reset()
+            self.state = 'running'
+            self.started_at = time.monotonic()
+            threading.Thread(target=self._run, args=(app,), name='famos-warmup', daemon=True).start()
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def prepare_host(self):
+        """Set up this master's readiness directory, dropping those of masters that are gone."""
+        if not self.ready_dir:
+            return
+        os.makedirs(self.ready_dir, exist_ok=True)
+        for name in os.listdir(self.ready_dir):
+            if name.isdigit() and (int(name) == os.getpid() or not _process_alive(int(name))):
+                shutil.rmtree(os.path.join(self.ready_dir, name), ignore_errors=True)
+        os.makedirs(os.path.join(self.ready_dir, str(os.getpid())))
+
+    def expect_workers(self, worker_ids):
+        """Record the master's current workers; the host is ready once all of them are."""
+        if not self.ready_dir:
+            return
+        path = os.path.join(self.ready_dir, str(os.getpid()), 'workers.json')
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'workers': list(worker_ids)}, f)
+        os.replace(tmp, path)
+
+    def join_host(self, master_pid, worker_id):
+        """Report this worker's readiness alongside the other workers of ``master_pid``."""
+        if self.ready_dir:
+            self.host_dir = os.path.join(self.ready_dir, str(master_pid))
+            self.worker_id = worker_id
+
+    def host_status(self):
+        """``{'ready': n, 'expected': m}`` for this worker's server, or None outside one."""
+        if self.host_dir is None:
+            return None
+        try:
+            with open(os.path.join(self.host_dir, 'workers.json')) as f:
+                expected = json.load(f)['workers']
+        except (OSError, ValueError, KeyError):
+            # The master hasn't listed its workers yet
+            expected = []
+        ready = sum(os.path.exists(os.path.join(self.host_dir, f'{worker_id}.ready')) for worker_id in expected)
+        return {'ready': ready, 'expected': len(expected)}
+
+    def _mark_ready(self):
+        if self.host_dir is None:
+            return
+        try:
+            with open(os.path.join(self.host_dir, f'{self.worker_id}.ready'), 'w'):
+                pass
+        except OSError as e:
+            logger.warning("Could not mark worker %s ready: %s", self.worker_id, e)
+
+    def status(self):
+        seconds = self.seconds
+        if seconds is None and self.started_at is not None:
+            seconds = time.monotonic() - self.started_at
+        return {
+            'state': self.state,
+            'seconds': round(seconds or 0.0, 3),
+            'users': {'warmed': self.warmed, 'failed': self.failed, 'skipped': self.skipped},
+        }
+
+    def _run(self, app):
+        try:
+            with app.app_context():
+                warm_shared_state(app)
+                user_ids = self._users_to_warm()
+            with self._turn() as ours:
+                if ours:
+                    self._prefetch(app, user_ids)
+                else:
+                    self.skipped += len(user_ids)
+        except Exception:
+            logger.exception("Warmup failed")
+        finally:
+            self.seconds = time.monotonic() - self.started_at
+            self.state = 'ready'
+            self._mark_ready()
+            self._done.set()
+            logger.info("Warmup finished in %.1fs: %d users warmed, %d failed, %d skipped",
+                        self.seconds, self.warmed, self.failed, self.skipped)
+
+    @contextmanager
+    def _turn(self):
+        """Wait, up to the deadline, until no other worker is warming; yields whether we got the turn."""
+        if fcntl is None or not self.lock_path:
+            yield True
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            deadline = self.started_at + self.deadline
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.warning("Another worker is still warming up; skipping the prefetch")
+                        yield False
+                        return
+                    time.sleep(0.1)
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _users_to_warm(self):
+        if not self.users:
+            return []
+        try:
+            # Rank a few extra, as some won't have Tasks enabled any more
+            candidates = recent_users(self.users * 2, self.active_days)
+            enabled = {
+                user_id for user_id, in db.session.query(GoogleIntegration.user_id).filter(
+                    GoogleIntegration.user_id.in_(candidates),
+                    GoogleIntegration.tasks_enabled.is_(True),
+                    GoogleIntegration.access_token.isnot(None)
+                )
+            } if candidates else set()
+            return [user_id for user_id in candidates if user_id in enabled][:self.users]
+        finally:
+            db.session.remove()
+
+    def _prefetch(self, app, user_ids):
+        if not user_ids:
+            return
+        deadline = self.started_at + self.deadline
+        pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix='famos-warmup')
+        futures = [pool.submit(self._prefetch_user, app, user_id, deadline) for user_id in user_ids]
+        _, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        self.skipped += len(pending)
+        # Fetches still running finish in the background and fill the cache late
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _prefetch_user(self, app, user_id, deadline):
+        if time.monotonic() > deadline:
+            return
+        with app.app_context():
+            try:
+                get_user_tasks(user_id)
+                with self._lock:
+                    self.warmed += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                logger.warning("Could not warm tasks for user %s: %s", user_id, e)
+            finally:
+                db.session.remove()
+
+
+def init_app(app):
+    """Set up readiness warmup for ``app``; each worker starts it on its first request."""
+    # Off under test: the warmup thread would share the test's in-memory database
+    app.config.setdefault('WARMUP_ENABLED', not app.testing)
+    app.config.setdefault('WARMUP_RECENT_USERS', 50)
+    app.config.setdefault('WARMUP_ACTIVE_DAYS', 3)
+    app.config.setdefault('WARMUP_DEADLINE', 60.0)
+    app.config.setdefault('WARMUP_CONCURRENCY', 4)
+    # Shared by the workers on this host, so only one of them fetches from Google at a time
+    app.config.setdefault('WARMUP_LOCK_PATH', os.path.join(app.instance_path, 'warmup.lock'))
+    # Where the prefork server's master and workers track which workers are warm
+    app.config.setdefault('WARMUP_READY_DIR', os.path.join(app.instance_path, 'ready'))
+    if not app.config['WARMUP_ENABLED']:
+        return
+
+    warmup = Warmup(
+        users=app.config['WARMUP_RECENT_USERS'],
+        active_days=app.config['WARMUP_ACTIVE_DAYS'],
+        deadline=app.config['WARMUP_DEADLINE'],
+        concurrency=app.config['WARMUP_CONCURRENCY'],
+        lock_path=app.config['WARMUP_LOCK_PATH'],
+        ready_dir=app.config['WARMUP_READY_DIR']
+    )
+    app.extensions['famos_warmup'] = warmup
+
+    @app.before_request
+    def _start_warmup():
+        warmup.start(app)
+
+
+def get_warmup():
+    return current_app.extensions.get('famos_warmup')
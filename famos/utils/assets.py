@@ -0,0 +1,78 @@
+import hashlib
+import os
+import threading
+from flask import request, current_app
+
+
+class StaticAssets:
+    """Content-hash fingerprinting for static files.
+
+    ``url_for('static', filename=...)`` gets a ``v=<hash>`` query argument
+    derived from the file contents. Requests carrying the current hash are
+    served with a far-future immutable ``Cache-Control`` header, so browsers
+    never revalidate them; a changed file gets a new URL instead.
+    """
+
+    def __init__(self, app=None):
+        self._hashes = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STATIC_FINGERPRINT', True)
+        app.config.setdefault('STATIC_FINGERPRINT_LENGTH', 12)
+        app.config.setdefault('STATIC_IMMUTABLE_MAX_AGE', 31536000)  # 1 year
+        app.url_defaults(self.add_fingerprint)
+        app.after_request(self.after_request)
+
+    def fingerprint(self, filename):
+        """Return the content hash for a static file, or None if it doesn't exist."""
+        app = current_app._get_current_object()
+        path = os.path.join(app.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns if app.debug else None
+        except OSError:
+            return None
+
+        key = (app.static_folder, filename)
+        cached = self._hashes.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with open(path, 'rb') as f:
+                digest = hashlib.md5(f.read()).hexdigest()
+            digest = digest[:app.config['STATIC_FINGERPRINT_LENGTH']]
+        except OSError:
+            # Remember missing files too, so broken links don't hit the disk on every render
+            digest = None
+
+        with self._lock:
+            self._hashes[key] = (mtime, digest)
+        return digest
+
+    def add_fingerprint(self, endpoint, values):
+        if endpoint != 'static' or 'v' in values:
+            return
+        if not current_app.config['STATIC_FINGERPRINT']:
+            return
+        filename = values.get('filename')
+        if filename:
+            digest = self.fingerprint(filename)
+            if digest:
+                values['v'] = digest
+
+    def after_request(self, response):
+        if request.endpoint != 'static' or response.status_code not in (200, 304):
+            return response
+
+        version = request.args.get('v')
+        filename = (request.view_args or {}).get('filename')
+        if version and filename and version == self.fingerprint(filename):
+            max_age = current_app.config['STATIC_IMMUTABLE_MAX_AGE']
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
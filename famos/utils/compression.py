@@ -0,0 +1,120 @@
+import zlib
+from flask import request, current_app
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+DEFAULT_MIMETYPES = frozenset([
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/xml',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+])
+
+
+class Compress:
+    """Compress responses with brotli or gzip based on the client's Accept-Encoding.
+
+    Buffered responses smaller than ``COMPRESS_MIN_SIZE`` are sent as-is.
+    Streamed responses (including static files) are compressed chunk by chunk
+    so nothing is buffered in memory.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BR_QUALITY', 4)
+        app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+        app.after_request(self.after_request)
+
+    def choose_encoding(self):
+        """Return the best encoding the client accepts, or None."""
+        accepted = request.accept_encodings
+        if brotli is not None and accepted.quality('br') > 0:
+            return 'br'
+        if accepted.quality('gzip') > 0:
+            return 'gzip'
+        return None
+
+    def after_request(self, response):
+        config = current_app.config
+
+        if not config['COMPRESS_ENABLED']:
+            return response
+        if response.mimetype not in config['COMPRESS_MIMETYPES']:
+            return response
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if 'Content-Encoding' in response.headers or request.method == 'HEAD':
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+
+        if response.direct_passthrough or response.is_streamed:
+            length = response.content_length
+            if length is not None and length < config['COMPRESS_MIN_SIZE']:
+                return response
+            response.response = self._compress_stream(response.response, encoding, config)
+            response.direct_passthrough = False
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(self._compress_bytes(data, encoding, config))
+
+        response.headers['Content-Encoding'] = encoding
+
+        # The encoded body differs byte-wise from the original, so the
+        # validator must become weak to keep conditional requests working.
+        etag, _ = response.get_etag()
+        if etag:
+            response.set_etag(etag, weak=True)
+
+        return response
+
+    def _compress_bytes(self, data, encoding, config):
+        if encoding == 'br':
+            return brotli.compress(data, quality=config['COMPRESS_BR_QUALITY'])
+        compressor = zlib.compressobj(config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def _compress_stream(self, chunks, encoding, config):
+        try:
+            if encoding == 'br':
+                compressor = brotli.Compressor(quality=config['COMPRESS_BR_QUALITY'])
+                for chunk in chunks:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    data = compressor.process(chunk) + compressor.flush()
+                    if data:
+                        yield data
+                yield compressor.finish()
+            else:
+                compressor = zlib.compressobj(config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+                for chunk in chunks:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    # Sync flush so streamed templates reach the browser progressively
+                    data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                    if data:
+                        yield data
+                yield compressor.flush()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
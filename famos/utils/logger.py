@@ -1,38 +1,354 @@
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
 import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; rotation is then only safe for a single process
+    fcntl = None
 
 # Create a logger instance
 logger = logging.getLogger('famos')
 
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+
+def _truncate(text, limit):
+    if limit and len(text) > limit:
+        return f'{text[:limit]}… [{len(text) - limit} more chars]'
+    return text
+
+
+class LazyJson:
+    """A log argument that is only serialized if a handler renders the record.
+
+    ``logger.debug('Response: %s', LazyJson(response))`` costs nothing when
+    debug logging is off, and the rendered payload is capped at ``limit``
+    characters when it is on.
+    """
+    __slots__ = ('payload', 'limit')
+
+    def __init__(self, payload, limit=1024):
+        self.payload = payload
+        self.limit = limit
+
+    def __str__(self):
+        try:
+            text = json.dumps(self.payload, default=str, separators=(',', ':'))
+        except (TypeError, ValueError):
+            text = repr(self.payload)
+        return _truncate(text, self.limit)
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line.
+
+    Structured fields passed as ``extra={'fields': {...}}`` are included
+    alongside the message. Messages, tracebacks and field values are capped
+    so a single huge payload can't bloat the log.
+    """
+
+    def __init__(self, max_message=4096, max_field=1024, max_traceback=8192):
+        super().__init__()
+        self.max_message = max_message
+        self.max_field = max_field
+        self.max_traceback = max_traceback
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'pid': record.process,
+            'message': _truncate(record.getMessage(), self.max_message),
+        }
+        trace_id = getattr(record, 'trace_id', None)
+        if trace_id:
+            entry['trace_id'] = trace_id
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry['fields'] = {
+                key: value if isinstance(value, (int, float, bool)) or value is None
+                else _truncate(str(value), self.max_field)
+                for key, value in fields.items()
+            }
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = _truncate(record.exc_text, self.max_traceback)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most ``burst`` records per message template every ``interval`` seconds.
+
+    Records are keyed on logger, level and the unformatted message, so the
+    same call site logging different arguments counts as one message. The
+    first record let through after a quiet spell carries a ``suppressed``
+    count of what was dropped.
+    """
+
+    def __init__(self, burst=20, interval=60.0, max_keys=10000):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_keys = max_keys
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record, now=None):
+        if self.burst <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg))
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if len(self._windows) >= self.max_keys:
+                    self._windows.clear()
+                dropped = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if dropped:
+                    record.suppressed = dropped
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class LockingRotatingFileHandler(RotatingFileHandler):
+    """A size-rotating file handler that several worker processes can share.
+
+    Writes and rollovers happen under an exclusive ``flock`` on a sidecar
+    ``.lock`` file, and a process whose file was rotated away by another
+    worker reopens the new one before writing.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, encoding='utf-8'):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=True)
+        self.lock_path = self.baseFilename + '.lock'
+        self._lock_file = None
+
+    def _acquire_file_lock(self):
+        if fcntl is None:
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self.lock_path, 'a')
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+
+    def _release_file_lock(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev):
+            self.stream.close()
+            self.stream = None
+
+    def shouldRollover(self, record):
+        # The size comes from the end of the shared file, not this process's
+        # writes. Checking before the write (rather than formatting the record
+        # twice) lets a file overshoot maxBytes by at most one record.
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.seek(0, os.SEEK_END) >= self.maxBytes
+
+    def emit(self, record):
+        try:
+            self._acquire_file_lock()
+            try:
+                self._reopen_if_rotated()
+                super().emit(record)
+            finally:
+                self._release_file_lock()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def reset_after_fork(self):
+        """Drop the lock file and stream inherited from the parent process.
+
+        A flock belongs to the open file description, which a forked child
+        shares with its parent and siblings, so each process opens its own.
+        """
+        for inherited in (self._lock_file, self.stream):
+            if inherited is not None:
+                try:
+                    inherited.close()
+                except OSError:
+                    pass
+        self._lock_file = None
+        self.stream = None
+
+
+class _QueueHandler(QueueHandler):
+    """Hand records to the listener thread without rendering them.
+
+    The stock QueueHandler formats every record in the calling thread; here
+    the message and its arguments are left for the listener, and only a
+    traceback is rendered up front, while its frames still exist. A full
+    queue drops the record rather than blocking the request; ``dropped``
+    counts them for the ``famos_log_records_dropped_total`` metric.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Route ``famos`` logging through a bounded queue to a background listener.
+
+    Callers only pay for the level check, the rate-limit filter and a queue
+    put; formatting and file I/O happen on the listener thread.
+    """
+
+    def __init__(self, handlers, rate_limit=None, queue_size=10000):
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.handler = _QueueHandler(queue.Queue(queue_size))
+        if rate_limit is not None:
+            self.handler.addFilter(rate_limit)
+        self.listener = None
+
+    def start(self):
+        self.listener = QueueListener(self.handler.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        for handler in self.handlers:
+            handler.close()
+
+    def restart_after_fork(self):
+        # The parent's listener thread doesn't exist in a forked child, and
+        # its queue's locks may have been held mid-fork, so start over.
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.handler.dropped = 0
+        self.listener = None
+        for handler in self.handlers:
+            if isinstance(handler, LockingRotatingFileHandler):
+                handler.reset_after_fork()
+        self.start()
+
+
+_pipeline = None
+
+
+def _stop_pipeline():
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline = None
+
+
+def _after_fork_in_child():
+    if _pipeline is not None:
+        _pipeline.restart_after_fork()
+
+
+atexit.register(_stop_pipeline)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_pipeline():
+    return _pipeline
+
+
 def setup_logger(app):
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    
-    # Configure file handler
-    file_handler = RotatingFileHandler(
-        'logs/famos.log',
-        maxBytes=10240,
-        backupCount=10
+    """Install the queue-backed logging pipeline on the ``famos`` logger.
+
+    Enabled by default outside of testing. Records are written as JSON lines
+    to ``LOG_DIR/famos.log`` (rotated at ``LOG_MAX_BYTES``) and as text to
+    the console. Calling it again replaces the previous pipeline.
+    """
+    app.config.setdefault('LOG_PIPELINE_ENABLED', not app.testing)
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_DIR', os.path.join(os.path.dirname(app.root_path), 'logs'))
+    app.config.setdefault('LOG_MAX_BYTES', 10 * 1024 * 1024)
+    app.config.setdefault('LOG_BACKUP_COUNT', 10)
+    app.config.setdefault('LOG_CONSOLE', True)
+    app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+    app.config.setdefault('LOG_RATE_LIMIT_BURST', 20)
+    app.config.setdefault('LOG_RATE_LIMIT_INTERVAL', 60.0)
+    app.config.setdefault('LOG_MAX_MESSAGE', 4096)
+
+    if not app.config['LOG_PIPELINE_ENABLED']:
+        return None
+
+    global _pipeline
+    _stop_pipeline()
+
+    os.makedirs(app.config['LOG_DIR'], exist_ok=True)
+    file_handler = LockingRotatingFileHandler(
+        os.path.join(app.config['LOG_DIR'], 'famos.log'),
+        maxBytes=app.config['LOG_MAX_BYTES'],
+        backupCount=app.config['LOG_BACKUP_COUNT']
     )
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    
-    # Configure stream handler for console output
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s'
-    ))
-    stream_handler.setLevel(logging.INFO)
-    
-    # Add handlers to both app and module loggers
-    for handler in [file_handler, stream_handler]:
-        app.logger.addHandler(handler)
-        logger.addHandler(handler)
-    
-    app.logger.setLevel(logging.INFO)
-    logger.setLevel(logging.INFO)
-    
-    logger.info('famOS startup')
+    file_handler.setFormatter(JsonFormatter(max_message=app.config['LOG_MAX_MESSAGE']))
+    handlers = [file_handler]
+    if app.config['LOG_CONSOLE']:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(console_handler)
+
+    rate_limit = RateLimitFilter(
+        burst=app.config['LOG_RATE_LIMIT_BURST'],
+        interval=app.config['LOG_RATE_LIMIT_INTERVAL']
+    )
+    _pipeline = LogPipeline(handlers, rate_limit=rate_limit, queue_size=app.config['LOG_QUEUE_SIZE'])
+    _pipeline.start()
+
+    # app.logger is this same 'famos' logger; having a handler here also
+    # stops Flask from adding its own stderr handler.
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    logger.addHandler(_pipeline.handler)
+    logger.setLevel(app.config['LOG_LEVEL'])
+    logger.propagate = False
+
+    app.extensions['famos_logging'] = _pipeline
+    logger.info('famOS startup', extra={'fields': {'pid': os.getpid(), 'level': app.config['LOG_LEVEL']}})
+    return _pipeline
@@ -0,0 +1,47 @@
+import logging
+import zlib
+
+# Get a logger for this module
+logger = logging.getLogger('famos.utils.schema')
+
+
+def schema_fingerprint(metadata):
+    """A checksum of the tables, columns and indexes ``metadata`` declares.
+
+    Fits in SQLite's ``user_version``, a signed 32-bit integer.
+    """
+    parts = []
+    for table in sorted(metadata.tables.values(), key=lambda table: table.name):
+        columns = ','.join(f'{column.name}:{type(column.type).__name__}:{column.nullable}' for column in table.columns)
+        indexes = ','.join(sorted(index.name or '' for index in table.indexes))
+        parts.append(f'{table.name}({columns})[{indexes}]')
+    return zlib.crc32('\n'.join(parts).encode()) & 0x7fffffff
+
+
+def ensure_schema(app, db):
+    """Create any missing tables, skipping the work when nothing has changed.
+
+    ``db.create_all`` inspects every table on every boot. For SQLite, the
+    schema fingerprint of the models is kept in ``PRAGMA user_version``
+    once the tables exist, so later boots of the same code only read that
+    one value. Other databases always go through ``create_all``. Returns
+    whether ``create_all`` ran.
+    """
+    app.config.setdefault('SCHEMA_AUTO_CREATE', True)
+    if not app.config['SCHEMA_AUTO_CREATE']:
+        return False
+
+    engine = db.get_engine(app)
+    version = schema_fingerprint(db.metadata) if engine.dialect.name == 'sqlite' else None
+    if version is not None:
+        with engine.connect() as connection:
+            if connection.exec_driver_sql('PRAGMA user_version').scalar() == version:
+                return False
+
+    with app.app_context():
+        db.create_all()
+    if version is not None:
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f'PRAGMA user_version = {version}')
+        logger.info("Database schema is at version %d", version)
+    return True
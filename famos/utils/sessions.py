@@ -0,0 +1,122 @@
+import os
+import secrets
+import time
+import logging
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from werkzeug.datastructures import CallbackDict
+from famos.utils.sqlite_store import SqliteStore
+
+# Get a logger for this module
+logger = logging.getLogger('famos.utils.sessions')
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS sessions ('
+    ' id TEXT PRIMARY KEY,'
+    ' data TEXT NOT NULL,'
+    ' expires_at INTEGER NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)',
+)
+
+
+class SqliteSession(CallbackDict, SessionMixin):
+    """Server-side session that remembers whether it was modified."""
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+
+
+class SqliteSessionInterface(SessionInterface):
+    """Store sessions in a SQLite table keyed by session ID.
+
+    Reads and writes are single statements. Unmodified sessions are not
+    written back; their expiry is only pushed forward once per
+    ``SESSION_REFRESH_INTERVAL``. Expired rows are deleted in small batches
+    at most once per ``SESSION_GC_INTERVAL`` per worker.
+    """
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, path, refresh_interval=3600, gc_interval=300, gc_batch_size=500):
+        self.refresh_interval = refresh_interval
+        self.store = SqliteStore(path, SCHEMA, gc_interval=gc_interval, gc_batch_size=gc_batch_size)
+
+    @classmethod
+    def from_app(cls, app):
+        app.config.setdefault('SESSION_SQLITE_PATH', os.path.join(app.instance_path, 'sessions.sqlite'))
+        app.config.setdefault('SESSION_REFRESH_INTERVAL', 3600)
+        app.config.setdefault('SESSION_GC_INTERVAL', 300)
+        app.config.setdefault('SESSION_GC_BATCH_SIZE', 500)
+        return cls(
+            app.config['SESSION_SQLITE_PATH'],
+            refresh_interval=app.config['SESSION_REFRESH_INTERVAL'],
+            gc_interval=app.config['SESSION_GC_INTERVAL'],
+            gc_batch_size=app.config['SESSION_GC_BATCH_SIZE']
+        )
+
+    def _connection(self):
+        return self.store.connection()
+
+    def _lifetime(self, app):
+        return int(app.permanent_session_lifetime.total_seconds())
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if sid:
+            row = self._connection().execute(
+                'SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at > ?',
+                (sid, int(time.time()))
+            ).fetchone()
+            if row is not None:
+                try:
+                    return SqliteSession(self.serializer.loads(row[0]), sid=sid, expires_at=row[1])
+                except ValueError:
+                    logger.warning("Discarding undecodable session")
+        # Never adopt a client-chosen ID; unknown sessions start fresh
+        return SqliteSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = int(time.time())
+
+        if not session:
+            if session.modified and not session.new:
+                self._connection().execute('DELETE FROM sessions WHERE id = ?', (session.sid,))
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            self.collect_garbage(now)
+            return
+
+        expires_at = now + self._lifetime(app)
+        stale = session.expires_at is None or expires_at - session.expires_at >= self.refresh_interval
+        if session.modified or stale:
+            self._connection().execute(
+                'INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at',
+                (session.sid, self.serializer.dumps(dict(session)), expires_at)
+            )
+            response.set_cookie(
+                app.session_cookie_name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+        self.collect_garbage(now)
+
+    def collect_garbage(self, now=None, force=False):
+        """Delete expired sessions in batches; returns the number of rows removed."""
+        removed = self.store.collect_expired('sessions', 'id', now or int(time.time()), force=force)
+        if removed:
+            logger.info(f"Removed {removed} expired sessions")
+        return removed
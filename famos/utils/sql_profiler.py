@@ -0,0 +1,209 @@
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Optional
+from flask import g, request
+from sqlalchemy import event
+import logging
+import re
+import threading
+import time
+
+# Get a logger for this module
+logger = logging.getLogger('famos.utils.sql_profiler')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """Reduce a statement to its shape: literals become ``?`` and IN lists collapse.
+
+    Two executions of the same query with different IDs share a fingerprint,
+    which is what makes an N+1 loop visible.
+    """
+    text = _STRING.sub('?', statement)
+    text = _NUMBER.sub('?', text)
+    text = _PLACEHOLDER_LIST.sub('(?)', text)
+    return _SPACE.sub(' ', text).strip()
+
+
+@dataclass
+class QueryRecord:
+    statement: str
+    parameters: object
+    duration: float
+    plan: Optional[List[str]] = None
+
+    @property
+    def fingerprint(self):
+        return fingerprint(self.statement)
+
+
+@dataclass
+class QueryReport:
+    """Statements run while a capture was active, with helpers to spot trouble."""
+    n_plus_one_threshold: int = 5
+    queries: List[QueryRecord] = field(default_factory=list)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(query.duration for query in self.queries)
+
+    @property
+    def slow(self):
+        return [query for query in self.queries if query.plan is not None]
+
+    def groups(self):
+        """Fingerprint -> number of executions, most repeated first."""
+        return Counter(query.fingerprint for query in self.queries)
+
+    def n_plus_one(self):
+        """SELECT fingerprints repeated at least ``n_plus_one_threshold`` times."""
+        return {
+            shape: count for shape, count in self.groups().most_common()
+            if count >= self.n_plus_one_threshold and shape.upper().startswith('SELECT')
+        }
+
+    def header(self):
+        return (f'queries={self.count}; time_ms={self.total_time * 1000:.1f}; '
+                f'repeated={len(self.n_plus_one())}; slow={len(self.slow)}')
+
+    def summary(self):
+        lines = [f'{self.count} queries in {self.total_time * 1000:.1f} ms']
+        for shape, count in self.groups().most_common():
+            lines.append(f'  {count:>3}x {shape}')
+        for query in self.slow:
+            lines.append(f'  slow ({query.duration * 1000:.1f} ms): {query.statement}')
+            lines.extend(f'    {step}' for step in query.plan)
+        return '\n'.join(lines)
+
+
+class SqlProfiler:
+    """Record the SQL statements issued during a request or a block of code.
+
+    Listeners are attached to the engine only once something captures, so
+    the profiler costs nothing until it is used. With
+    ``SQL_PROFILER_ENABLED`` every request is captured: its query count,
+    time, repeated-statement groups and slow statements go into an
+    ``X-SQL-Profile`` response header, and N+1 patterns and slow statements
+    (with their ``EXPLAIN QUERY PLAN``) are logged.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.slow_threshold = 0.1
+        self.n_plus_one_threshold = 5
+        self._engines = set()
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('SQL_PROFILER_ENABLED', False)
+        app.config.setdefault('SQL_SLOW_QUERY_MS', 100)
+        app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        self.slow_threshold = app.config['SQL_SLOW_QUERY_MS'] / 1000
+        self.n_plus_one_threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        app.extensions['famos_sql_profiler'] = self
+        if not app.config['SQL_PROFILER_ENABLED']:
+            return
+
+        self.listen(db.get_engine(app))
+
+        @app.before_request
+        def _start_sql_profile():
+            g._famos_sql_report = self.start()
+
+        @app.after_request
+        def _finish_sql_profile(response):
+            report = g.pop('_famos_sql_report', None)
+            if report is None:
+                return response
+            self.stop(report)
+            response.headers['X-SQL-Profile'] = report.header()
+            repeated = report.n_plus_one()
+            if repeated:
+                logger.warning("Possible N+1 in %s: %s", request.endpoint,
+                               '; '.join(f'{count}x {shape}' for shape, count in repeated.items()))
+            for query in report.slow:
+                logger.warning("Slow query in %s (%.1f ms): %s | plan: %s", request.endpoint,
+                               query.duration * 1000, query.statement, ' / '.join(query.plan))
+            return response
+
+        @app.teardown_request
+        def _drop_sql_profile(exc):
+            report = g.pop('_famos_sql_report', None)
+            if report is not None:
+                self.stop(report)
+
+    def listen(self, engine):
+        if engine in self._engines:
+            return
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+        self._engines.add(engine)
+
+    def _active(self):
+        reports = getattr(self._local, 'reports', None)
+        if reports is None:
+            reports = self._local.reports = []
+        return reports
+
+    def start(self):
+        report = QueryReport(n_plus_one_threshold=self.n_plus_one_threshold)
+        self._active().append(report)
+        return report
+
+    def stop(self, report):
+        reports = self._active()
+        if report in reports:
+            reports.remove(report)
+
+    @contextmanager
+    def capture(self, engine):
+        """Collect every statement run on ``engine`` in this thread inside the block."""
+        self.listen(engine)
+        report = self.start()
+        try:
+            yield report
+        finally:
+            self.stop(report)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._local, 'reports', None):
+            conn.info.setdefault('_famos_query_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        reports = getattr(self._local, 'reports', None)
+        if not reports:
+            return
+        started = conn.info.get('_famos_query_started')
+        if not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        plan = None
+        if duration >= self.slow_threshold and not executemany:
+            plan = self._explain(conn, statement, parameters)
+        record = QueryRecord(statement, parameters, duration, plan)
+        for report in reports:
+            report.queries.append(record)
+
+    def _explain(self, conn, statement, parameters):
+        if conn.dialect.name != 'sqlite' or not statement.lstrip().upper().startswith('SELECT'):
+            return []
+        # A raw DBAPI cursor, so the EXPLAIN doesn't come back through these events
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        except Exception as e:
+            logger.debug("Could not explain slow query: %s", e)
+            return []
+        finally:
+            cursor.close()
@@ -0,0 +1,77 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+import logging
+
+# Get a logger for this module
+logger = logging.getLogger('famos.utils.sqlite_profile')
+
+# Applied to every new connection, in this order. busy_timeout goes first so
+# the switch to WAL waits for a lock instead of failing.
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,           # milliseconds to wait for a writer before "database is locked"
+    'journal_mode': 'WAL',          # readers no longer block on the token-refresh writes
+    'synchronous': 'NORMAL',        # safe with WAL; fsync only at checkpoints
+    'cache_size': -20000,           # negative means KiB, so about 20 MB of page cache per connection
+    'mmap_size': 268435456,         # read up to 256 MB of the file through the OS page cache
+    'temp_store': 'MEMORY',         # sorts and temp indexes stay off disk
+}
+
+
+def _is_file_database(uri):
+    url = make_url(uri)
+    return url.drivername.startswith('sqlite') and url.database not in (None, '', ':memory:')
+
+
+class SqliteProfile:
+    """Tune SQLAlchemy's SQLite engine for a multi-threaded web worker.
+
+    File databases get a real connection pool, since Flask-SQLAlchemy falls
+    back to opening a new connection per checkout, and every new connection
+    gets ``SQLITE_PRAGMAS`` applied through a connect event. Set
+    ``SQLITE_PROFILE_ENABLED`` to False to use the library defaults.
+    """
+
+    def __init__(self, app=None, db=None):
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('SQLITE_PROFILE_ENABLED', True)
+        app.config.setdefault('SQLITE_PRAGMAS', {})
+        app.config.setdefault('SQLITE_POOL_SIZE', 10)
+        app.config.setdefault('SQLITE_MAX_OVERFLOW', 20)
+        app.config.setdefault('SQLITE_POOL_TIMEOUT', 30)
+
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+        if not app.config['SQLITE_PROFILE_ENABLED'] or not uri.startswith('sqlite'):
+            return
+
+        pragmas = dict(DEFAULT_PRAGMAS, **app.config['SQLITE_PRAGMAS'])
+        if _is_file_database(uri):
+            options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+            options.setdefault('poolclass', QueuePool)
+            options.setdefault('pool_size', app.config['SQLITE_POOL_SIZE'])
+            options.setdefault('max_overflow', app.config['SQLITE_MAX_OVERFLOW'])
+            options.setdefault('pool_timeout', app.config['SQLITE_POOL_TIMEOUT'])
+            connect_args = options.setdefault('connect_args', {})
+            # Pooled connections are handed from thread to thread, one at a time
+            connect_args.setdefault('check_same_thread', False)
+        else:
+            # WAL and mmap mean nothing for an in-memory database
+            pragmas.pop('journal_mode', None)
+            pragmas.pop('mmap_size', None)
+
+        statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for statement in statements:
+                    cursor.execute(statement)
+            finally:
+                cursor.close()
+
+        event.listen(db.get_engine(app), 'connect', apply_pragmas)
+        app.extensions['famos_sqlite_profile'] = pragmas
+        logger.debug(f"SQLite profile applied: {', '.join(statements)}")
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import threading
+
+
+class SqliteStore:
+    """A SQLite file shared by the workers on one host.
+
+    Each thread gets its own autocommit connection in WAL mode, reopened
+    after a fork so a worker never reuses its parent's. The file is created
+    readable by this user only before SQLite first opens it. Expired rows
+    are deleted in batches of ``gc_batch_size`` at most once per
+    ``gc_interval`` per worker.
+    """
+
+    def __init__(self, path, schema=(), gc_interval=300, gc_batch_size=500):
+        self.path = path
+        self.schema = schema
+        self.gc_interval = gc_interval
+        self.gc_batch_size = gc_batch_size
+        self._local = threading.local()
+        self._gc_lock = threading.Lock()
+        self._last_gc = 0
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if not os.path.exists(self.path):
+                # SQLite gives -wal and -shm the same mode as the database
+                os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.schema:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def collect_expired(self, table, key, now, force=False):
+        """Delete rows of ``table`` whose ``expires_at`` has passed; returns the number removed.
+
+        Skipped (returning 0) inside ``gc_interval`` of the last run unless
+        ``force`` is set, and while another thread is already collecting.
+        """
+        if not force and now - self._last_gc < self.gc_interval:
+            return 0
+        if not self._gc_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_gc = now
+            conn = self.connection()
+            removed = 0
+            while True:
+                deleted = conn.execute(
+                    f'DELETE FROM {table} WHERE {key} IN '
+                    f'(SELECT {key} FROM {table} WHERE expires_at <= ? LIMIT ?)',
+                    (now, self.gc_batch_size)
+                ).rowcount
+                removed += deleted
+                if deleted < self.gc_batch_size:
+                    break
+            return removed
+        finally:
+            self._gc_lock.release()
@@ -0,0 +1,85 @@
+"""Add indexes for foreign keys and task due-date queries
+
+Revision ID: 4b7d2e9c1a3f
+Revises: 16325886f79c
+Create Date: 2026-10-19 09:12:41.204518
+
+"""
+from alembic import op
+import logging
+import sqlalchemy as sa
+
+logger = logging.getLogger('alembic.migration.4b7d2e9c1a3f')
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7d2e9c1a3f'
+down_revision = '16325886f79c'
+branch_labels = None
+depends_on = None
+
+
+def delete_duplicate_integrations(connection):
+    """Keep each user's most recently updated Google integration and delete the rest.
+
+    Every deleted row is logged with the row kept in its place. Returns the
+    deleted ids.
+    """
+    rows = connection.execute(sa.text(
+        'SELECT id, user_id FROM google_integrations ORDER BY user_id, '
+        'updated_at IS NULL, updated_at DESC, id DESC'
+    )).fetchall()
+    kept = {}
+    duplicates = []
+    for row_id, user_id in rows:
+        if user_id in kept:
+            duplicates.append(row_id)
+            logger.warning("Deleting duplicate google_integrations row %d for user %d (keeping row %d)",
+                           row_id, user_id, kept[user_id])
+        else:
+            kept[user_id] = row_id
+    if duplicates:
+        connection.execute(
+            sa.text('DELETE FROM google_integrations WHERE id IN :ids').bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': duplicates}
+        )
+    return duplicates
+
+
+def upgrade():
+    # A user can only have one Google integration; the unique index below fails on duplicates
+    delete_duplicate_integrations(op.get_bind())
+
+    with op.batch_alter_table('google_integrations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_google_integrations_user_id'), ['user_id'], unique=True)
+
+    with op.batch_alter_table('family', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_family_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('family_member', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_family_member_family_id'), ['family_id'], unique=False)
+
+    with op.batch_alter_table('contact', schema=None) as batch_op:
+        batch_op.create_index('ix_contact_family_id_name', ['family_id', 'last_name', 'first_name'], unique=False)
+
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.create_index('ix_task_family_id_completed_due_date', ['family_id', 'completed', 'due_date'], unique=False)
+        batch_op.create_index('ix_task_assignee_id_completed_due_date', ['assignee_id', 'completed', 'due_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('task', schema=None) as batch_op:
+        batch_op.drop_index('ix_task_assignee_id_completed_due_date')
+        batch_op.drop_index('ix_task_family_id_completed_due_date')
+
+    with op.batch_alter_table('contact', schema=None) as batch_op:
+        batch_op.drop_index('ix_contact_family_id_name')
+
+    with op.batch_alter_table('family_member', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_family_member_family_id'))
+
+    with op.batch_alter_table('family', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_family_user_id'))
+
+    with op.batch_alter_table('google_integrations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_google_integrations_user_id'))
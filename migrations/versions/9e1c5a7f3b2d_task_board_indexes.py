@@ -0,0 +1,33 @@
+"""Replace task due-date indexes with task board indexes
+
+Revision ID: 9e1c5a7f3b2d
+Revises: 4b7d2e9c1a3f
+Create Date: 2026-10-19 11:47:05.918362
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e1c5a7f3b2d'
+down_revision = '4b7d2e9c1a3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The board indexes start with the same columns, so they also serve the old queries
+    op.create_index('ix_task_family_board', 'task',
+                    ['family_id', 'completed', 'due_date', sa.text('priority DESC'), 'id'], unique=False)
+    op.create_index('ix_task_assignee_board', 'task',
+                    ['assignee_id', 'completed', 'due_date', sa.text('priority DESC'), 'id'], unique=False)
+    op.drop_index('ix_task_family_id_completed_due_date', table_name='task')
+    op.drop_index('ix_task_assignee_id_completed_due_date', table_name='task')
+
+
+def downgrade():
+    op.create_index('ix_task_family_id_completed_due_date', 'task', ['family_id', 'completed', 'due_date'], unique=False)
+    op.create_index('ix_task_assignee_id_completed_due_date', 'task', ['assignee_id', 'completed', 'due_date'], unique=False)
+    op.drop_index('ix_task_assignee_board', table_name='task')
+    op.drop_index('ix_task_family_board', table_name='task')
@@ -0,0 +1,28 @@
+"""Add contact indexes for role filtering and newest-first listing
+
+Revision ID: c3f8a2d6e4b1
+Revises: 9e1c5a7f3b2d
+Create Date: 2026-10-19 14:03:22.571940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a2d6e4b1'
+down_revision = '9e1c5a7f3b2d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contact', schema=None) as batch_op:
+        batch_op.create_index('ix_contact_family_id_role_name', ['family_id', 'role', 'last_name', 'first_name'], unique=False)
+        batch_op.create_index('ix_contact_family_id_created_at', ['family_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('contact', schema=None) as batch_op:
+        batch_op.drop_index('ix_contact_family_id_created_at')
+        batch_op.drop_index('ix_contact_family_id_role_name')
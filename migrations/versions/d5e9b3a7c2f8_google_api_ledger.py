@@ -0,0 +1,53 @@
+"""Add the Google API call ledger and its daily rollup
+
+Revision ID: d5e9b3a7c2f8
+Revises: c3f8a2d6e4b1
+Create Date: 2026-10-19 16:12:48.204715
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e9b3a7c2f8'
+down_revision = 'c3f8a2d6e4b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('google_api_calls',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('endpoint', sa.String(length=64), nullable=False),
+    sa.Column('method', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.String(length=32), nullable=False),
+    sa.Column('latency_ms', sa.Integer(), nullable=False),
+    sa.Column('response_bytes', sa.Integer(), nullable=False),
+    sa.Column('request_id', sa.String(length=32), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_google_api_calls_user_id_created_at', 'google_api_calls', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_google_api_calls_created_at_endpoint', 'google_api_calls', ['created_at', 'endpoint'], unique=False)
+    op.create_table('google_api_daily_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('endpoint', sa.String(length=64), nullable=False),
+    sa.Column('method', sa.String(length=64), nullable=False),
+    sa.Column('calls', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.Integer(), nullable=False),
+    sa.Column('latency_ms', sa.BigInteger(), nullable=False),
+    sa.Column('response_bytes', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'user_id', 'endpoint', 'method', name='uq_google_api_daily_usage_key')
+    )
+
+
+def downgrade():
+    op.drop_table('google_api_daily_usage')
+    op.drop_index('ix_google_api_calls_created_at_endpoint', table_name='google_api_calls')
+    op.drop_index('ix_google_api_calls_user_id_created_at', table_name='google_api_calls')
+    op.drop_table('google_api_calls')
@@ -0,0 +1,54 @@
+"""Add the full-text search index over contacts, family members and tasks
+
+Revision ID: e7a4c1f9b3d6
+Revises: d5e9b3a7c2f8
+Create Date: 2026-10-19 18:41:07.318264
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a4c1f9b3d6'
+down_revision = 'd5e9b3a7c2f8'
+branch_labels = None
+depends_on = None
+
+# title and body are searched; scope holds an "f<family_id>" token so the
+# family filter is part of the full-text match rather than a post-filter.
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "title, body, scope, prefix='2 3 4', tokenize='unicode61 remove_diacritics 2')"
+)
+
+# Index the rows that already exist, as famos.services.search documents them
+# at this revision. Each rowid is id * 4 + kind (1 contact, 2 member, 3 task);
+# the body joins its non-empty fields with single spaces.
+BACKFILL_SQL = (
+    "INSERT INTO search_index (rowid, title, body, scope) "
+    "SELECT id * 4 + 1, first_name || ' ' || last_name, "
+    "rtrim(ifnull(nullif(role, '') || ' ', '') || ifnull(nullif(email, '') || ' ', '') "
+    "|| ifnull(nullif(phone, '') || ' ', '') || ifnull(nullif(notes, '') || ' ', ''), ' '), "
+    "'f' || family_id FROM contact",
+    "INSERT INTO search_index (rowid, title, body, scope) "
+    "SELECT id * 4 + 2, first_name || ' ' || last_name, ifnull(relationship, ''), "
+    "'f' || family_id FROM family_member",
+    "INSERT INTO search_index (rowid, title, body, scope) "
+    "SELECT id * 4 + 3, title, ifnull(description, ''), 'f' || family_id FROM task",
+)
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other databases go without search
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(CREATE_SQL)
+    for statement in BACKFILL_SQL:
+        op.execute(statement)
+    op.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TABLE IF EXISTS search_index')
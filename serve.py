@@ -0,0 +1,7 @@
+from famos.server import main
+import sys
+
+# Production entry point: preforked workers sharing a preloaded, warmed app.
+# See famos/server.py for options and signals; run.py is the development server.
+if __name__ == '__main__':
+    sys.exit(main())
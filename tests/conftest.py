@@ -1,17 +1,39 @@
+import importlib.util
 import os
 import tempfile
 import pytest
-from famos import create_app, db
+from contextlib import contextmanager
+from famos import create_app, db, sql_profiler
 from famos.models.user import User
 from famos.models.family import Family
 from famos.models.integrations import GoogleIntegration
 from werkzeug.security import generate_password_hash
+from sqlalchemy import text
 from sqlalchemy.orm import scoped_session, sessionmaker
 from unittest.mock import MagicMock
 from datetime import datetime, timezone
 from flask_login import login_user as flask_login_user
 import random
 
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def _load_migration(filename):
+    spec = importlib.util.spec_from_file_location(filename[:-3], os.path.join(MIGRATIONS, 'versions', filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# The search index isn't a model table, so create_all doesn't make it
+search_index_migration = _load_migration('e7a4c1f9b3d6_search_index.py')
+
+
+def create_search_index():
+    db.session.execute(text(search_index_migration.CREATE_SQL))
+    db.session.commit()
+
+
 @pytest.fixture(autouse=True)
 def _clean_db(app):
     """Clean database between tests."""
@@ -39,6 +61,7 @@ def app():
     
     with app.app_context():
         db.create_all()
+        create_search_index()
         yield app
         db.session.remove()
         db.drop_all()
@@ -94,6 +117,24 @@ def auth_client(client, authenticated_user):
     
     return client
 
+@pytest.fixture
+def query_budget(app):
+    """Fail the test if a block runs more SQL than allowed.
+
+    ``with query_budget(5): ...`` fails when the block executes more than five
+    statements, or repeats one SELECT often enough to look like an N+1 loop
+    (pass ``allow_repeats=True`` when that is expected). The block's
+    QueryReport is yielded for further checks.
+    """
+    @contextmanager
+    def budget(limit, allow_repeats=False):
+        with sql_profiler.capture(db.engine) as report:
+            yield report
+        assert report.count <= limit, f'Query budget of {limit} exceeded:\n{report.summary()}'
+        if not allow_repeats:
+            assert not report.n_plus_one(), f'Repeated queries (N+1?):\n{report.summary()}'
+    return budget
+
 @pytest.fixture
 def runner(app):
     """A test runner for the app's Click commands."""
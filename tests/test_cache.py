@@ -0,0 +1,136 @@
+from datetime import date, datetime, timezone
+import os
+import pytest
+from famos import create_app
+from famos.cache import Cache, CacheBackend, SqliteCacheBackend, dumps, loads
+from famos.models.user import User
+
+
+class BrokenBackend(CacheBackend):
+    """A shared tier that is down."""
+
+    def get(self, key):
+        raise ConnectionError('down')
+
+    set = delete = version = bump_version = get
+
+
+class RecordingBackend(CacheBackend):
+    """Stands in for a network backend named in CACHE_BACKEND."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl):
+        self.entries[key] = value
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+    def version(self, namespace):
+        return 0
+
+    def bump_version(self, namespace):
+        return 1
+
+
+def _workers(tmp_path, namespace='test', **kwargs):
+    """Two caches on one SQLite file, as two worker processes would have."""
+    path = str(tmp_path / 'cache.sqlite')
+    return (Cache(namespace, SqliteCacheBackend(path), **kwargs),
+            Cache(namespace, SqliteCacheBackend(path), **kwargs))
+
+
+def test_values_round_trip_as_plain_data():
+    value = {'when': datetime(2024, 5, 1, 9, 30, tzinfo=timezone.utc), 'day': date(2024, 5, 1),
+             'counts': {'doctor': 2}, 'ids': (1, 2)}
+    assert loads(dumps(value)) == dict(value, ids=[1, 2])
+    with pytest.raises(TypeError, match='User'):
+        dumps({'user': User(email='test@example.com')})
+
+
+def test_workers_share_entries(tmp_path):
+    first, second = _workers(tmp_path, local_ttl=60)
+    first.set('a', {'n': 1})
+    assert second.get('a') == {'n': 1}
+    assert (second.hits, second.shared_hits, second.misses) == (1, 1, 0)
+
+    # Served locally from now on
+    assert second.get('a') == {'n': 1}
+    assert (second.hits, second.shared_hits) == (2, 1)
+    assert second.get('missing') is None
+    assert second.misses == 1
+
+
+def test_delete_and_invalidate_reach_other_workers(tmp_path):
+    first, second = _workers(tmp_path, local_ttl=0)
+    first.set('a', 1)
+    first.set('b', 2)
+    assert second.get('a') == 1
+
+    first.delete('a')
+    assert second.get('a') is None
+
+    second.invalidate()
+    assert first.get('b') is None
+    first.set('b', 3)
+    assert second.get('b') == 3
+
+
+def test_encode_and_decode_wrap_the_stored_form(tmp_path):
+    first, second = _workers(tmp_path, encode=sorted, decode=frozenset)
+    first.set('tags', {'b', 'a'})
+    assert first.get('tags') == second.get('tags') == frozenset({'a', 'b'})
+
+
+def test_backend_errors_are_misses():
+    cache = Cache('test', BrokenBackend())
+    cache.set('a', 1)
+    cache.delete('a')
+    assert cache.get('a') is None
+    cache.invalidate()
+
+
+def test_expired_entries_are_collected(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / 'cache.sqlite'), gc_interval=3600)
+    backend.set('new', '2', ttl=60)
+    # Collection has just run, so this one stays until the next
+    backend.set('old', '1', ttl=-1)
+    assert backend.get('old') is None
+    assert backend.collect_garbage() == 0
+    assert backend.collect_garbage(force=True) == 1
+    assert backend.get('new') == '2'
+
+
+def test_cache_file_is_private(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / 'cache.sqlite'))
+    backend.set('a', '1', ttl=60)
+    assert os.stat(backend.store.path).st_mode & 0o777 == 0o600
+
+
+def test_backend_is_configurable(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path),
+        'CACHE_BACKEND': 'tests.test_cache:RecordingBackend',
+    })
+    backend = app.extensions['famos_cache_backend']
+    assert isinstance(backend, RecordingBackend)
+
+    app.extensions['famos_contact_counts'].set(7, {'doctor': 1})
+    key, = backend.entries
+    assert key.startswith(app.config['CACHE_KEY_PREFIX'] + 'contact_counts:0:')
+
+
+def test_backends_must_implement_the_interface():
+    class Partial(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError, match='bump_version'):
+        Partial()
@@ -0,0 +1,70 @@
+import gzip
+import re
+from flask import url_for
+
+def test_large_html_is_gzipped(app, client):
+    """Responses above the size threshold are compressed when accepted."""
+    @app.route('/_big')
+    def big():
+        return '<p>famOS</p>' * 200
+
+    response = client.get('/_big', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == b'<p>famOS</p>' * 200
+
+def test_small_response_is_not_compressed(app, client):
+    """Responses below COMPRESS_MIN_SIZE are sent as-is."""
+    @app.route('/_small')
+    def small():
+        return 'ok'
+
+    response = client.get('/_small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == b'ok'
+
+def test_no_compression_without_accept_encoding(app, client):
+    """Clients that don't ask for compression get the plain body."""
+    @app.route('/_plain')
+    def plain():
+        return 'x' * 2000
+
+    response = client.get('/_plain', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == b'x' * 2000
+
+def test_streamed_response_is_compressed(app, client):
+    """Streamed responses are compressed chunk by chunk."""
+    @app.route('/_stream')
+    def stream():
+        def generate():
+            for i in range(100):
+                yield f'<li>item {i}</li>'
+        return app.response_class(generate(), mimetype='text/html')
+
+    response = client.get('/_stream', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    expected = ''.join(f'<li>item {i}</li>' for i in range(100)).encode()
+    assert gzip.decompress(response.data) == expected
+
+def test_static_url_is_fingerprinted(app):
+    """url_for('static') appends a content hash."""
+    with app.test_request_context():
+        url = url_for('static', filename='css/style.css')
+    assert re.search(r'\?v=[0-9a-f]{12}$', url)
+
+def test_fingerprinted_static_is_immutable(app, client):
+    """Static files requested with the current hash are cached for a year."""
+    with app.test_request_context():
+        url = url_for('static', filename='css/style.css')
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.max_age == 31536000
+    assert response.cache_control.immutable
+    assert response.cache_control.public
+    response.close()
+
+    stale = client.get('/static/css/style.css?v=deadbeef0000')
+    assert not stale.cache_control.immutable
+    stale.close()
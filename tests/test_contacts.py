@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from famos import db
+from famos.models import User, Family, Contact
+from famos.services.contact_directory import SORTS, get_contacts_page, role_counts
+from tests.test_identity import QueryLog
+
+ROLES = ('babysitter', 'doctor', 'teacher', 'relative')
+
+
+def _seed(count=30):
+    user = User.query.filter_by(email='test@example.com').first()
+    family = Family.query.filter_by(user_id=user.id).first()
+    start = datetime(2030, 1, 1)
+    for i in range(count):
+        db.session.add(Contact(
+            # Repeated last names exercise the first-name and ID tie-breakers
+            first_name=f'First{i % 4}', last_name=f'Last{i % 6}', role=ROLES[i % 4],
+            created_at=start + timedelta(minutes=i), family_id=family.id
+        ))
+    db.session.commit()
+    family_id = family.id
+    db.session.remove()
+    return family_id
+
+
+def _all_pages(family_id, sort, role=None):
+    contacts, cursor = [], None
+    while True:
+        page = get_contacts_page(family_id, sort=sort, role=role, cursor=cursor, limit=4)
+        contacts.extend(page.contacts)
+        if not page.next_cursor:
+            return contacts
+        cursor = page.next_cursor
+
+
+def test_keyset_pages_follow_sort(app, authenticated_user):
+    family_id = _seed()
+    everyone = Contact.query.filter_by(family_id=family_id).all()
+    for sort, (columns, descending) in SORTS.items():
+        for role in (None, 'doctor'):
+            expected = sorted(
+                (c for c in everyone if role in (None, c.role)),
+                key=lambda c: tuple(getattr(c, column.key) for column in columns),
+                reverse=descending
+            )
+            assert [c.id for c in _all_pages(family_id, sort, role)] == [c.id for c in expected]
+
+
+def test_role_filtered_page_uses_index(app, authenticated_user):
+    family_id = _seed()
+    cursor = get_contacts_page(family_id, role='doctor', limit=2).next_cursor
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        get_contacts_page(family_id, role='doctor', cursor=cursor, limit=2)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    statement, parameters = executed[0]
+    plan = [row[3] for row in db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+    assert any('ix_contact_family_id_role_name' in line for line in plan), plan
+    assert not any('TEMP B-TREE' in line for line in plan), plan
+
+
+def test_role_counts_cached_until_contact_changes(app, auth_client, authenticated_user):
+    family_id = _seed(8)
+    assert role_counts(family_id) == {'babysitter': 2, 'doctor': 2, 'teacher': 2, 'relative': 2}
+    with QueryLog(db.engine) as log:
+        role_counts(family_id)
+    assert log.statements == []
+
+    auth_client.post('/contacts/add', data={'first_name': 'New', 'last_name': 'Doc', 'role': 'doctor'})
+    assert role_counts(family_id)['doctor'] == 3
+
+    contact = Contact.query.filter_by(last_name='Doc').first()
+    auth_client.post(f'/contacts/{contact.id}/edit', data={'first_name': 'New', 'last_name': 'Doc', 'role': 'teacher'})
+    assert role_counts(family_id)['doctor'] == 2
+    assert role_counts(family_id)['teacher'] == 3
+
+
+def test_contacts_index_pages(auth_client, authenticated_user):
+    _seed(30)
+    response = auth_client.get('/contacts/')
+    assert response.status_code == 200
+    assert response.data.count(b'class="card-title"') == 24
+    assert b'cursor=' in response.data
+
+    response = auth_client.get('/contacts/?role=doctor&sort=newest')
+    assert response.data.count(b'class="card-title"') == 8
+    assert b'cursor=' not in response.data
+
+    response = auth_client.get('/contacts/?cursor=garbage')
+    assert response.status_code == 302
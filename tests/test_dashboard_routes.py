@@ -1,3 +1,4 @@
+import re
 import pytest
 from flask_login import login_user, current_user
 from flask import request, url_for
@@ -5,6 +6,7 @@ from famos import create_app, db
 from famos.models.user import User
 from famos.models.family import Family
 from famos.models.integrations import GoogleIntegration
+from famos.services.google_tasks import get_list_tasks, get_user_tasks
 from unittest.mock import patch, MagicMock, PropertyMock
 from datetime import datetime, timedelta
 from pytz import UTC
@@ -200,7 +202,7 @@ def test_dashboard_with_connected_integration(auth_client, authenticated_user, m
         db.session.add(integration)
         db.session.commit()
     
-    with patch('famos.routes.main.get_tasks_service', return_value=mock_google_service), \
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service), \
          patch('famos.routes.main.get_user_tasks', return_value=[{
              'id': 'task1',
              'title': 'Test Task 1',
@@ -245,7 +247,7 @@ def test_dashboard_with_task_fetch_error(auth_client, authenticated_user, mock_g
     tasklists_mock.list.return_value.execute = MagicMock(side_effect=Exception('API Error'))
     mock_google_service.tasklists = MagicMock(return_value=tasklists_mock)
     
-    with patch('famos.routes.main.get_tasks_service', return_value=mock_google_service), \
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service), \
          patch('famos.routes.main.get_user_tasks', side_effect=Exception('API Error')):
         response = auth_client.get('/dashboard')
         assert response.status_code == 200
@@ -283,7 +285,7 @@ def test_dashboard_with_expired_token(auth_client, authenticated_user, mock_goog
         db.session.add(integration)
         db.session.commit()
     
-    with patch('famos.routes.main.get_tasks_service', return_value=mock_google_service), \
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service), \
          patch('famos.routes.main.get_user_tasks', return_value=[{
              'id': 'task1',
              'title': 'Test Task 1',
@@ -300,3 +302,129 @@ def test_dashboard_with_expired_token(auth_client, authenticated_user, mock_goog
         # Should still work because token gets refreshed
         assert b'Test List 1' in response.data
         assert b'Test Task 1' in response.data
+
+def _make_tasks(count, list_id='list1'):
+    return [{
+        'task_id': f'task{i}',
+        'title': f'Windowed Task {i:04d}',
+        'status': 'needsAction',
+        'notes': '',
+        'due': (datetime(2030, 1, 1) + timedelta(days=i)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'list_id': list_id,
+        'list_name': 'Test List 1'
+    } for i in range(count)]
+
+def test_dashboard_renders_first_task_window(app, auth_client, authenticated_user, mock_google_service):
+    """Only the first DASHBOARD_TASK_WINDOW tasks of a list are rendered."""
+    app.config['DASHBOARD_TASK_WINDOW'] = 10
+    with auth_client.application.app_context():
+        integration = GoogleIntegration(
+            user_id=authenticated_user.id,
+            access_token='test_token',
+            refresh_token='test_refresh',
+            token_expiry=(datetime.now(UTC) + timedelta(hours=1)).replace(microsecond=0).isoformat(),
+            tasks_enabled=True
+        )
+        db.session.add(integration)
+        db.session.commit()
+    
+    tasks = list(reversed(_make_tasks(25)))
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service), \
+         patch('famos.routes.main.get_user_tasks', return_value=tasks):
+        response = auth_client.get('/dashboard')
+        assert response.status_code == 200
+        assert response.data.count(b'class="list-group-item task-item') == 10
+        # Earliest due dates come first
+        assert b'Windowed Task 0000' in response.data
+        assert b'Windowed Task 0010' not in response.data
+        assert b'/dashboard/tasks/list1?offset=10' in response.data
+
+def test_task_window_fragment(app, auth_client, authenticated_user):
+    """The fragment endpoint renders the requested window only."""
+    app.config['DASHBOARD_TASK_WINDOW'] = 10
+    with patch('famos.routes.main.get_list_tasks', return_value=_make_tasks(25)):
+        response = auth_client.get('/dashboard/tasks/list1?offset=20')
+        assert response.status_code == 200
+        assert response.data.count(b'class="list-group-item task-item') == 5
+        assert b'Windowed Task 0020' in response.data
+        assert b'load-more-tasks' not in response.data
+        assert b'<html' not in response.data
+
+def test_subtasks_fragment(app, auth_client, authenticated_user):
+    """Subtasks are rendered lazily from their own fragment endpoint."""
+    tasks = _make_tasks(3)
+    tasks[1]['parent'] = 'task0'
+    tasks[2]['parent'] = 'task0'
+    with patch('famos.routes.main.get_list_tasks', return_value=tasks):
+        page = auth_client.get('/dashboard/tasks/list1')
+        assert page.data.count(b'class="list-group-item task-item') == 1
+        assert b'/dashboard/tasks/list1/task0/subtasks' in page.data
+        
+        response = auth_client.get('/dashboard/tasks/list1/task0/subtasks')
+        assert response.status_code == 200
+        assert response.data.count(b'class="list-group-item task-item') == 2
+        assert b'Windowed Task 0001' in response.data
+        
+        assert auth_client.get('/dashboard/tasks/list1/missing/subtasks').status_code == 404
+
+def test_fragments_page_through_the_dashboard_snapshot(app, auth_client, authenticated_user, mock_google_service):
+    """Fragments slice the tasks the dashboard rendered from, even with the task cache off."""
+    app.config['DASHBOARD_TASK_WINDOW'] = 10
+    with auth_client.application.app_context():
+        db.session.add(GoogleIntegration(
+            user_id=authenticated_user.id,
+            access_token='test_token',
+            refresh_token='test_refresh',
+            token_expiry=(datetime.now(UTC) + timedelta(hours=1)).replace(microsecond=0).isoformat(),
+            tasks_enabled=True
+        ))
+        db.session.commit()
+
+    tasks = _make_tasks(25)
+    tasks[1]['parent'] = 'task0'
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service), \
+         patch('famos.routes.main.get_user_tasks', return_value=tasks):
+        page = auth_client.get('/dashboard').data.decode()
+    more_url = re.search(r'data-url="(/dashboard/tasks/list1\?[^"]*)"', page).group(1).replace('&amp;', '&')
+    subtasks_url = re.search(r'data-url="(/dashboard/tasks/list1/task0/subtasks[^"]*)"', page).group(1)
+    assert 'snapshot=' in more_url and 'snapshot=' in subtasks_url
+
+    with patch('famos.routes.main.get_list_tasks') as get_list_tasks, \
+         patch('famos.services.google_tasks.get_tasks_service') as get_tasks_service:
+        response = auth_client.get(more_url)
+        assert response.status_code == 200
+        assert b'Windowed Task 0011' in response.data
+        assert 'snapshot=' in re.search(r'data-url="([^"]*)"', response.data.decode()).group(1)
+        response = auth_client.get(subtasks_url)
+        assert b'Windowed Task 0001' in response.data
+        assert not get_list_tasks.called and not get_tasks_service.called
+
+        # An expired snapshot is reported rather than refetched from Google
+        response = auth_client.get('/dashboard/tasks/list1?offset=10&snapshot=0123456789abcdef')
+        assert response.status_code == 410
+        assert b'out of date' in response.data
+        assert not get_list_tasks.called
+
+def test_fragments_reuse_cached_tasks(tmp_path, mock_google_service):
+    """With the task cache on, paging through a list doesn't refetch it from Google."""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path),
+        'GOOGLE_TASKS_CACHE_TTL': 60,
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(email='cached@example.com', first_name='Cached', last_name='User')
+        db.session.add(user)
+        db.session.commit()
+
+        with patch('famos.services.google_tasks.get_tasks_service',
+                   return_value=mock_google_service) as get_tasks_service:
+            assert len(get_user_tasks(user.id)) == 2
+            for _ in range(3):
+                tasks = get_list_tasks(user.id, 'list1')
+                assert [(task.list_id, task.title) for task in tasks] == [('list1', 'Test Task 1')]
+        assert get_tasks_service.call_count == 1
+        db.session.remove()
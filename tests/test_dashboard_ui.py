@@ -129,7 +129,7 @@ def setup_google_integration(app, authenticated_user):
 class TestDashboard:
     def test_dashboard_layout(self, auth_client, mock_google_service):
         """Test basic dashboard layout elements"""
-        with patch('famos.routes.main.get_tasks_service', return_value=mock_google_service):
+        with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
             response = auth_client.get('/dashboard')
             assert response.status_code == 200
             assert b'Test List 1' in response.data
@@ -137,7 +137,7 @@ class TestDashboard:
     
     def test_tasks_display(self, auth_client, mock_google_service):
         """Test that tasks are displayed correctly"""
-        with patch('famos.routes.main.get_tasks_service', return_value=mock_google_service):
+        with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
             response = auth_client.get('/dashboard')
             assert response.status_code == 200
             assert b'Test Task 1' in response.data
@@ -148,21 +148,21 @@ class TestDashboard:
         mock_service = mock_google_service
         mock_service.tasks.return_value.list.return_value.execute.return_value = {'items': []}
         
-        with patch('famos.routes.main.get_tasks_service', return_value=mock_service):
+        with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_service):
             response = auth_client.get('/dashboard')
             assert response.status_code == 200
             assert b'No tasks found' in response.data
     
     def test_task_sorting(self, auth_client, mock_google_service):
         """Test task sorting functionality"""
-        with patch('famos.routes.main.get_tasks_service', return_value=mock_google_service):
+        with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
             response = auth_client.get('/dashboard?sort=due')
             assert response.status_code == 200
             assert b'Test Task 1' in response.data
     
     def test_list_filter_ui(self, auth_client, mock_google_service):
         """Test list filtering UI elements"""
-        with patch('famos.routes.main.get_tasks_service', return_value=mock_google_service):
+        with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
             response = auth_client.get('/dashboard')
             assert response.status_code == 200
             assert b'Test List 1' in response.data
@@ -170,7 +170,7 @@ class TestDashboard:
     
     def test_list_selection_persistence(self, auth_client, mock_google_service):
         """Test that list selection persists in session"""
-        with patch('famos.routes.main.get_tasks_service', return_value=mock_google_service):
+        with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
             # Select specific lists
             response = auth_client.get('/dashboard?lists=Test+List+1&lists=Test+List+2')
             assert response.status_code == 200
@@ -0,0 +1,83 @@
+from datetime import date
+from famos import db
+from famos.models import User, Family, Contact, FamilyMember
+from famos.services.contact_directory import invalidate_role_counts
+from famos.services.family_roster import KEY_CONTACTS, get_family_roster, forget_roster
+from tests.test_identity import QueryLog
+
+
+def _seed(members=3, contacts=5):
+    user = User.query.filter_by(email='test@example.com').first()
+    family = Family.query.filter_by(user_id=user.id).first()
+    for i in range(members):
+        db.session.add(FamilyMember(first_name=f'Kid{i}', last_name='User', relationship='child',
+                                    birthdate=date(2015, 1, i + 1), family_id=family.id))
+    for i in range(contacts):
+        db.session.add(Contact(first_name=f'Helper{i}', last_name=f'Z{contacts - i}', role='babysitter',
+                               family_id=family.id))
+    db.session.commit()
+    family_id = family.id
+    invalidate_role_counts(family_id)
+    db.session.remove()
+    return family_id
+
+
+def test_roster_loaded_once_per_request(app, authenticated_user):
+    family_id = _seed()
+    with app.test_request_context():
+        with QueryLog(db.engine) as log:
+            roster = get_family_roster(family_id)
+            assert get_family_roster(family_id) is roster
+            # Touching the loaded relationships must not lazy-load anything
+            assert roster.family.members and roster.family.user
+        # Family and user, members, key contacts, contact counts
+        assert len(log.statements) == 4
+
+        assert [u.email for u in roster.users] == ['test@example.com']
+        assert [m.first_name for m in roster.members] == ['Kid0', 'Kid1', 'Kid2']
+        assert [c.last_name for c in roster.contacts] == ['Z1', 'Z2', 'Z3', 'Z4', 'Z5']
+        assert roster.counts == {'users': 1, 'members': 3, 'contacts': 5}
+
+        forget_roster(family_id)
+        assert get_family_roster(family_id) is not roster
+
+
+def test_roster_loads_only_key_contacts(app, authenticated_user):
+    family_id = _seed(members=0, contacts=KEY_CONTACTS + 5)
+    with app.test_request_context():
+        with QueryLog(db.engine) as log:
+            roster = get_family_roster(family_id)
+        assert len(roster.contacts) == KEY_CONTACTS
+        assert roster.counts['contacts'] == KEY_CONTACTS + 5
+        assert any('LIMIT' in statement for statement in log.statements if 'FROM contact' in statement)
+
+
+def test_manage_page_queries_do_not_grow_with_roster(auth_client, authenticated_user):
+    _seed(members=1, contacts=1)
+    db.session.remove()
+    auth_client.get('/family/manage')
+    db.session.remove()
+    with QueryLog(db.engine) as log:
+        response = auth_client.get('/family/manage')
+    baseline = len(log.statements)
+    assert b'Dependents' in response.data
+
+    _seed(members=20, contacts=20)
+    # The first view after contacts change recounts them
+    auth_client.get('/family/manage')
+    db.session.remove()
+    with QueryLog(db.engine) as log:
+        response = auth_client.get('/family/manage')
+    assert len(log.statements) == baseline
+    assert b'21 dependents' in response.data and b'21 contacts' in response.data
+
+
+def test_edit_member_rejects_other_families(auth_client, authenticated_user):
+    stranger = User(email='stranger@example.com', first_name='Stranger', last_name='Danger')
+    db.session.add(stranger)
+    db.session.flush()
+    db.session.add(Family(user_id=stranger.id, name='Other'))
+    db.session.commit()
+
+    response = auth_client.get(f'/family/member/{stranger.id}/edit', follow_redirects=True)
+    assert b'Unauthorized access' in response.data
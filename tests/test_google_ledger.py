@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import pytest
+from googleapiclient.errors import HttpError
+from famos import db
+from famos.models.google_api_usage import GoogleApiCall, GoogleApiDailyUsage
+from famos.models.user import User
+from famos.services import google_api
+from famos.services.google_ledger import usage_report
+from famos.services.identity import invalidate_identity
+
+
+@pytest.fixture
+def ledger(app):
+    return app.extensions['famos_google_ledger']
+
+
+class FakeRequest:
+    """Stands in for googleapiclient's HttpRequest, which parses the body in postproc."""
+
+    def __init__(self, body):
+        self.body = body
+        self.postproc = lambda resp, content: {'size': len(content)}
+
+    def execute(self):
+        return self.postproc(SimpleNamespace(status=200), self.body)
+
+
+def test_calls_are_attributed_and_rolled_up(auth_client, authenticated_user, ledger, mock_google_service):
+    user_id = User.query.filter_by(email='test@example.com').one().id
+    mock_google_service.tasklists.return_value.get.return_value.execute.return_value = {'title': 'Test List 1'}
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
+        assert auth_client.get('/dashboard/tasks/list1').status_code == 200
+        assert auth_client.get('/dashboard/tasks/list1').status_code == 200
+    assert ledger.flush() == 4
+
+    calls = GoogleApiCall.query.all()
+    assert {call.method for call in calls} == {'tasklists.get', 'tasks.list'}
+    assert {(call.user_id, call.endpoint, call.status) for call in calls} == {
+        (user_id, 'main.task_window', 'ok')
+    }
+    assert len({call.request_id for call in calls}) == 2
+
+    rollup = GoogleApiDailyUsage.query.filter_by(method='tasks.list').one()
+    assert (rollup.user_id, rollup.calls, rollup.errors) == (user_id, 2, 0)
+
+    # Later batches add to the same rollup row
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
+        auth_client.get('/dashboard/tasks/list1')
+    ledger.flush()
+    db.session.remove()
+    assert GoogleApiDailyUsage.query.filter_by(method='tasks.list').one().calls == 3
+
+    report = usage_report(7)
+    assert report.calls == 6
+    assert report.consumers[0].email == 'test@example.com'
+    view = next(view for view in report.views if view.endpoint == 'main.task_window')
+    assert (view.views, view.calls_per_view) == (3, 2.0)
+
+
+def test_errors_and_response_sizes_are_recorded(app, ledger):
+    with app.test_request_context('/'):
+        assert google_api.execute(FakeRequest(b'x' * 300), 'tasks.get') == {'size': 300}
+
+        failing = MagicMock()
+        failing.execute.side_effect = HttpError(SimpleNamespace(status=403, reason='Forbidden'), b'quota')
+        with pytest.raises(HttpError):
+            google_api.execute(failing, 'tasks.list')
+    ledger.flush()
+
+    calls = {call.method: call for call in GoogleApiCall.query.all()}
+    assert calls['tasks.get'].response_bytes == 300
+    assert calls['tasks.get'].user_id is None
+    assert calls['tasks.list'].status == '403'
+    methods = {method.method: method for method in usage_report(1).methods}
+    assert methods['tasks.list'].error_rate == 1.0
+    assert methods['tasks.get'].error_rate == 0.0
+
+
+def test_full_batches_are_written_without_a_flush(app, ledger):
+    ledger.batch_size = 3
+    with app.test_request_context('/'):
+        for _ in range(4):
+            google_api.execute(FakeRequest(b'{}'), 'tasks.get')
+    assert GoogleApiCall.query.count() == 3
+    assert GoogleApiDailyUsage.query.one().calls == 3
+
+
+def test_old_ledger_rows_are_pruned(app, ledger):
+    now = datetime.utcnow()
+    for age in (1, 20):
+        ledger.record({'created_at': now - timedelta(days=age), 'user_id': None, 'endpoint': '',
+                       'method': 'tasks.list', 'status': 'ok', 'latency_ms': 5, 'response_bytes': 0,
+                       'request_id': 'r'})
+    ledger.flush()
+    assert ledger.prune(now) == 1
+    assert GoogleApiCall.query.count() == 1
+    # The rollups keep the history
+    assert GoogleApiDailyUsage.query.count() == 2
+
+
+def test_report_page_is_admin_only(auth_client, authenticated_user, ledger):
+    assert auth_client.get('/admin/google-api').status_code == 403
+
+    user = User.query.filter_by(email='test@example.com').first()
+    user.is_admin = True
+    db.session.commit()
+    invalidate_identity(user.id)
+    db.session.remove()
+    response = auth_client.get('/admin/google-api?days=30')
+    assert response.status_code == 200
+    assert b'Top consumers' in response.data
+    assert b'Calls per view' in response.data
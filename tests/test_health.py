@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+import fcntl
+import os
+import threading
+import time
+from unittest.mock import patch
+from famos import create_app, db
+from famos.models.google_api_usage import GoogleApiDailyUsage
+from famos.models.integrations import GoogleIntegration
+from famos.models.user import User
+from famos.services.google_ledger import recent_users
+from famos.services.google_tasks import get_task_lists, get_user_tasks, invalidate_user_tasks
+
+
+def _warmup_app(tmp_path, **config):
+    return create_app(dict({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'famos.sqlite'),
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path / 'sessions'),
+        'GOOGLE_CLIENT_ID': 'test-client-id',
+        'GOOGLE_CLIENT_SECRET': 'test-client-secret',
+        'GOOGLE_TASKS_CACHE_TTL': 60,
+        'WARMUP_ENABLED': True,
+    }, **config))
+
+
+def _seed_activity(days_ago_by_email, tasks_enabled=True):
+    """Users with a Google integration and one day of API calls each; returns their IDs by email."""
+    today = datetime.utcnow().date()
+    ids = {}
+    for email, days_ago in days_ago_by_email.items():
+        user = User(email=email, first_name='Test', last_name='User')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(GoogleIntegration(user_id=user.id, access_token='token', tasks_enabled=tasks_enabled))
+        db.session.add(GoogleApiDailyUsage(day=today - timedelta(days=days_ago), user_id=user.id,
+                                           endpoint='main.index', method='tasks.list', calls=3))
+        ids[email] = user.id
+    db.session.commit()
+    return ids
+
+
+def test_healthz(client):
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'ok'}
+
+
+def test_readyz_without_warmup(client):
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ready'
+    assert response.headers['Cache-Control'] == 'no-store'
+
+
+def test_recent_users_ranks_by_last_activity(app):
+    ids = _seed_activity({'old@example.com': 5, 'recent@example.com': 0, 'yesterday@example.com': 1})
+    assert recent_users(10, days=3) == [ids['recent@example.com'], ids['yesterday@example.com']]
+    assert recent_users(1, days=7) == [ids['recent@example.com']]
+
+
+def test_readyz_waits_for_warmup(tmp_path, mock_google_service):
+    app = _warmup_app(tmp_path)
+    with app.app_context():
+        ids = _seed_activity({'a@example.com': 0, 'b@example.com': 1})
+        disabled = _seed_activity({'c@example.com': 0}, tasks_enabled=False)
+
+    release = threading.Event()
+    warmed = []
+
+    def get_service(user_id):
+        release.wait(10)
+        warmed.append(user_id)
+        return mock_google_service
+
+    client = app.test_client()
+    with patch('famos.services.google_tasks.get_tasks_service', side_effect=get_service):
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json()['status'] == 'warming'
+
+        release.set()
+        warmup = app.extensions['famos_warmup']
+        assert warmup.wait(10)
+        response = client.get('/readyz')
+        assert response.status_code == 200
+        assert response.get_json()['warmup']['users'] == {'warmed': 2, 'failed': 0, 'skipped': 0}
+        assert sorted(warmed) == sorted(ids.values())
+        assert disabled['c@example.com'] not in warmed
+
+    # Prefetched tasks are served without calling Google again, until invalidated
+    with app.app_context(), patch('famos.services.google_tasks.get_tasks_service') as get_tasks_service:
+        assert [task.title for task in get_user_tasks(ids['a@example.com'])] == ['Test Task 1', 'Test Task 1']
+        assert [task_list['title'] for task_list in get_task_lists(ids['a@example.com'])] == ['Test List 1', 'Test List 2']
+        assert not get_tasks_service.called
+        invalidate_user_tasks(ids['a@example.com'])
+        get_tasks_service.return_value = mock_google_service
+        get_user_tasks(ids['a@example.com'])
+        assert get_tasks_service.called
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_workers_take_turns_warming(tmp_path, mock_google_service):
+    lock_path = str(tmp_path / 'warmup.lock')
+    app = _warmup_app(tmp_path, WARMUP_LOCK_PATH=lock_path)
+    with app.app_context():
+        ids = _seed_activity({'a@example.com': 0, 'b@example.com': 1})
+        # Another worker holds the turn and has filled the shared cache
+        with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
+            for user_id in ids.values():
+                get_user_tasks(user_id)
+        db.session.remove()
+
+    client = app.test_client()
+    with open(lock_path, 'a') as other_worker, \
+            patch('famos.services.google_tasks.get_tasks_service') as get_tasks_service:
+        fcntl.flock(other_worker.fileno(), fcntl.LOCK_EX)
+        assert client.get('/readyz').status_code == 503
+        time.sleep(0.3)
+        warmup = app.extensions['famos_warmup']
+        assert not warmup.ready
+
+        fcntl.flock(other_worker.fileno(), fcntl.LOCK_UN)
+        assert warmup.wait(10)
+        assert warmup.status()['users'] == {'warmed': 2, 'failed': 0, 'skipped': 0}
+        assert not get_tasks_service.called
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_readyz_waits_for_every_worker_on_the_host(tmp_path, mock_google_service):
+    app = _warmup_app(tmp_path, WARMUP_READY_DIR=str(tmp_path / 'ready'))
+    warmup = app.extensions['famos_warmup']
+    # This process plays the master, listing two workers, and then worker 1
+    warmup.prepare_host()
+    warmup.expect_workers(['1', '2'])
+    warmup.join_host(os.getpid(), '1')
+
+    client = app.test_client()
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
+        client.get('/healthz')
+        assert warmup.wait(10)
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json()['warmup']['workers'] == {'ready': 1, 'expected': 2}
+
+        # Worker 2 finishes warming
+        open(tmp_path / 'ready' / str(os.getpid()) / '2.ready', 'w').close()
+        response = client.get('/readyz')
+        assert response.status_code == 200
+        assert response.get_json()['warmup']['workers'] == {'ready': 2, 'expected': 2}
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
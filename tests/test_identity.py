@@ -0,0 +1,90 @@
+import re
+from sqlalchemy import event
+from famos import db
+from famos.models import User, GoogleIntegration
+from famos.services.identity import load_user
+
+# Tables the identity loader reads; family_member and contact are not part of it
+IDENTITY_TABLES = re.compile(r'FROM (user|family|google_integrations)\b')
+
+class QueryLog:
+    """Collect SQL statements executed on the app's engine."""
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+    
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+    
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+def _user_queries(statements):
+    return [s for s in statements if IDENTITY_TABLES.search(s)]
+
+def test_identity_loaded_in_one_query_then_cached(app, auth_client, authenticated_user):
+    """The user, family and integration come from one joined query, then the cache."""
+    user = User.query.filter_by(email='test@example.com').first()
+    db.session.add(GoogleIntegration(user_id=user.id, tasks_enabled=False))
+    db.session.commit()
+    db.session.remove()
+    
+    with QueryLog(db.engine) as log:
+        assert auth_client.get('/dashboard').status_code == 200
+    identity_queries = _user_queries(log.statements)
+    assert len(identity_queries) == 1
+    assert 'JOIN family' in identity_queries[0]
+    assert 'JOIN google_integrations' in identity_queries[0]
+    
+    db.session.remove()
+    with QueryLog(db.engine) as log:
+        assert auth_client.get('/dashboard').status_code == 200
+    assert _user_queries(log.statements) == []
+
+def test_account_settings_invalidates_identity(app, auth_client, authenticated_user):
+    """Saving account settings drops the cached identity."""
+    db.session.remove()
+    auth_client.get('/dashboard')
+    assert len(app.extensions['famos_identity']) == 1
+    
+    response = auth_client.post('/account/settings', data={
+        'first_name': 'Renamed',
+        'last_name': 'User',
+        'email': 'test@example.com',
+        'phone': ''
+    })
+    assert response.status_code == 302
+    assert len(app.extensions['famos_identity']) == 0
+    
+    db.session.remove()
+    response = auth_client.get('/dashboard')
+    assert b'Renamed User' in response.data
+
+def test_secrets_stay_out_of_the_shared_cache(app, authenticated_user):
+    """Password hashes and Google tokens are loaded from the database, never cached."""
+    user = User.query.filter_by(email='test@example.com').first()
+    db.session.add(GoogleIntegration(user_id=user.id, access_token='access-secret',
+                                     refresh_token='refresh-secret', tasks_enabled=True))
+    db.session.commit()
+    user_id, password_hash = user.id, user.password_hash
+    db.session.remove()
+
+    load_user(user_id)
+    db.session.remove()
+    stored = ' '.join(app.extensions['famos_cache_backend']._entries[key][1]
+                      for key in app.extensions['famos_cache_backend']._entries)
+    assert 'tasks_enabled' in stored
+    assert password_hash not in stored
+    assert 'secret' not in stored
+
+    with QueryLog(db.engine) as log:
+        user = load_user(user_id)
+        assert user.google_integration.tasks_enabled
+    assert _user_queries(log.statements) == []
+    assert user.check_password('password')
+    assert user.google_integration.access_token == 'access-secret'
+    assert user.google_integration.refresh_token == 'refresh-secret'
@@ -0,0 +1,190 @@
+import fcntl
+import json
+import logging
+import multiprocessing
+import pytest
+from famos import create_app
+from famos.utils import logger as log_module
+from famos.utils.logger import JsonFormatter, LazyJson, LockingRotatingFileHandler, RateLimitFilter
+
+
+class CountingPayload:
+    renders = 0
+
+    def __str__(self):
+        CountingPayload.renders += 1
+        return 'payload'
+
+
+def _record(msg='hello %s', args=('world',), level=logging.INFO, **attrs):
+    record = logging.LogRecord('famos.test', level, __file__, 1, msg, args, None)
+    record.__dict__.update(attrs)
+    return record
+
+
+@pytest.fixture
+def famos_logger():
+    """Restore the shared 'famos' logger after a test installs a pipeline."""
+    famos = logging.getLogger('famos')
+    saved = famos.handlers[:], famos.level, famos.propagate
+    yield famos
+    log_module._stop_pipeline()
+    famos.handlers[:] = saved[0]
+    famos.setLevel(saved[1])
+    famos.propagate = saved[2]
+
+
+def test_lazy_json_is_not_rendered_below_level():
+    CountingPayload.renders = 0
+    quiet = logging.getLogger('famos.test.quiet')
+    quiet.setLevel(logging.INFO)
+    quiet.debug('Response: %s', LazyJson({'item': CountingPayload()}))
+    assert CountingPayload.renders == 0
+    assert str(LazyJson({'item': CountingPayload()})) == '{"item":"payload"}'
+    assert CountingPayload.renders == 1
+
+
+def test_lazy_json_is_capped():
+    text = str(LazyJson({'notes': 'x' * 5000}, limit=100))
+    assert text.startswith('{"notes":"xxx')
+    assert text.endswith('more chars]')
+    assert len(text) < 150
+
+
+def test_json_formatter_fields_and_caps():
+    formatter = JsonFormatter(max_message=20, max_field=10)
+    record = _record('a' * 50, (), fields={'user_id': 7, 'body': 'b' * 40, 'ok': True})
+    entry = json.loads(formatter.format(record))
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'famos.test'
+    assert entry['message'].startswith('a' * 20) and 'more chars' in entry['message']
+    assert entry['fields']['user_id'] == 7
+    assert entry['fields']['ok'] is True
+    assert entry['fields']['body'].startswith('b' * 10) and 'more chars' in entry['fields']['body']
+
+
+def test_json_formatter_includes_traceback():
+    try:
+        raise RuntimeError('boom')
+    except RuntimeError:
+        import sys
+        record = _record(exc_info=sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert 'RuntimeError: boom' in entry['exc']
+
+
+def test_rate_limit_keys_on_message_template():
+    limiter = RateLimitFilter(burst=3, interval=10)
+    passed = [limiter.filter(_record(args=(i,)), now=100 + i * 0.1) for i in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    # A different template has its own budget
+    assert limiter.filter(_record('other %s'), now=101)
+
+    # The next window lets records through again and reports what was dropped
+    record = _record(args=('again',))
+    assert limiter.filter(record, now=111)
+    assert record.suppressed == 7
+
+
+def test_rotating_handler_reopens_after_another_writer_rotates(tmp_path):
+    path = str(tmp_path / 'famos.log')
+    first = LockingRotatingFileHandler(path, maxBytes=200, backupCount=5)
+    second = LockingRotatingFileHandler(path, maxBytes=200, backupCount=5)
+    for handler in (first, second):
+        handler.setFormatter(logging.Formatter('%(message)s'))
+    try:
+        for i in range(20):
+            (first if i % 2 else second).emit(_record('line %03d' + 'x' * 20, (i,)))
+    finally:
+        first.close()
+        second.close()
+
+    lines = []
+    for log_file in tmp_path.glob('famos.log*'):
+        if not log_file.name.endswith('.lock'):
+            lines.extend(log_file.read_text().splitlines())
+    assert sorted(lines) == [f'line {i:03d}' + 'x' * 20 for i in range(20)]
+    assert (tmp_path / 'famos.log.1').exists()
+
+
+def _write_lines(path, worker, count):
+    handler = LockingRotatingFileHandler(path, maxBytes=2048, backupCount=100)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(count):
+        handler.emit(_record('worker %d line %d', (worker, i)))
+    handler.close()
+
+
+def test_rotation_is_safe_across_processes(tmp_path):
+    path = str(tmp_path / 'famos.log')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_write_lines, args=(path, worker, 300)) for worker in range(3)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(30)
+        assert process.exitcode == 0
+
+    lines = []
+    for log_file in tmp_path.glob('famos.log*'):
+        if not log_file.name.endswith('.lock'):
+            lines.extend(log_file.read_text().splitlines())
+    assert len(lines) == 900
+    assert len(set(lines)) == 900
+
+
+def _hold_lock_after_fork(handler, locked, release):
+    handler.reset_after_fork()
+    handler._acquire_file_lock()
+    locked.set()
+    release.wait(10)
+    handler._release_file_lock()
+
+
+def test_forked_workers_take_their_own_file_lock(tmp_path):
+    handler = LockingRotatingFileHandler(str(tmp_path / 'famos.log'))
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    # Opened before the fork, as the master's startup log line does
+    handler.emit(_record())
+
+    context = multiprocessing.get_context('fork')
+    locked, release = context.Event(), context.Event()
+    child = context.Process(target=_hold_lock_after_fork, args=(handler, locked, release))
+    child.start()
+    try:
+        assert locked.wait(10)
+        with pytest.raises(BlockingIOError):
+            fcntl.flock(handler._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    finally:
+        release.set()
+        child.join(10)
+        handler.close()
+    assert child.exitcode == 0
+
+
+def test_pipeline_writes_json_lines(tmp_path, famos_logger):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path / 'sessions'),
+        'LOG_PIPELINE_ENABLED': True,
+        'LOG_DIR': str(tmp_path / 'logs'),
+        'LOG_CONSOLE': False,
+        'LOG_RATE_LIMIT_BURST': 5,
+    })
+    pipeline = app.extensions['famos_logging']
+    assert famos_logger.handlers == [pipeline.handler]
+    assert app.logger is famos_logger
+
+    service_logger = logging.getLogger('famos.services.example')
+    service_logger.debug('not written: %s', LazyJson({'big': 'payload'}))
+    for i in range(10):
+        service_logger.info('Fetched %d tasks', i, extra={'fields': {'user_id': 3}})
+    pipeline.stop()
+
+    entries = [json.loads(line) for line in (tmp_path / 'logs' / 'famos.log').read_text().splitlines()]
+    assert entries[0]['message'] == 'famOS startup'
+    fetched = [entry for entry in entries if entry['logger'] == 'famos.services.example']
+    assert [entry['message'] for entry in fetched] == [f'Fetched {i} tasks' for i in range(5)]
+    assert fetched[0]['fields'] == {'user_id': 3}
@@ -0,0 +1,108 @@
+from famos import create_app, db
+from famos.services.login_throttle import LoginThrottle, MemoryBackend, SqliteBackend
+from tests.conftest import register_user, login_user
+
+
+def _throttle(backend=None):
+    return LoginThrottle(backend or MemoryBackend(), window=60, ip_free=5, ip_lockout=8,
+                         email_free=2, email_lockout=4, base_delay=1, max_delay=10)
+
+
+def test_progressive_delay_then_lockout():
+    throttle = _throttle()
+    now = 1000.0
+
+    for _ in range(2):
+        assert throttle.check('1.2.3.4', 'a@example.com', now=now) == 0
+        throttle.record_failure('1.2.3.4', 'a@example.com', now=now)
+
+    # Third failure waits 1s, fourth 2s after the last failure
+    assert throttle.check('1.2.3.4', 'a@example.com', now=now) == 1
+    assert throttle.check('1.2.3.4', 'a@example.com', now=now + 1) == 0
+    throttle.record_failure('1.2.3.4', 'A@example.com ', now=now + 1)
+    assert throttle.check('1.2.3.4', 'a@example.com', now=now + 2) == 1
+    throttle.record_failure('1.2.3.4', 'a@example.com', now=now + 3)
+
+    # Four failures lock the email from that IP until the first one leaves the window
+    assert throttle.check('1.2.3.4', 'a@example.com', now=now + 30) == 30
+    assert throttle.check('1.2.3.4', 'a@example.com', now=now + 61) == 0
+    assert throttle.stats() == {'email_delay': 2, 'email_lockout': 1}
+
+    throttle.record_success('1.2.3.4', 'a@example.com')
+    assert throttle.check('1.2.3.4', 'a@example.com', now=now + 3) == 0
+
+
+def test_email_lockout_does_not_reach_other_addresses():
+    throttle = _throttle()
+    now = 1000.0
+    for _ in range(4):
+        throttle.record_failure('6.6.6.6', 'victim@example.com', now=now)
+
+    assert throttle.check('6.6.6.6', 'victim@example.com', now=now + 1) == 59
+    assert throttle.check('5.6.7.8', 'victim@example.com', now=now + 1) == 0
+
+
+def test_memory_backend_evicts_the_quietest_key():
+    backend = MemoryBackend(max_keys=2)
+    backend.add('a', 1.0)
+    backend.add('b', 2.0)
+    backend.add('a', 3.0)
+    backend.add('c', 4.0)
+
+    assert backend.recent('b', 0) == []
+    assert backend.recent('a', 0) == [1.0, 3.0]
+    backend.prune(3.0)
+    assert backend.recent('a', 0) == []
+    assert backend.recent('c', 0) == [4.0]
+
+
+def test_ip_limit_spans_emails(tmp_path):
+    throttle = _throttle(SqliteBackend(str(tmp_path / 'throttle.sqlite')))
+    now = 1000.0
+    for i in range(8):
+        throttle.record_failure('1.2.3.4', f'user{i}@example.com', now=now)
+
+    assert throttle.check('1.2.3.4', 'fresh@example.com', now=now + 1) == 59
+    assert throttle.check('4.3.2.1', 'fresh@example.com', now=now + 1) == 0
+    assert throttle.stats() == {'ip_lockout': 1}
+
+
+def test_login_rejected_before_lookup(app, client, query_budget):
+    register_user(client)
+    app.extensions['famos_login_throttle'].limits['email'] = (1, 3)
+
+    for _ in range(3):
+        login_user(client, password='wrongpassword')
+
+    with query_budget(0):
+        response = client.post('/auth/login', data={'email': 'test@example.com', 'password': 'password'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert b'Too many failed login attempts' in response.data
+
+
+def test_throttle_keys_on_forwarded_client_behind_proxy(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'WTF_CSRF_ENABLED': False,
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path),
+        'PROXY_FIX_HOPS': 1,
+        'LOGIN_THROTTLE_IP_FREE': 2,
+        'LOGIN_THROTTLE_IP_LOCKOUT': 2,
+    })
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+
+        def attempt(client_ip, email):
+            # Every request reaches the app from the proxy on 127.0.0.1
+            return client.post('/auth/login', data={'email': email, 'password': 'wrong'},
+                               headers={'X-Forwarded-For': client_ip})
+
+        for i in range(2):
+            assert attempt('203.0.113.5', f'user{i}@example.com').status_code != 429
+        assert attempt('203.0.113.5', 'other@example.com').status_code == 429
+        assert attempt('198.51.100.7', 'other@example.com').status_code != 429
+        db.session.remove()
@@ -0,0 +1,163 @@
+import logging
+import multiprocessing
+import os
+import re
+import pytest
+from unittest.mock import MagicMock
+from googleapiclient.errors import HttpError
+from famos import create_app, db
+from famos.services import google_api
+from famos.services.metrics import MetricsRegistry
+from famos.utils.logger import LogPipeline
+from tests.conftest import login_user
+
+
+def _sample(text, name, **labels):
+    """The value of one sample line in exposition text, or None."""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = '^' + re.escape(f'{name}{{{label_text}}}' if labels else name) + r' (\S+)$'
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def _scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    return response.get_data(as_text=True)
+
+
+def test_request_counts_and_latency(client):
+    client.get('/auth/login')
+    client.get('/auth/login')
+    client.get('/no-such-page')
+    text = _scrape(client)
+
+    assert '# TYPE famos_http_requests_total counter' in text
+    assert _sample(text, 'famos_http_requests_total', endpoint='auth.login', method='GET', status='200') == 2
+    assert _sample(text, 'famos_http_requests_total', endpoint='unmatched', method='GET', status='404') == 1
+    assert '# TYPE famos_http_request_duration_seconds histogram' in text
+    assert _sample(text, 'famos_http_request_duration_seconds_count', endpoint='auth.login') == 2
+    assert _sample(text, 'famos_http_request_duration_seconds_bucket', endpoint='auth.login', le='+Inf') == 2
+
+
+def test_sql_queries_per_request(client, authenticated_user):
+    login_user(client, 'test@example.com', 'password')
+    client.get('/contacts/')
+    text = _scrape(client)
+    assert _sample(text, 'famos_sql_queries_per_request_count', endpoint='contacts.index') == 1
+    assert _sample(text, 'famos_sql_queries_per_request_sum', endpoint='contacts.index') >= 1
+
+
+def test_google_calls_are_timed_and_errors_counted(app):
+    request = MagicMock()
+    request.execute.return_value = {'items': []}
+    assert google_api.execute(request, 'tasks.list') == {'items': []}
+
+    failing = MagicMock()
+    failing.execute.side_effect = HttpError(MagicMock(status=403), b'forbidden')
+    with pytest.raises(HttpError):
+        google_api.execute(failing, 'tasks.update')
+
+    text = app.extensions['famos_metrics'].render()
+    assert _sample(text, 'famos_google_api_request_duration_seconds_count', method='tasks.list') == 1
+    assert _sample(text, 'famos_google_api_request_duration_seconds_count', method='tasks.update') == 1
+    assert _sample(text, 'famos_google_api_errors_total', method='tasks.update', reason='403') == 1
+    assert _sample(text, 'famos_google_api_errors_total', method='tasks.list', reason='403') is None
+
+
+def test_cache_hit_ratio(client, authenticated_user):
+    login_user(client, 'test@example.com', 'password')
+    for _ in range(3):
+        # A fresh session each time, as in a real request
+        db.session.remove()
+        client.get('/contacts/')
+    text = _scrape(client)
+    hits = _sample(text, 'famos_cache_hits_total', cache='identity')
+    misses = _sample(text, 'famos_cache_misses_total', cache='identity')
+    assert hits >= 2
+    assert _sample(text, 'famos_cache_hit_ratio', cache='identity') == pytest.approx(hits / (hits + misses))
+
+
+def test_login_throttle_rejections(client, authenticated_user):
+    for _ in range(6):
+        client.post('/auth/login', data={'email': 'test@example.com', 'password': 'wrong'})
+    text = _scrape(client)
+    assert _sample(text, 'famos_login_throttle_rejected_total', kind='email', reason='delay') >= 1
+
+
+def test_dropped_log_records(app):
+    # Never started, so nothing drains the queue
+    pipeline = LogPipeline([], queue_size=1)
+    for i in range(3):
+        pipeline.handler.handle(logging.LogRecord('famos.test', logging.INFO, __file__, 1, 'line %d', (i,), None))
+    app.extensions['famos_logging'] = pipeline
+    text = app.extensions['famos_metrics'].render()
+    assert _sample(text, 'famos_log_records_dropped_total') == 2
+
+
+def test_remote_scrapes_need_token(app, client):
+    remote = {'REMOTE_ADDR': '10.0.0.5'}
+    assert client.get('/metrics', environ_base=remote).status_code == 403
+    app.config['METRICS_TOKEN'] = 's3cret'
+    assert client.get('/metrics', environ_base=remote,
+                      headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/metrics', environ_base=remote,
+                      headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+
+def test_proxied_scrapes_are_not_local(tmp_path, client):
+    # Through a same-host proxy that ProxyFix doesn't know about
+    assert client.get('/metrics', headers={'X-Forwarded-For': '198.51.100.7'}).status_code == 403
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path),
+        'PROXY_FIX_HOPS': 1,
+    })
+    proxied = app.test_client()
+    assert proxied.get('/metrics', headers={'X-Forwarded-For': '198.51.100.7'}).status_code == 403
+    assert proxied.get('/metrics', headers={'X-Forwarded-For': '127.0.0.1'}).status_code == 200
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter('famos_test_total', 'Test', ('name',)).inc('say "hi"\n')
+    assert 'famos_test_total{name="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+def _worker(directory, ready):
+    registry = MetricsRegistry(directory)
+    registry.counter('famos_jobs_total', 'Jobs', ('kind',)).inc('sync', amount=3)
+    registry.histogram('famos_job_seconds', 'Job time').observe(0.2)
+    registry.gauge('famos_workers', 'Workers').set(1)
+    registry.flush(force=True)
+    ready.set()
+
+
+def test_aggregates_across_processes(tmp_path):
+    directory = str(tmp_path)
+    registry = MetricsRegistry(directory)
+    jobs = registry.counter('famos_jobs_total', 'Jobs', ('kind',))
+    job_seconds = registry.histogram('famos_job_seconds', 'Job time')
+    registry.gauge('famos_workers', 'Workers').set(1)
+    jobs.inc('sync', amount=2)
+    job_seconds.observe(0.02)
+
+    context = multiprocessing.get_context('fork')
+    ready = context.Event()
+    process = context.Process(target=_worker, args=(directory, ready))
+    process.start()
+    process.join(10)
+    assert ready.is_set()
+    assert os.path.exists(os.path.join(directory, f'metrics-{process.pid}.json'))
+
+    text = registry.render()
+    assert _sample(text, 'famos_jobs_total', kind='sync') == 5
+    assert _sample(text, 'famos_job_seconds_count') == 2
+    assert _sample(text, 'famos_job_seconds_bucket', le='0.025') == 1
+    assert _sample(text, 'famos_job_seconds_bucket', le='0.25') == 2
+    # The worker has exited, so only this process's gauge is live
+    assert _sample(text, 'famos_workers') == 1
@@ -0,0 +1,105 @@
+import time
+import pytest
+from werkzeug.security import generate_password_hash
+from famos import create_app, db
+from famos.models.user import User
+from famos.services.passwords import PasswordHasher, PasswordHasherBusy, hash_password, verify_password
+
+
+def test_inline_hash_verify_and_rehash():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000')
+    pwhash = hasher.hash('secret')
+
+    assert pwhash.startswith('pbkdf2:sha256:1000$')
+    assert hasher.verify(pwhash, 'secret')
+    assert not hasher.verify(pwhash, 'wrong')
+    assert not hasher.verify(None, 'secret')
+    assert not hasher.needs_rehash(pwhash)
+    assert PasswordHasher(method='pbkdf2:sha256:2000').needs_rehash(pwhash)
+    # An implied iteration count matches Werkzeug's default
+    assert not PasswordHasher().needs_rehash(generate_password_hash('secret'))
+
+
+def test_pool_hashes_in_worker_process():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1, timeout=30)
+    try:
+        pwhash = hasher.hash('secret')
+        assert hasher.verify(pwhash, 'secret')
+        assert not hasher.verify(pwhash, 'wrong')
+    finally:
+        hasher.shutdown()
+
+
+def test_app_starts_pool_on_first_use(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path),
+        'PASSWORD_HASH_WORKERS': 1,
+    })
+    hasher = app.extensions['famos_passwords']
+    # Nothing is forked for commands and scripts that never hash a password
+    assert hasher._pool is None
+    try:
+        with app.app_context():
+            assert verify_password(hash_password('secret'), 'secret')
+        assert hasher._pool is not None
+    finally:
+        hasher.shutdown(wait=True)
+
+
+def test_pool_rejects_when_full_or_slow():
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1, max_pending=1, timeout=30)
+    try:
+        # Pool processes start on the first job; get that out of the way
+        hasher.hash('warm-up')
+        hasher.timeout = 0.05
+        with pytest.raises(PasswordHasherBusy):
+            hasher._run(time.sleep, 0.5)
+        # The slow job still holds the only slot
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash('secret')
+        time.sleep(0.6)
+        hasher.timeout = 30
+        assert hasher.verify(hasher.hash('secret'), 'secret')
+    finally:
+        hasher.shutdown()
+
+
+def test_login_rehashes_outdated_password(app, client):
+    user = User(email='old@example.com', first_name='Old', last_name='Hash',
+                password_hash=generate_password_hash('password', 'pbkdf2:sha256:1000'))
+    db.session.add(user)
+    db.session.commit()
+
+    response = client.post('/auth/login', data={'email': 'old@example.com', 'password': 'password'})
+    assert response.status_code == 302
+
+    db.session.remove()
+    user = User.query.filter_by(email='old@example.com').first()
+    hasher = app.extensions['famos_passwords']
+    assert not hasher.needs_rehash(user.password_hash)
+    assert user.check_password('password')
+
+
+def test_login_returns_503_when_hasher_busy(app, client, authenticated_user, monkeypatch):
+    def busy(*args):
+        raise PasswordHasherBusy('busy')
+
+    monkeypatch.setattr(app.extensions['famos_passwords'], 'verify', busy)
+    response = client.post('/auth/login', data={'email': 'test@example.com', 'password': 'password'})
+    assert response.status_code == 503
+
+
+def test_register_returns_503_when_hasher_busy(app, client, monkeypatch):
+    def busy(*args):
+        raise PasswordHasherBusy('busy')
+
+    monkeypatch.setattr(app.extensions['famos_passwords'], 'hash', busy)
+    response = client.post('/auth/register', data={
+        'email': 'new@example.com', 'first_name': 'New', 'last_name': 'User',
+        'password': 'password123', 'confirm_password': 'password123'
+    })
+    assert response.status_code == 503
+    assert User.query.filter_by(email='new@example.com').first() is None
@@ -0,0 +1,101 @@
+import os
+import threading
+import pytest
+from famos import db
+from famos.models.user import User
+from famos.services.profiling import ProfileTargets, Watchdog
+
+
+@pytest.fixture
+def profiler(app, tmp_path):
+    profiler = app.extensions['famos_profiler']
+    profiler.directory = str(tmp_path)
+    profiler.targets = ProfileTargets(str(tmp_path / 'targets.json'))
+    return profiler
+
+
+def _make_admin():
+    user = User.query.filter_by(email='test@example.com').first()
+    user.is_admin = True
+    db.session.commit()
+    db.session.remove()
+
+
+def test_admin_can_profile_a_request(auth_client, profiler):
+    _make_admin()
+    response = auth_client.get('/contacts/?_profile=cpu,mem,sample')
+    assert response.status_code == 200
+    files = response.headers['X-Profile'].split(', ')
+    assert any(name.endswith('.prof') for name in files)
+    assert any(name.endswith('-mem.txt') for name in files)
+    assert any(name.endswith('.folded') for name in files)
+    for name in files:
+        assert os.path.exists(os.path.join(profiler.directory, name))
+
+    summary = next(name for name in files if name.endswith('contacts.index.txt'))
+    with open(os.path.join(profiler.directory, summary)) as f:
+        assert 'cumulative' in f.read()
+
+
+def test_non_admins_are_not_profiled(auth_client, profiler):
+    response = auth_client.get('/contacts/?_profile=cpu')
+    assert response.status_code == 200
+    assert 'X-Profile' not in response.headers
+    assert profiler.files() == []
+    assert auth_client.get('/admin/profiles').status_code == 403
+
+
+def test_profiling_a_user_from_the_admin_page(auth_client, profiler):
+    _make_admin()
+    response = auth_client.post('/admin/profiles/targets', data={
+        'email': 'test@example.com', 'minutes': '5', 'modes': ['cpu']
+    })
+    assert response.status_code == 302
+    assert 'cpu' in profiler.targets.active()[1]['modes']
+
+    # Every request by that user is now profiled, without the query flag
+    response = auth_client.get('/contacts/')
+    assert response.headers['X-Profile'].endswith('.txt')
+
+    page = auth_client.get('/admin/profiles').get_data(as_text=True)
+    assert 'test@example.com' in page
+    name = response.headers['X-Profile'].split(', ')[0]
+    assert name in page
+    download = auth_client.get(f'/admin/profiles/{name}')
+    assert download.status_code == 200
+    assert 'attachment' in download.headers['Content-Disposition']
+    assert auth_client.get('/admin/profiles/..%2Fapp.db').status_code == 404
+
+    auth_client.post('/admin/profiles/targets/1/delete')
+    assert 'X-Profile' not in auth_client.get('/contacts/').headers
+
+
+def test_watchdog_dumps_stacks_of_slow_requests(tmp_path):
+    watchdog = Watchdog(str(tmp_path), threshold=5)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_request():
+        watchdog.begin('GET /slow')
+        started.set()
+        release.wait(5)
+        watchdog.end()
+
+    thread = threading.Thread(target=slow_request)
+    thread.start()
+    started.wait(5)
+    try:
+        entry = next(iter(watchdog.in_flight.values()))
+        assert watchdog.check(now=entry[0] + 1) == []
+        dumps = watchdog.check(now=entry[0] + 6)
+        # Only dumped once per request
+        assert watchdog.check(now=entry[0] + 7) == []
+    finally:
+        release.set()
+        thread.join()
+
+    assert len(dumps) == 1
+    with open(dumps[0]) as f:
+        text = f.read()
+    assert 'GET /slow has been running for 6.0s' in text
+    assert 'in slow_request' in text
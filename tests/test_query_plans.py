@@ -0,0 +1,60 @@
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import text
+from sqlalchemy.orm import joinedload
+from famos import db
+from famos.models import User, Family, Task, Contact, FamilyMember, GoogleIntegration
+from tests.conftest import _load_migration
+
+
+def query_plan(query):
+    """Return the EXPLAIN QUERY PLAN detail lines for an ORM query."""
+    sql = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    return [row[3] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+
+def assert_indexed(query):
+    plan = query_plan(query)
+    scans = [line for line in plan if line.startswith('SCAN')]
+    assert not scans, f'full scan in plan: {plan}'
+    return plan
+
+
+@pytest.mark.parametrize('build', [
+    lambda: User.query.options(joinedload(User.family), joinedload(User.google_integration)).filter_by(id=1),
+    lambda: GoogleIntegration.query.filter_by(user_id=1),
+    lambda: Family.query.filter_by(user_id=1),
+    lambda: FamilyMember.query.filter_by(family_id=1),
+    lambda: Contact.query.filter_by(family_id=1).order_by(Contact.last_name, Contact.first_name),
+    lambda: Task.query.filter_by(family_id=1, completed=False).order_by(Task.due_date),
+    lambda: Task.query.filter_by(assignee_id=1, completed=False).order_by(Task.due_date),
+    lambda: User.query.join(Family).filter(Family.id == 1),
+], ids=['identity', 'integration', 'family', 'members', 'contacts', 'family_tasks', 'assigned_tasks', 'family_users'])
+def test_route_queries_use_indexes(app, build):
+    assert_indexed(build())
+
+
+def test_integration_user_id_is_unique(app):
+    plan = query_plan(GoogleIntegration.query.filter_by(user_id=1))
+    assert any('ix_google_integrations_user_id' in line for line in plan)
+    indexes = db.session.execute(text("PRAGMA index_list('google_integrations')")).fetchall()
+    assert any(row[1] == 'ix_google_integrations_user_id' and row[2] for row in indexes)
+
+
+def test_task_due_order_needs_no_sort(app):
+    plan = assert_indexed(Task.query.filter_by(family_id=1, completed=False).order_by(Task.due_date))
+    assert not any('TEMP B-TREE' in line for line in plan)
+
+
+def test_index_migration_keeps_the_latest_integration_per_user(caplog):
+    migration = _load_migration('4b7d2e9c1a3f_add_hot_path_indexes.py')
+    engine = sa.create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE google_integrations (id INTEGER PRIMARY KEY, user_id INTEGER, updated_at DATETIME)'))
+        connection.execute(text(
+            "INSERT INTO google_integrations VALUES "
+            "(1, 1, '2026-05-01'), (2, 1, '2026-01-01'), (3, 1, NULL), (4, 2, NULL), (5, 2, NULL)"
+        ))
+        assert sorted(migration.delete_duplicate_integrations(connection)) == [2, 3, 4]
+        assert [row[0] for row in connection.execute(text('SELECT id FROM google_integrations ORDER BY id'))] == [1, 5]
+    assert 'Deleting duplicate google_integrations row 2 for user 1 (keeping row 1)' in caplog.text
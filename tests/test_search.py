@@ -0,0 +1,146 @@
+import json
+import os
+from flask_migrate import downgrade, stamp, upgrade
+from sqlalchemy import text
+from famos import create_app, db
+from famos.models import User, Family, Contact, FamilyMember, Task
+from famos.services.search import SEARCH_TABLE, build_match, rebuild_index, search
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def _family_id():
+    user = User.query.filter_by(email='test@example.com').first()
+    return Family.query.filter_by(user_id=user.id).first().id
+
+
+def _other_family():
+    owner = User(email='other@example.com', first_name='Other', last_name='Owner')
+    db.session.add(owner)
+    db.session.flush()
+    family = Family(user_id=owner.id, name='Other Family')
+    db.session.add(family)
+    db.session.flush()
+    return family.id
+
+
+def test_index_follows_inserts_updates_and_deletes(app, authenticated_user):
+    family_id = _family_id()
+    contact = Contact(first_name='Maria', last_name='Lopez', role='babysitter',
+                      notes='Available on weekends', family_id=family_id)
+    db.session.add(contact)
+    db.session.add(FamilyMember(first_name='Tom', last_name='Test', relationship='son', family_id=family_id))
+    db.session.add(Task(title='Book dentist appointment', description='Call Dr. Weekes', family_id=family_id))
+    db.session.commit()
+
+    assert [r.kind for r in search(family_id, 'mar')] == ['contact']
+    assert [r.kind for r in search(family_id, 'son')] == ['member']
+    assert [r.title for r in search(family_id, 'dent appoint')] == ['Book dentist appointment']
+    assert search(family_id, 'weekend')[0].snippet == 'babysitter Available on <mark>weekends</mark>'
+
+    contact.last_name = 'Garcia'
+    db.session.commit()
+    assert search(family_id, 'lopez') == []
+    assert search(family_id, 'garcia')[0].id == contact.id
+
+    db.session.delete(contact)
+    db.session.commit()
+    assert search(family_id, 'garcia') == []
+
+
+def test_rolled_back_rows_are_not_indexed(app, authenticated_user):
+    family_id = _family_id()
+    db.session.add(Contact(first_name='Ghost', last_name='Row', role='other', family_id=family_id))
+    db.session.flush()
+    db.session.rollback()
+    assert search(family_id, 'ghost') == []
+
+
+def test_search_is_scoped_and_ranked(app, authenticated_user):
+    family_id = _family_id()
+    other_id = _other_family()
+    db.session.add_all([
+        Contact(first_name='Sam', last_name='Piano', role='teacher', family_id=other_id),
+        Task(title='Practice piano', family_id=family_id),
+        Contact(first_name='Ann', last_name='Lee', role='teacher', notes='Teaches piano on Tuesdays',
+                family_id=family_id),
+    ])
+    db.session.commit()
+
+    results = search(family_id, 'piano')
+    # Title matches outrank body matches, and the other family's contact is never returned
+    assert [r.title for r in results] == ['Practice piano', 'Ann Lee']
+    assert [r.kind for r in search(family_id, 'piano', kinds=['contact'])] == ['contact']
+
+
+def test_user_input_cannot_inject_fts_syntax(app, authenticated_user):
+    family_id = _family_id()
+    assert build_match(family_id, '   ') is None
+    match = build_match(family_id, 'scope:f999 OR "x"')
+    assert match == f'scope : "f{family_id}" AND {{title body}} : ("scope"* AND "f999"* AND "OR"* AND "x"*)'
+    assert search(family_id, 'NEAR( AND *') == []
+
+
+def test_rebuild_indexes_bulk_inserted_rows(app, authenticated_user):
+    family_id = _family_id()
+    # Bulk inserts bypass the mapper events
+    db.session.bulk_insert_mappings(Task, [{'title': 'Renew passport', 'family_id': family_id}])
+    db.session.commit()
+    assert search(family_id, 'passport') == []
+
+    with db.engine.begin() as connection:
+        rebuild_index(connection)
+    assert [r.title for r in search(family_id, 'passport')] == ['Renew passport']
+
+
+def test_migration_creates_and_backfills_index(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'famos.sqlite'),
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path / 'sessions'),
+    })
+    with app.app_context():
+        # A database at the revision before search existed
+        owner = User(email='owner@example.com', first_name='Owner', last_name='Test')
+        db.session.add(owner)
+        db.session.flush()
+        family = Family(user_id=owner.id, name='Test Family')
+        db.session.add(family)
+        db.session.flush()
+        db.session.add(Task(title='Renew passport', description='Expires in May', family_id=family.id))
+        db.session.add(Contact(first_name='Ann', last_name='Lee', role='teacher', notes='Piano lessons',
+                               family_id=family.id))
+        db.session.commit()
+        assert search(family.id, 'passport') == []
+        stamp(MIGRATIONS, 'd5e9b3a7c2f8')
+
+        upgrade(MIGRATIONS)
+        assert [r.title for r in search(family.id, 'passport')] == ['Renew passport']
+        # Backfilled documents match the ones the mapper events write
+        assert search(family.id, 'piano')[0].snippet == 'teacher <mark>Piano</mark> lessons'
+        db.session.add(Contact(first_name='Maria', last_name='Lopez', role='doctor', family_id=family.id))
+        db.session.commit()
+        assert [r.title for r in search(family.id, 'lopez')] == ['Maria Lopez']
+
+        downgrade(MIGRATIONS, 'd5e9b3a7c2f8')
+        assert db.session.execute(
+            text("SELECT name FROM sqlite_master WHERE name = :name"), {'name': SEARCH_TABLE}
+        ).first() is None
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_search_routes(auth_client, authenticated_user):
+    family_id = _family_id()
+    db.session.add(Contact(first_name='Olivia', last_name='<b>Bold</b>', role='doctor', family_id=family_id))
+    db.session.commit()
+
+    data = json.loads(auth_client.get('/search/suggest?q=oli').data)
+    assert data['success']
+    assert data['results'][0]['title'] == 'Olivia <b>Bold</b>'
+    assert data['results'][0]['url'].startswith('/contacts/')
+
+    response = auth_client.get('/search/?q=olivia')
+    assert response.status_code == 200
+    assert b'Olivia &lt;b&gt;Bold&lt;/b&gt;' in response.data
@@ -0,0 +1,83 @@
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from famos.services.warmup import warm_shared_state
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Answers every request with the pid of the worker that served it
+SERVER = '''
+import logging, os, sys
+logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+from famos.server import PreforkServer
+
+def app_factory():
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [str(os.getpid()).encode()]
+    return app
+
+sys.exit(PreforkServer(app_factory, bind='127.0.0.1:0', workers=2, threads=2, graceful_timeout=5).run())
+'''
+
+LISTENING_RE = re.compile(r'Listening on http://[\d.]+:(\d+)')
+
+
+def _start_server():
+    process = subprocess.Popen([sys.executable, '-c', SERVER], cwd=ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    for line in process.stdout:
+        match = LISTENING_RE.search(line)
+        if match:
+            return process, int(match.group(1))
+    raise AssertionError('server did not start')
+
+
+def _worker_pids(port, requests=20):
+    pids = set()
+    deadline = time.monotonic() + 10
+    while len(pids) < 2 and time.monotonic() < deadline:
+        for _ in range(requests):
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5) as response:
+                    pids.add(int(response.read()))
+            except OSError:
+                time.sleep(0.05)
+    return pids
+
+
+def test_prefork_server_serves_reloads_and_stops():
+    process, port = _start_server()
+    try:
+        first = _worker_pids(port)
+        assert len(first) == 2
+        assert process.pid not in first
+
+        # HUP swaps every worker for a fresh fork without dropping the socket
+        process.send_signal(signal.SIGHUP)
+        deadline = time.monotonic() + 10
+        second = set()
+        while time.monotonic() < deadline:
+            second = _worker_pids(port)
+            if not second & first:
+                break
+            time.sleep(0.1)
+        assert len(second) == 2 and not second & first
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+
+
+def test_warm_shared_state_compiles_templates(app):
+    timings = warm_shared_state(app)
+    assert set(timings) == {'imports', 'discovery', 'templates'}
+    assert 'googleapiclient.discovery' in sys.modules
+    assert 'auth/login.html' in {name for _, name in app.jinja_env.cache.keys()}
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import time
+import pytest
+from famos import create_app, db
+from famos.utils.sessions import SqliteSessionInterface
+
+@pytest.fixture
+def app():
+    """App using the SQLite session store in a temporary file."""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'WTF_CSRF_ENABLED': False,
+        'SECRET_KEY': 'test-key',
+        'SESSION_TYPE': 'sqlite',
+        'SESSION_SQLITE_PATH': os.path.join(tempfile.mkdtemp(), 'sessions.sqlite')
+    })
+    
+    @app.route('/_set/<value>')
+    def set_value(value):
+        from flask import session
+        session['value'] = value
+        return 'ok'
+    
+    @app.route('/_get')
+    def get_value():
+        from flask import session
+        return session.get('value', 'missing')
+    
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def _rows(app):
+    return app.session_interface._connection().execute('SELECT id, data, expires_at FROM sessions').fetchall()
+
+def test_sessions_round_trip_through_sqlite(app, client):
+    assert isinstance(app.session_interface, SqliteSessionInterface)
+    client.get('/_set/hello')
+    assert len(_rows(app)) == 1
+    assert client.get('/_get').data == b'hello'
+
+def test_unmodified_session_is_not_written(app, client):
+    """Reading a session neither rewrites the row nor resends the cookie."""
+    client.get('/_set/hello')
+    before = _rows(app)
+    
+    response = client.get('/_get')
+    assert 'Set-Cookie' not in response.headers
+    assert _rows(app) == before
+
+def test_empty_session_creates_no_row(app, client):
+    response = client.get('/_get')
+    assert response.data == b'missing'
+    assert 'Set-Cookie' not in response.headers
+    assert _rows(app) == []
+
+def test_expired_sessions_are_collected_in_batches(app):
+    interface = app.session_interface
+    interface.store.gc_batch_size = 10
+    conn = interface._connection()
+    now = int(time.time())
+    conn.executemany(
+        'INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?)',
+        [(f'old-{i}', '{}', now - 60) for i in range(25)] + [('live', '{}', now + 60)]
+    )
+    
+    assert interface.collect_garbage(now, force=True) == 25
+    assert [row[0] for row in _rows(app)] == ['live']
+
+def test_expired_session_is_not_loaded(app, client):
+    client.get('/_set/hello')
+    conn = app.session_interface._connection()
+    conn.execute('UPDATE sessions SET expires_at = ?', (int(time.time()) - 1,))
+    assert client.get('/_get').data == b'missing'
+
+def test_session_file_is_private(app, client):
+    client.get('/_set/hello')
+    assert os.stat(app.config['SESSION_SQLITE_PATH']).st_mode & 0o777 == 0o600
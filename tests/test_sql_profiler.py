@@ -0,0 +1,87 @@
+import tempfile
+import pytest
+from famos import create_app, db, sql_profiler
+from famos.models import User, Family, Contact, Task
+from famos.utils.sql_profiler import fingerprint
+from tests.conftest import login_user
+
+
+def _seed_families(count):
+    for i in range(count):
+        user = User(email=f'owner{i}@example.com', first_name='Owner', last_name=str(i))
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Family(user_id=user.id, name=f'Family {i}'))
+    db.session.commit()
+    db.session.remove()
+
+
+def test_fingerprint_ignores_literals_and_in_lists():
+    assert fingerprint("SELECT * FROM user WHERE id = 3 AND email = 'a@b.c'") == \
+        fingerprint("SELECT * FROM user\n  WHERE id = 41 AND email = 'x''y@z'")
+    assert fingerprint('SELECT * FROM task WHERE id IN (?, ?, ?)') == 'SELECT * FROM task WHERE id IN (?)'
+    assert fingerprint('SELECT * FROM task WHERE id IN (?)') == 'SELECT * FROM task WHERE id IN (?)'
+
+
+def test_lazy_loads_in_a_loop_are_flagged(app, query_budget):
+    _seed_families(6)
+    with pytest.raises(AssertionError, match='N\\+1'):
+        with query_budget(20):
+            for family in Family.query.all():
+                family.user.email
+    db.session.remove()
+
+    # The same loop with a joined load is one query
+    with query_budget(1) as report:
+        for family in Family.query.options(db.joinedload(Family.user)).all():
+            family.user.email
+    assert report.count == 1
+
+
+def test_budget_counts_statements(app, query_budget):
+    _seed_families(2)
+    with pytest.raises(AssertionError, match='Query budget of 1 exceeded'):
+        with query_budget(1, allow_repeats=True):
+            User.query.all()
+            Family.query.all()
+
+
+def test_slow_queries_capture_their_plan(app, monkeypatch):
+    _seed_families(1)
+    monkeypatch.setattr(sql_profiler, 'slow_threshold', 0)
+    with sql_profiler.capture(db.engine) as report:
+        Family.query.filter_by(user_id=1).all()
+    assert len(report.slow) == 1
+    assert any('ix_family_user_id' in step for step in report.slow[0].plan)
+
+
+def test_page_query_budgets(auth_client, authenticated_user, query_budget):
+    user = User.query.filter_by(email='test@example.com').first()
+    for i in range(10):
+        db.session.add(Contact(family_id=user.family.id, first_name='C', last_name=str(i), role='Doctor'))
+        db.session.add(Task(family_id=user.family.id, title=f'Task {i}', assignee_id=user.id))
+    db.session.commit()
+
+    # Budgets include the identity lookup when it misses the cache
+    for path, limit in (('/contacts/', 3), ('/family/manage', 3), ('/tasks/board', 5)):
+        db.session.remove()
+        with query_budget(limit):
+            assert auth_client.get(path).status_code == 200
+
+
+def test_profile_header_when_enabled(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'WTF_CSRF_ENABLED': False,
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': tempfile.mkdtemp(),
+        'SQL_PROFILER_ENABLED': True,
+    })
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        response = client.get('/auth/login')
+        assert response.headers['X-SQL-Profile'].startswith('queries=')
+        db.session.remove()
+        db.drop_all()
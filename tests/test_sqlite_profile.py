@@ -0,0 +1,43 @@
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+from famos import create_app, db
+
+
+def _file_app(tmp_path, **config):
+    return create_app(dict({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'famos.sqlite'),
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path / 'sessions'),
+    }, **config))
+
+
+def _pragma(name):
+    return db.session.execute(text(f'PRAGMA {name}')).scalar()
+
+
+def test_file_database_gets_profile(tmp_path):
+    app = _file_app(tmp_path, SQLITE_PRAGMAS={'cache_size': -4000})
+    with app.app_context():
+        assert isinstance(db.engine.pool, QueuePool)
+        assert _pragma('journal_mode') == 'wal'
+        assert _pragma('synchronous') == 1
+        assert _pragma('busy_timeout') == 5000
+        assert _pragma('temp_store') == 2
+        assert _pragma('cache_size') == -4000
+        assert _pragma('mmap_size') == 268435456
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_profile_can_be_disabled(tmp_path):
+    app = _file_app(tmp_path, SQLITE_PROFILE_ENABLED=False)
+    with app.app_context():
+        assert not isinstance(db.engine.pool, QueuePool)
+        assert _pragma('journal_mode') == 'delete'
+        db.session.remove()
+
+
+def test_memory_database_keeps_session_pragmas(app):
+    assert _pragma('busy_timeout') == 5000
+    assert _pragma('temp_store') == 2
@@ -0,0 +1,80 @@
+import os
+import re
+import subprocess
+import sys
+from sqlalchemy import Column, Integer, MetaData, Table, text
+from famos import create_app, db
+from famos.utils.schema import ensure_schema, schema_fingerprint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once a user talks to Google; importing them at boot costs ~200 ms
+LAZY_MODULES = ('googleapiclient', 'google_auth_oauthlib', 'google.oauth2', 'google.auth.transport', 'pytz')
+
+# Everything create_app imports, generously above today's ~0.5 s so only real regressions fail
+IMPORT_BUDGET_MS = 2000
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+BOOT = ("from famos import create_app; "
+        "create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', "
+        "'SESSION_TYPE': 'filesystem', 'SESSION_FILE_DIR': %r})")
+
+
+def _file_app(tmp_path, **config):
+    return create_app(dict({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'famos.sqlite'),
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path / 'sessions'),
+    }, **config))
+
+
+def test_boot_import_budget(tmp_path):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT % str(tmp_path)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    imported = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            imported[match.group(4)] = (int(match.group(2)), match.group(3) == '')
+
+    eager = [name for name in imported if name.startswith(LAZY_MODULES)]
+    assert eager == [], f'imported during boot: {", ".join(eager)}'
+    total_ms = sum(cumulative for cumulative, top_level in imported.values() if top_level) / 1000
+    assert total_ms < IMPORT_BUDGET_MS, f'boot imports took {total_ms:.0f} ms'
+
+
+def test_schema_check_skips_create_all_when_unchanged(tmp_path):
+    app = _file_app(tmp_path)
+    with app.app_context():
+        version = db.session.execute(text('PRAGMA user_version')).scalar()
+        assert version == schema_fingerprint(db.metadata)
+        assert ensure_schema(app, db) is False
+
+        # A table dropped behind the check's back comes back once the version is stale
+        db.session.execute(text('DROP TABLE google_api_calls'))
+        db.session.execute(text('PRAGMA user_version = 1'))
+        db.session.commit()
+        assert ensure_schema(app, db) is True
+        assert db.session.execute(text('SELECT count(*) FROM google_api_calls')).scalar() == 0
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_schema_fingerprint_tracks_model_changes():
+    metadata = MetaData()
+    table = Table('example', metadata, Column('id', Integer, primary_key=True))
+    before = schema_fingerprint(metadata)
+    assert schema_fingerprint(metadata) == before
+    table.append_column(Column('count', Integer))
+    assert schema_fingerprint(metadata) != before
+
+
+def test_templates_use_the_bytecode_cache(tmp_path):
+    app = _file_app(tmp_path, JINJA_BYTECODE_CACHE_DIR=str(tmp_path / 'jinja'))
+    with app.test_request_context():
+        app.jinja_env.get_template('auth/login.html')
+    assert any(name.startswith('__jinja2_') for name in os.listdir(tmp_path / 'jinja'))
@@ -0,0 +1,122 @@
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from famos import db
+from famos.models import User, Family, Task
+from famos.services.task_board import BoardFilters, board_sort_key, get_board_page
+from tests.test_identity import QueryLog
+
+
+def _seed(count=60):
+    """A family with dated and undated tasks, half assigned, a third completed."""
+    user = User.query.filter_by(email='test@example.com').first()
+    family = Family.query.filter_by(user_id=user.id).first()
+    helper = User(email='helper@example.com', first_name='Help', last_name='Er')
+    db.session.add(helper)
+    db.session.flush()
+    start = datetime(2030, 1, 1, 9)
+    for i in range(count):
+        db.session.add(Task(
+            title=f'Task {i}',
+            family_id=family.id,
+            # Shared due dates exercise the priority and ID tie-breakers
+            due_date=None if i % 5 == 0 else start + timedelta(days=i % 7),
+            priority=i % 3 + 1,
+            completed=i % 3 == 0,
+            assignee_id=(user.id, helper.id, None)[i % 3]
+        ))
+    db.session.commit()
+    ids = family.id, user.id
+    db.session.remove()
+    return ids
+
+
+def _all_pages(family_id, filters, limit):
+    tasks, cursor = [], None
+    while True:
+        page = get_board_page(family_id, filters, cursor=cursor, limit=limit)
+        tasks.extend(page.tasks)
+        if not page.next_cursor:
+            return tasks
+        cursor = page.next_cursor
+
+
+def test_keyset_pages_cover_board_order(app, authenticated_user):
+    family_id, user_id = _seed()
+    for filters in (BoardFilters(), BoardFilters(status='all'), BoardFilters(status='done'),
+                    BoardFilters(status='all', assignee_id=user_id), BoardFilters(priority=3)):
+        expected = sorted(
+            (task for task in Task.query.filter_by(family_id=family_id)
+             if filters.status == 'all' or task.completed == (filters.status == 'done')
+             if filters.assignee_id in (None, task.assignee_id)
+             if filters.priority in (None, task.priority)),
+            key=board_sort_key
+        )
+        paged = _all_pages(family_id, filters, limit=7)
+        assert [task.id for task in paged] == [task.id for task in expected]
+
+
+def test_keyset_pages_across_null_priorities(app, authenticated_user):
+    family_id, _ = _seed()
+    # Rows from before priorities had a default, in both dated and undated groups
+    db.session.execute(Task.__table__.update().where(Task.id % 2 == 0).values(priority=None))
+    db.session.commit()
+    expected = sorted(Task.query.filter_by(family_id=family_id, completed=False), key=board_sort_key)
+    assert any(task.priority is None and task.due_date is None for task in expected)
+    for limit in (1, 4, 7):
+        paged = _all_pages(family_id, BoardFilters(), limit=limit)
+        assert [task.id for task in paged] == [task.id for task in expected]
+
+
+def test_due_range_excludes_undated(app, authenticated_user):
+    family_id, _ = _seed()
+    filters = BoardFilters.from_args({'status': 'all', 'due_from': '2030-01-02', 'due_to': '2030-01-03'})
+    tasks = _all_pages(family_id, filters, limit=4)
+    assert tasks
+    assert all(datetime(2030, 1, 2) <= task.due_date < datetime(2030, 1, 4) for task in tasks)
+
+
+def test_page_eager_loads_assignees(app, authenticated_user):
+    family_id, _ = _seed()
+    with QueryLog(db.engine) as log:
+        page = get_board_page(family_id, BoardFilters(), limit=10)
+        names = [task.assignee.full_name for task in page.tasks if task.assignee]
+    assert names
+    # One query for the tasks and one for their assignees
+    assert len(log.statements) == 2
+
+
+def test_board_query_walks_index_without_sorting(app, authenticated_user):
+    family_id, _ = _seed()
+    cursor = get_board_page(family_id, BoardFilters(), limit=5).next_cursor
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        get_board_page(family_id, BoardFilters(), cursor=cursor, limit=5)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    statement, parameters = executed[0]
+    plan = [row[3] for row in db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+    assert any('ix_task_family_board' in line for line in plan), plan
+    assert not any('TEMP B-TREE' in line for line in plan), plan
+
+
+def test_board_routes(auth_client, authenticated_user):
+    _seed()
+    response = auth_client.get('/tasks/board?status=all')
+    assert response.status_code == 200
+    assert b'Task Board' in response.data
+    assert b'load-more-tasks' in response.data
+
+    response = auth_client.get('/tasks/board/rows?status=open', headers={'Accept': 'application/json'})
+    data = json.loads(response.data)
+    assert data['success'] and len(data['tasks']) == 40
+    assert data['next_cursor'] is None
+
+    response = auth_client.get('/tasks/board/rows?cursor=not-a-cursor')
+    assert response.status_code == 400
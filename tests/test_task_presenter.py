@@ -0,0 +1,80 @@
+from datetime import datetime
+from famos.services.task_presenter import TaskPresenter, parse_due, present_tasks, select_tasks
+from famos.services.task_record import TaskRecord
+from famos.services.task_windows import window_tasks_by_list
+
+NOW = datetime(2030, 6, 12, 9, 0)  # A Wednesday
+
+def _task(title, due):
+    return {'task_id': title, 'list_id': 'list1', 'title': title, 'due': due, 'status': 'needsAction'}
+
+def test_due_buckets_and_labels():
+    """Tasks are bucketed relative to the fixed now snapshot."""
+    tasks = present_tasks([
+        _task('Overdue', '2030-06-10'),
+        _task('Today', '2030-06-12 15:30:00'),
+        _task('Tomorrow', '2030-06-13 08:00:00'),
+        _task('Weekend', '2030-06-15 10:00:00'),
+        _task('Later', '2030-07-01 10:00:00'),
+        _task('Undated', '')
+    ], now=NOW)
+    
+    buckets = {task.title: task.due_bucket for task in tasks}
+    assert buckets == {
+        'Overdue': 'overdue',
+        'Today': 'today',
+        'Tomorrow': 'tomorrow',
+        'Weekend': 'this_week',
+        'Later': 'later',
+        'Undated': 'none'
+    }
+    labels = {task.title: task.due_label for task in tasks}
+    assert labels['Today'] == 'Today at 3:30 PM'
+    assert labels['Tomorrow'] == 'Tomorrow at 8:00 AM'
+    assert labels['Weekend'] == 'Saturday at 10:00 AM'
+    assert labels['Later'] == 'Jul 1 at 10:00 AM'
+
+def test_invalid_tasks_are_dropped():
+    """Untitled and non-dict tasks never reach the template."""
+    tasks = present_tasks([_task('', '2030-06-12'), None, 'oops', _task('Keep', '')], now=NOW)
+    assert [task.title for task in tasks] == ['Keep']
+
+def test_sort_key_orders_by_due_with_undated_last():
+    tasks = present_tasks([
+        _task('Undated', ''),
+        _task('Later', '2030-07-01 10:00:00'),
+        _task('Sooner', '2030-06-13 10:00:00')
+    ], now=NOW)
+    ordered = sorted(tasks, key=lambda task: task.sort_key)
+    assert [task.title for task in ordered] == ['Sooner', 'Later', 'Undated']
+
+def test_parse_due_handles_google_formats():
+    assert parse_due('2030-06-12') == datetime(2030, 6, 12)
+    assert parse_due('not a date') is None
+    assert parse_due('') is None
+    assert parse_due('2030-06-12T12:00:00Z') is not None
+
+def test_list_filter_and_records():
+    """Tasks outside the selected lists are skipped and results wrap TaskRecords."""
+    other = dict(_task('Other list', ''), list_id='list2')
+    tasks = present_tasks([_task('Mine', ''), other], now=NOW, list_ids=['list1'])
+    assert [task.title for task in tasks] == ['Mine']
+    assert isinstance(tasks[0].record, TaskRecord)
+    assert tasks[0].to_dict()['list_id'] == 'list1'
+
+def test_only_the_rendered_window_is_presented():
+    """Cached records are sorted as they are and wrapped only for the window."""
+    records = [TaskRecord.coerce(_task(title, due)) for title, due in [
+        ('Undated', ''), ('Later', '2030-07-01 10:00:00'), ('Sooner', '2030-06-13 10:00:00')
+    ]]
+    selected = select_tasks(records)
+    assert all(task is record for task, record in zip(selected, records))
+
+    windows = window_tasks_by_list(selected, [{'id': 'list1', 'title': 'List'}], 2, TaskPresenter(NOW))
+    nodes = windows[0]['nodes']
+    assert [node.task.title for node in nodes] == ['Sooner', 'Later']
+    assert [node.task.due_bucket for node in nodes] == ['tomorrow', 'later']
+    assert windows[0]['next_offset'] == 2
+    # The records themselves, shared with the task cache, carry no display fields
+    assert [node.task.record for node in nodes] == [records[2], records[1]]
+    assert not hasattr(records[0], 'due_bucket')
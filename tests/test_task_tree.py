@@ -0,0 +1,53 @@
+from famos.services.task_record import TaskRecord
+from famos.services.task_tree import build_task_trees, find_node
+
+def _record(task_id, parent='', position='', list_id='list1'):
+    return TaskRecord(task_id=task_id, list_id=list_id, title=task_id, parent=parent, position=position)
+
+def test_build_task_trees_nests_and_orders():
+    """Subtasks attach to their parent and siblings follow Google's position."""
+    trees = build_task_trees([
+        _record('child-b', parent='root', position='00000000000000000002'),
+        _record('root', position='00000000000000000001'),
+        _record('child-a', parent='root', position='00000000000000000001'),
+        _record('grandchild', parent='child-b', position='00000000000000000001'),
+        _record('second-root', position='00000000000000000000'),
+    ])
+    
+    roots = trees['list1']
+    assert [node.task.task_id for node in roots] == ['second-root', 'root']
+    root = roots[1]
+    assert [node.task.task_id for node in root.children] == ['child-a', 'child-b']
+    assert root.child_count == 2
+    assert root.descendant_count == 3
+    
+    grandchild = find_node(roots, 'grandchild')
+    assert grandchild.depth == 2
+    assert grandchild.child_count == 0
+
+def test_orphans_become_roots_and_lists_stay_separate():
+    """Tasks whose parent is missing, or in another list, are top-level."""
+    trees = build_task_trees([
+        _record('orphan', parent='deleted'),
+        _record('root', list_id='list2'),
+        _record('other-list-child', parent='root'),
+    ])
+    assert [node.task.task_id for node in trees['list1']] == ['orphan', 'other-list-child']
+    assert [node.task.task_id for node in trees['list2']] == ['root']
+    assert find_node(trees['list1'], 'missing') is None
+
+def test_parent_cycles_become_roots():
+    """Tasks whose parents loop back on themselves stay visible, as roots."""
+    trees = build_task_trees([
+        _record('a', parent='b', position='00000000000000000001'),
+        _record('b', parent='a', position='00000000000000000002'),
+        _record('a-child', parent='a'),
+        _record('loop', parent='loop'),
+        _record('root', position='00000000000000000000'),
+    ])
+    roots = trees['list1']
+    assert [node.task.task_id for node in roots] == ['root', 'a', 'b', 'loop']
+    a = find_node(roots, 'a')
+    assert [node.task.task_id for node in a.children] == ['a-child']
+    assert a.descendant_count == 1
+    assert find_node(roots, 'b').child_count == 0
@@ -163,8 +163,7 @@ def mock_google_service():
     mock_service.tasks.return_value = mock_tasks
     
     # Mock get_tasks_service to return our mock
-    with patch('famos.routes.main.get_tasks_service', return_value=mock_service), \
-         patch('famos.services.google_tasks.get_tasks_service', return_value=mock_service):
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_service):
         yield mock_service
 
 @pytest.fixture
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+from unittest.mock import patch
+import pytest
+from famos import create_app
+from famos.services.tracing import JsonlSink, TraceContextFilter, _parse_traceparent, span
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+@pytest.fixture
+def exporter(app, tmp_path):
+    exporter = app.extensions['famos_tracing']
+    exporter.sink = JsonlSink(str(tmp_path / 'spans.jsonl'))
+    return exporter
+
+
+def _exported(exporter):
+    exporter.flush()
+    try:
+        with open(exporter.sink.path) as f:
+            return [json.loads(line) for line in f]
+    except FileNotFoundError:
+        return []
+
+
+def test_every_response_has_a_trace_id(client, exporter):
+    response = client.get('/auth/login')
+    assert len(response.headers['X-Trace-Id']) == 32
+
+    response = client.get('/auth/login', headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-00'})
+    assert response.headers['X-Trace-Id'] == TRACE_ID
+    # Not sampled, so nothing is recorded
+    assert _exported(exporter) == []
+
+
+def test_sampled_request_exports_spans(auth_client, exporter, mock_google_service):
+    mock_google_service.tasklists.return_value.get.return_value.execute.return_value = {'title': 'Test List 1'}
+    with patch('famos.services.google_tasks.get_tasks_service', return_value=mock_google_service):
+        response = auth_client.get('/dashboard/tasks/list1', headers={'traceparent': f'00-{TRACE_ID}-{PARENT_ID}-01'})
+    assert response.status_code == 200
+
+    spans = _exported(exporter)
+    assert {s['traceId'] for s in spans} == {TRACE_ID}
+    root = next(s for s in spans if s.get('kind') == 'SERVER')
+    assert root['parentId'] == PARENT_ID
+    assert root['name'] == 'GET /dashboard/tasks/<list_id>'
+    assert root['tags']['http.status_code'] == '200'
+
+    by_name = {s['name']: s for s in spans}
+    assert by_name['google_tasks.get_list_tasks']['parentId'] == root['id']
+    assert by_name['google tasks.list']['parentId'] == by_name['google_tasks._fetch_list_tasks']['id']
+    assert by_name['google tasks.list']['tags']['google.method'] == 'tasks.list'
+    assert 'render dashboard/_task_window.html' in by_name
+    sql = [s for s in spans if s['name'] == 'sql']
+    assert sql and all(s['tags']['db.statement'].startswith('SELECT') for s in sql)
+
+
+def test_upstream_sampling_is_rate_limited(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SESSION_TYPE': 'filesystem',
+        'SESSION_FILE_DIR': str(tmp_path / 'sessions'),
+        'TRACE_FILE': str(tmp_path / 'traces' / 'spans.jsonl'),
+        'TRACE_UPSTREAM_SAMPLED_PER_MINUTE': 2,
+    })
+    client = app.test_client()
+    for n in range(5):
+        trace_id = f'{n + 1:032x}'
+        response = client.get('/auth/login', headers={'traceparent': f'00-{trace_id}-{PARENT_ID}-01'})
+        # The trace ID is still propagated when the sampled flag isn't honoured
+        assert response.headers['X-Trace-Id'] == trace_id
+    exporter = app.extensions['famos_tracing']
+    assert {s['traceId'] for s in _exported(exporter)} == {f'{1:032x}', f'{2:032x}'}
+
+
+def test_jsonl_sink_rotates_at_max_bytes(tmp_path):
+    sink = JsonlSink(str(tmp_path / 'spans.jsonl'), max_bytes=200, backups=2)
+    span_json = {'traceId': TRACE_ID, 'id': PARENT_ID, 'name': 'x' * 40}
+    for _ in range(20):
+        sink.write([span_json])
+    assert sorted(os.listdir(tmp_path)) == ['spans.jsonl', 'spans.jsonl.1', 'spans.jsonl.2', 'spans.jsonl.lock']
+    for name in ('spans.jsonl', 'spans.jsonl.1', 'spans.jsonl.2'):
+        assert 0 < os.path.getsize(tmp_path / name) <= 200
+
+
+def test_spans_are_noops_outside_a_sampled_trace():
+    with span('unsampled') as current:
+        assert current is None
+
+
+def test_parse_traceparent():
+    assert _parse_traceparent(f'00-{TRACE_ID}-{PARENT_ID}-01') == (TRACE_ID, PARENT_ID, True)
+    assert _parse_traceparent(f'00-{TRACE_ID.upper()}-{PARENT_ID}-00') == (TRACE_ID, PARENT_ID, False)
+    assert _parse_traceparent(f'00-{"0" * 32}-{PARENT_ID}-01') == (None, None, False)
+    assert _parse_traceparent('garbage') == (None, None, False)
+    assert _parse_traceparent(None) == (None, None, False)
+
+
+def test_log_records_carry_the_trace_id(app, client):
+    records = []
+
+    class Capture(logging.Handler):
+        def emit(self, record):
+            records.append(record)
+
+    handler = Capture()
+    handler.addFilter(TraceContextFilter())
+    test_logger = logging.getLogger('famos.test_tracing')
+    test_logger.addHandler(handler)
+
+    @app.route('/_trace_log')
+    def trace_log():
+        test_logger.warning('inside a request')
+        return 'ok'
+
+    try:
+        response = client.get('/_trace_log')
+    finally:
+        test_logger.removeHandler(handler)
+    assert records[0].trace_id == response.headers['X-Trace-Id']